@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from models import run_db, Log
+from config import LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Sentinela usada para encerrar a tarefa de gravação
+_STOP = object()
+
+
+def _insert_logs(session, rows: list):
+    """Insere um lote de logs em um único INSERT multi-linha"""
+    session.execute(insert(Log), rows)
+
+
+class LogSink:
+    """
+    Fila em memória para os registros de log.
+    
+    As ações são enfileiradas sem tocar no banco e gravadas em lote quando a
+    fila atinge `batch_size` ou a cada `flush_interval` segundos. Quando a
+    fila está cheia, `put` espera (back-pressure) em vez de descartar logs.
+    """
+    
+    def __init__(self, batch_size: int = LOG_BATCH_SIZE, flush_interval: float = LOG_FLUSH_INTERVAL,
+                 max_queue: int = LOG_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = None
+        self._task = None
+        
+        # Contadores
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Inicia a tarefa de gravação em segundo plano"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+    
+    async def put(self, row: dict):
+        """Enfileira um log; grava direto no banco se o sink não estiver rodando"""
+        row.setdefault("created_at", datetime.utcnow())
+        self.enqueued += 1
+        
+        if not self.running:
+            await self._flush([row])
+            return
+        
+        await self._queue.put(row)
+    
+    async def _run(self):
+        while True:
+            row = await self._queue.get()
+            if row is _STOP:
+                return
+            
+            batch = [row]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stop = True
+                    break
+                batch.append(row)
+            
+            await self._flush(batch)
+            if stop:
+                return
+    
+    def _drain(self) -> list:
+        rows = []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        return rows
+    
+    async def _flush(self, batch: list):
+        start = time.perf_counter()
+        try:
+            await run_db(_insert_logs, batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Erro ao gravar {len(batch)} logs: {e}")
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+    
+    async def close(self):
+        """Para a tarefa e grava tudo que ainda estiver na fila"""
+        if self._task is None:
+            return
+        
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        
+        rows = self._drain()
+        for i in range(0, len(rows), self.batch_size):
+            await self._flush(rows[i:i + self.batch_size])
+        
+        logger.info(f"Sink de logs encerrado: {self.stats()}")
+    
+    def stats(self) -> dict:
+        """Retorna os contadores do sink"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+log_sink = LogSink()
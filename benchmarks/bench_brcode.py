@@ -0,0 +1,75 @@
+"""
+Benchmark: geração do Pix Copia e Cola.
+
+Compara a montagem antiga (campos fora do padrão e CRC bit a bit) com o
+brcode.encode e com PixTemplate.render, que reaproveita o prefixo e o CRC
+do recebedor.
+
+Uso:
+    python benchmarks/bench_brcode.py [repeticoes]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import brcode
+
+KEY = "123e4567-e12b-12d1-a456-426655440000"
+
+
+def legacy_crc16(data: str) -> int:
+    """CRC bit a bit da versão antiga de pix_utils"""
+    crc = 0xFFFF
+    for byte in data.encode():
+        crc ^= byte << 8
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x10000:
+                crc ^= 0x1021
+            crc &= 0xFFFF
+    return crc
+
+
+def legacy_mount(pix_key: str, amount: float, description: str, merchant_name: str, merchant_city: str) -> str:
+    """Montagem da versão antiga de pix_utils"""
+    payload = "00020126360014br.gov.bcb.pix"
+    payload += f"0136{len(pix_key):02d}{pix_key}"
+    merchant_info = f"5204{merchant_name[:25]}"
+    payload += f"52{len(merchant_info):02d}{merchant_info}"
+    city_info = f"05{len(merchant_city):02d}{merchant_city}"
+    payload += f"50{len(city_info):02d}{city_info}"
+    if amount > 0:
+        amount_str = f"{amount:.2f}".replace(".", "")
+        payload += f"54{len(amount_str):02d}{amount_str}"
+    if description:
+        desc_info = f"05{len(description):02d}{description}"
+        payload += f"62{len(desc_info):02d}{desc_info}"
+    payload += "63"
+    return payload + f"{legacy_crc16(payload + '0000'):04X}"
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    template = brcode.template(KEY, "Bot Esquilo", "Sao Paulo")
+    payload = template.render(10.0)
+    
+    cases = [
+        ("antes: montagem + CRC bit a bit", lambda: legacy_mount(KEY, 10.0, None, "Bot Esquilo", "Sao Paulo")),
+        ("brcode.encode", lambda: brcode.encode(KEY, "Bot Esquilo", "Sao Paulo", 10.0)),
+        ("PixTemplate.render", lambda: template.render(10.0)),
+        ("CRC bit a bit (payload)", lambda: legacy_crc16(payload[:-4])),
+        ("CRC por tabela (payload)", lambda: brcode.crc16(payload[:-4])),
+        ("brcode.decode", lambda: brcode.decode(payload)),
+    ]
+    
+    print(f"{number} repetições, payload de {len(payload)} caracteres")
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{name:<34} {elapsed / number * 1e6:7.2f}µs")
+
+
+if __name__ == "__main__":
+    main()
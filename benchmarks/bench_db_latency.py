@@ -0,0 +1,101 @@
+"""
+Benchmark: latência de interações sob carga concorrente de banco de dados.
+
+Compara handlers que executam a sessão SQLAlchemy diretamente no event loop
+(comportamento antigo) com handlers que usam models.run_db. Cada "interação"
+faz uma consulta que leva ~20ms; em paralelo, uma tarefa de heartbeat mede o
+atraso do event loop, que é o que o gateway do Discord sente.
+
+Uso:
+    python benchmarks/bench_db_latency.py [interacoes] [atraso_ms]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+import models
+
+
+def setup_database(delay_ms: float):
+    """Cria um SQLite temporário com uma função slow() que simula latência de rede"""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    
+    @event.listens_for(engine, "connect")
+    def _register(dbapi_connection, _record):
+        def slow(value):
+            time.sleep(delay_ms / 1000)
+            return value
+        dbapi_connection.create_function("slow", 1, slow)
+    
+    models.Base.metadata.create_all(bind=engine)
+    models.SessionLocal.configure(bind=engine)
+
+
+def _query(session):
+    return session.execute(text("SELECT slow(1)")).scalar()
+
+
+async def heartbeat(samples: list, stop: asyncio.Event, interval: float = 0.005):
+    """Mede o atraso do event loop em relação ao intervalo esperado"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - start - interval) * 1000)
+
+
+async def run_scenario(name: str, handler, interactions: int):
+    samples = []
+    latencies = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(samples, stop))
+    
+    # Todas as interações chegam juntas; a latência conta desde a chegada
+    start = time.perf_counter()
+    
+    async def interaction():
+        await handler()
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    await asyncio.gather(*(interaction() for _ in range(interactions)))
+    total = time.perf_counter() - start
+    stop.set()
+    await beat
+    
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    lag = max(samples) if samples else 0.0
+    print(
+        f"{name:<10} total={total * 1000:8.1f}ms  "
+        f"interação p50={statistics.median(latencies):7.1f}ms p95={p95:7.1f}ms  "
+        f"atraso máx. do loop={lag:7.1f}ms"
+    )
+
+
+async def main():
+    interactions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    setup_database(delay_ms)
+    
+    async def blocking():
+        models._run_in_session(_query)
+    
+    async def offloaded():
+        await models.run_db(_query)
+    
+    print(f"{interactions} interações concorrentes, consulta de {delay_ms:.0f}ms, pool={models.DB_POOL_SIZE}")
+    await run_scenario("antes", blocking, interactions)
+    await run_scenario("depois", offloaded, interactions)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
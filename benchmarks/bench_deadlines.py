@@ -0,0 +1,89 @@
+"""
+Benchmark: prazos de partidas.
+
+Compara uma tarefa asyncio por partida (asyncio.sleep + cancel) com a
+TimerWheel do timer_wheel.py para N prazos: tempo para agendar, reagendar
+(entrada/saída na fila) e cancelar, e memória alocada.
+
+Uso:
+    python benchmarks/bench_deadlines.py [prazos]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timer_wheel import TimerWheel
+
+TIMEOUT = 1800
+
+
+async def with_tasks(count: int):
+    async def deadline():
+        await asyncio.sleep(TIMEOUT)
+    
+    tasks = {i: asyncio.create_task(deadline()) for i in range(count)}
+    await asyncio.sleep(0)
+    scheduled = time.perf_counter()
+    
+    # Reagendar = cancelar a tarefa e criar outra
+    for i in range(count):
+        tasks[i].cancel()
+        tasks[i] = asyncio.create_task(deadline())
+    await asyncio.sleep(0)
+    rescheduled = time.perf_counter()
+    
+    for task in tasks.values():
+        task.cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return scheduled, rescheduled
+
+
+async def with_wheel(count: int):
+    wheel = TimerWheel(tick=1.0, slots=512)
+    for i in range(count):
+        wheel.schedule(i, TIMEOUT)
+    scheduled = time.perf_counter()
+    
+    for i in range(count):
+        wheel.schedule(i, TIMEOUT)
+    rescheduled = time.perf_counter()
+    
+    # Um tick visita um único slot
+    start = time.perf_counter()
+    wheel.advance()
+    tick_ms = (time.perf_counter() - start) * 1000
+    
+    for i in range(count):
+        wheel.cancel(i)
+    return scheduled, rescheduled, tick_ms
+
+
+def run(name: str, count: int, bench):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = asyncio.run(bench(count))
+    end = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    scheduled, rescheduled = result[:2]
+    extra = f"  tick {result[2]:.3f}ms" if len(result) > 2 else ""
+    print(
+        f"{name:<16} agendar {(scheduled - start) * 1000:8.1f}ms  reagendar {(rescheduled - scheduled) * 1000:8.1f}ms  "
+        f"cancelar {(end - rescheduled) * 1000:8.1f}ms  pico {peak / 2**20:7.1f} MiB{extra}"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"{count} prazos de {TIMEOUT}s")
+    run("tarefa por prazo", count, with_tasks)
+    run("timer wheel", count, with_wheel)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: atribuição de mediadores.
+
+Compara a escolha do mediador com menor carga por varredura (min() sobre
+todos os mediadores online) com o heap do mediators.py, atribuindo e
+liberando N partidas em uma guilda com M mediadores (sem banco).
+
+Uso:
+    python benchmarks/bench_mediators.py [partidas] [mediadores]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediators import MediatorPool, _GuildPool, _Mediator
+
+
+def scan(matches: int, mediators: int):
+    loads = {str(i): 0 for i in range(mediators)}
+    active = []
+    for match_id in range(matches):
+        user_id = min(loads, key=loads.get)
+        loads[user_id] += 1
+        active.append(user_id)
+        if len(active) > mediators * 3:
+            loads[active.pop(random.randrange(len(active)))] -= 1
+
+
+def heap(matches: int, mediators: int):
+    pool = MediatorPool()
+    guild = pool._guilds["g"] = _GuildPool()
+    for i in range(mediators):
+        mediator = guild.online[str(i)] = _Mediator(str(i))
+        pool._push(guild, mediator)
+    active = []
+    for match_id in range(matches):
+        pool._take("g", match_id, 10.0)
+        active.append(match_id)
+        if len(active) > mediators * 3:
+            pool.release(active.pop(random.randrange(len(active))))
+    return pool.stats()
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    mediators = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print(f"{matches} partidas, {mediators} mediadores")
+    
+    random.seed(1)
+    start = time.perf_counter()
+    scan(matches, mediators)
+    print(f"varredura   {(time.perf_counter() - start) * 1000:8.1f}ms")
+    
+    random.seed(1)
+    start = time.perf_counter()
+    stats = heap(matches, mediators)
+    print(f"heap        {(time.perf_counter() - start) * 1000:8.1f}ms  "
+          f"(média {stats['avg_assign_ms'] * 1000:.1f}µs, máx. {stats['max_assign_ms'] * 1000:.1f}µs por atribuição)")
+
+
+if __name__ == "__main__":
+    main()
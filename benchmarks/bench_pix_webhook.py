@@ -0,0 +1,119 @@
+"""
+Benchmark: webhook Pix sob rajada.
+
+Um PSP falso envia N notificações simultâneas para o webhook rodando em
+127.0.0.1 e mede a latência das respostas HTTP, o atraso máximo do event
+loop e o tempo até todas as partidas estarem pagas, conciliando uma a uma
+(lote de 1) e em lote.
+
+Uso:
+    python benchmarks/bench_pix_webhook.py [notificacoes]
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from sqlalchemy import create_engine, event
+
+import models
+from models import Guild, Match
+from pix_webhook import PixWebhook, SECRET_HEADER
+
+SECRET = "bench"
+
+
+def setup_database(matches: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    # Sem fsync, para medir as instruções e não o disco
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA synchronous=OFF"))
+    
+    models.Base.metadata.create_all(bind=engine)
+    models.SessionLocal.configure(bind=engine)
+    
+    with models.SessionLocal() as session:
+        session.add(Guild(guild_id="g"))
+        session.add_all(
+            Match(guild_id="g", match_id=f"W{m}", bet_value=10.0, status='confirmed', txid=f"TX{m}")
+            for m in range(matches)
+        )
+        session.commit()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def watch_loop(lags: list, stop: asyncio.Event, interval: float = 0.005):
+    """Mede quanto cada sleep curto atrasa; atraso alto = event loop travado"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(name: str, notifications: int, batch_size: int):
+    setup_database(notifications)
+    paid = []
+    done = asyncio.Event()
+    
+    async def on_paid(matches):
+        paid.extend(matches)
+        if len(paid) >= notifications:
+            done.set()
+    
+    webhook = PixWebhook(on_paid=on_paid, secret=SECRET, batch_size=batch_size, flush_interval=0.05,
+                         max_queue=notifications)
+    port = free_port()
+    await webhook.listen("127.0.0.1", port)
+    url = f"http://127.0.0.1:{port}{webhook.path}"
+    
+    lags, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(lags, stop))
+    latencies = []
+    
+    async def send(session, m):
+        body = {"pix": [{"endToEndId": f"E{m}", "txid": f"TX{m}", "valor": "10.00"}]}
+        start = time.perf_counter()
+        async with session.post(url, json=body, headers={SECRET_HEADER: SECRET}) as response:
+            assert response.status == 200
+        latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=100)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(send(session, m) for m in range(notifications)))
+        await asyncio.wait_for(done.wait(), 120)
+    elapsed = time.perf_counter() - start
+    
+    stop.set()
+    await watcher
+    await webhook.close()
+    
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(
+        f"{name:<12} {elapsed * 1000:8.1f}ms até pagar tudo  HTTP p50 {p50:6.2f}ms p99 {p99:6.2f}ms  "
+        f"atraso máx. do loop {max(lags) * 1000:6.2f}ms  {webhook.stats()['batches']:5d} lotes"
+    )
+
+
+def main():
+    notifications = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{notifications} notificações simultâneas")
+    asyncio.run(run("lote de 1", notifications, 1))
+    asyncio.run(run("lote de 200", notifications, 200))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: tamanho enviado e tempo de geração do QR Code por formato.
+
+Compara a imagem antiga (make_image do qrcode com box_size=10, sem
+otimização) e uma versão RGB de referência com o PNG de 1 bit otimizado
+em vários tamanhos de módulo e com o SVG.
+
+Uso:
+    python benchmarks/bench_qr_formats.py [repeticoes]
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+
+import brcode
+from pix_utils import render_qr_png, render_qr_svg
+
+PAYLOAD = brcode.encode("123e4567-e12b-12d1-a456-426655440000", "Bot Esquilo", "Sao Paulo", 100.0)
+
+
+def legacy(rgb: bool = False) -> bytes:
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=2)
+    qr.add_data(PAYLOAD)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    if rgb:
+        img = img.get_image().convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def measure(name: str, func, number: int):
+    data = func()
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = (time.perf_counter() - start) / number
+    print(f"{name:<26} {len(data):7d} bytes  {elapsed * 1000:6.2f}ms")
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"payload de {len(PAYLOAD)} caracteres, média de {number} gerações")
+    measure("antes (box 10)", legacy, number)
+    measure("RGB de referência (box 10)", lambda: legacy(rgb=True), number)
+    for box in (10, 8, 6, 4):
+        measure(f"PNG 1 bit (box {box})", lambda: render_qr_png(PAYLOAD, box), number)
+    measure("SVG", lambda: render_qr_svg(PAYLOAD), number)
+
+
+if __name__ == "__main__":
+    main()
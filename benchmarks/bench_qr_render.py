@@ -0,0 +1,77 @@
+"""
+Benchmark: confirmações de partida gerando QR Code Pix.
+
+Compara a renderização síncrona no event loop (comportamento antigo) com o
+QRRenderer (pool de processos + cache LRU por payload), medindo o atraso do
+event loop e a latência de cada confirmação.
+
+Uso:
+    python benchmarks/bench_qr_render.py [confirmacoes]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pix_utils import mount_pix_string, render_qr_png
+from qr_render import QRRenderer
+from config import BET_VALUES
+
+KEY = "bench@esquilo.com"
+
+
+def payload(amount: float) -> str:
+    return mount_pix_string(KEY, amount, None, "Bot Esquilo", "Sao Paulo")
+
+
+async def heartbeat(samples: list, stop: asyncio.Event, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - start - interval) * 1000)
+
+
+async def run_scenario(name: str, confirm, confirmations: int):
+    samples, latencies = [], []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(samples, stop))
+    await asyncio.sleep(0.01)
+    
+    async def one(amount):
+        start = time.perf_counter()
+        await confirm(amount)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    random.seed(3)
+    await asyncio.gather(*(one(random.choice(BET_VALUES)) for _ in range(confirmations)))
+    stop.set()
+    await beat
+    print(
+        f"{name:<22} confirmação p50={statistics.median(latencies):7.1f}ms "
+        f"máx={max(latencies):7.1f}ms  atraso máx. do loop={max(samples):7.1f}ms"
+    )
+
+
+async def main():
+    confirmations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{confirmations} confirmações simultâneas, {len(BET_VALUES)} valores de aposta")
+    
+    async def blocking(amount):
+        render_qr_png(payload(amount))
+    
+    await run_scenario("antes (no loop)", blocking, confirmations)
+    
+    renderer = QRRenderer(workers=2, use_processes=True)
+    await run_scenario("pool, cache frio", lambda amount: renderer.render(payload(amount)), confirmations)
+    await run_scenario("pool, pré-aquecido", lambda amount: renderer.render(payload(amount)), confirmations)
+    renderer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Benchmark: planos e tempos das consultas quentes antes/depois dos índices compostos.
+
+Cria dois bancos SQLite em memória com os mesmos dados, um com o esquema
+antigo (sem os índices das migrações 0001 e 0006) e outro com o esquema atual, e
+mostra o EXPLAIN QUERY PLAN e o tempo médio de cada consulta.
+
+Para ver o plano no MySQL, rode as mesmas consultas com EXPLAIN depois de
+`alembic upgrade head`.
+
+Uso:
+    python benchmarks/bench_query_plans.py [usuarios]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import MetaData, UniqueConstraint, create_engine, text
+
+from models import Base
+
+NEW_INDEXES = {
+    'ix_users_user_id_guild_id',
+    'uq_match_participants_match_id_user_id',
+    'ix_logs_guild_id_created_at',
+    'ix_matches_status_created_at',
+}
+
+QUERIES = {
+    "users (user_id, guild_id)":
+        "SELECT * FROM users WHERE user_id = :user_id AND guild_id = :guild_id",
+    "match_participants (match_id, user_id)":
+        "SELECT * FROM match_participants WHERE match_id = :match_pk AND user_id = :participant_id",
+    "matches (match_id)":
+        "SELECT * FROM matches WHERE match_id = :room_id",
+    "matches (status, created_at) — limpeza":
+        "SELECT id FROM matches WHERE status = 'cancelled' AND created_at < :cutoff LIMIT 500",
+    "logs (guild_id, created_at)":
+        "SELECT * FROM logs WHERE guild_id = :guild_id AND created_at >= :since ORDER BY created_at DESC LIMIT 50",
+}
+
+
+def legacy_metadata() -> MetaData:
+    """Cópia do esquema atual sem os índices adicionados pelas migrações 0001 e 0006"""
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        for index in list(copy.indexes):
+            if index.name in NEW_INDEXES:
+                copy.indexes.discard(index)
+        for constraint in list(copy.constraints):
+            if isinstance(constraint, UniqueConstraint) and constraint.name in NEW_INDEXES:
+                copy.constraints.discard(constraint)
+    return metadata
+
+
+def populate(engine, users: int):
+    guilds = [str(1000 + g) for g in range(10)]
+    now = datetime.utcnow()
+    
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO guilds (guild_id) VALUES (:guild_id)"),
+                     [{"guild_id": g} for g in guilds])
+        conn.execute(
+            text("INSERT INTO users (user_id, guild_id, username, wins, losses, coins) "
+                 "VALUES (:user_id, :guild_id, :username, 0, 0, 0)"),
+            [{"user_id": str(u), "guild_id": guilds[u % len(guilds)], "username": f"u{u}"}
+             for u in range(users)]
+        )
+        conn.execute(
+            text("INSERT INTO matches (guild_id, match_id, bet_value, status, created_at) "
+                 "VALUES (:guild_id, :match_id, 1.0, :status, :created_at)"),
+            [{"guild_id": guilds[m % len(guilds)], "match_id": f"R{m:07d}",
+              "status": 'cancelled' if m % 50 == 0 else 'completed' if m % 2 else 'waiting',
+              "created_at": now - timedelta(minutes=m)} for m in range(users // 2)]
+        )
+        conn.execute(
+            text("INSERT INTO match_participants (match_id, user_id) VALUES (:match_id, :user_id)"),
+            [{"match_id": p // 4 + 1, "user_id": str(p * 7919 % users)} for p in range(users * 2)]
+        )
+        conn.execute(
+            text("INSERT INTO logs (guild_id, user_id, action, created_at) "
+                 "VALUES (:guild_id, :user_id, 'join_queue', :created_at)"),
+            [{"guild_id": guilds[l % len(guilds)], "user_id": str(l % users),
+              "created_at": now - timedelta(seconds=l)} for l in range(users * 2)]
+        )
+
+
+def measure(engine, params: dict, repeat: int = 200):
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).fetchall()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            results[name] = (" | ".join(row[-1] for row in plan), elapsed)
+    return results
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    params = {
+        "user_id": str(users // 3),
+        "guild_id": "1003",
+        "match_pk": users // 8,
+        # participante real da partida acima
+        "participant_id": str((users // 8 - 1) * 4 * 7919 % users),
+        "room_id": f"R{users // 4:07d}",
+        "since": datetime.utcnow() - timedelta(hours=1),
+        "cutoff": datetime.utcnow() - timedelta(days=7),
+    }
+    
+    before = create_engine("sqlite://")
+    legacy_metadata().create_all(before)
+    populate(before, users)
+    
+    after = create_engine("sqlite://")
+    Base.metadata.create_all(after)
+    populate(after, users)
+    
+    old, new = measure(before, params), measure(after, params)
+    print(f"{users} usuários, {users // 2} partidas, {users * 2} participantes, {users * 2} logs\n")
+    for name in QUERIES:
+        print(name)
+        print(f"  antes : {old[name][1]:8.3f}ms  {old[name][0]}")
+        print(f"  depois: {new[name][1]:8.3f}ms  {new[name][0]}")
+
+
+if __name__ == "__main__":
+    main()
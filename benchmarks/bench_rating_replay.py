@@ -0,0 +1,64 @@
+"""
+Benchmark: recálculo do rating de uma guilda a partir do histórico.
+
+Compara o replay vetorizado (rating_replay.replay) com a aplicação partida
+por partida (rating.apply_match) sobre um histórico sintético.
+
+Uso:
+    python benchmarks/bench_rating_replay.py [partidas] [jogadores]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rating import apply_match
+from rating_replay import replay
+
+
+def history(matches: int, players: int) -> list:
+    random.seed(1)
+    ids = [str(i) for i in range(players)]
+    rows = []
+    for match_id in range(matches):
+        size = random.choice([1, 2, 3, 4])
+        chosen = random.sample(ids, size * 2)
+        winner = random.choice(["team1", "team2"])
+        rows += [(match_id, p, "team1", winner) for p in chosen[:size]]
+        rows += [(match_id, p, "team2", winner) for p in chosen[size:]]
+    return rows
+
+
+def sequential(rows: list) -> dict:
+    ratings = {}
+    teams = {}
+    for match_id, user_id, team, winner in rows:
+        teams.setdefault(match_id, (winner, {"team1": [], "team2": []}))[1][team].append(user_id)
+    for winner, sides in teams.values():
+        apply_match(ratings, sides["team1"], sides["team2"], winner)
+    return ratings
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    rows = history(matches, players)
+    print(f"{matches} partidas, {players} jogadores, {len(rows)} participações")
+    
+    start = time.perf_counter()
+    expected = sequential(rows)
+    print(f"partida a partida   {(time.perf_counter() - start) * 1000:8.0f}ms")
+    
+    start = time.perf_counter()
+    ratings, log_loss = replay(rows)
+    print(f"vetorizado          {(time.perf_counter() - start) * 1000:8.0f}ms  log loss={log_loss:.4f}")
+    
+    drift = max(abs(ratings[p] - expected[p]) for p in expected)
+    print(f"diferença máxima entre os dois: {drift:.2e}")
+
+
+if __name__ == "__main__":
+    main()
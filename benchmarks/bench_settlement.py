@@ -0,0 +1,124 @@
+"""
+Benchmark: liquidação de resultados.
+
+Compara o /resultado antigo (uma consulta de User por participante e
+atualização linha a linha) com a liquidação em conjunto do settlement.py,
+para salas de 8 jogadores uma a uma e em lote.
+
+Com 500 partidas em SQLite, uma a uma a liquidação cai de 19 para 7
+instruções por partida (trava, status, contagem, saldos e os três passos
+do rating), mas o tempo fica no mesmo patamar do antigo (~8-9ms/partida),
+dominado pelo commit de cada partida. O lote usa 7 instruções no total,
+~0,5ms/partida.
+
+Uso:
+    python benchmarks/bench_settlement.py [partidas]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+
+import models
+from models import Guild, User, Match, MatchParticipant
+from settlement import settle_match, settle_matches
+
+PLAYERS = 8
+
+
+def setup_database(matches: int, users: int = 2000):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(1))
+    # Sem fsync, para medir as instruções e não o disco
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA synchronous=OFF"))
+    
+    models.Base.metadata.create_all(bind=engine)
+    models.SessionLocal.configure(bind=engine)
+    
+    with models.SessionLocal() as session:
+        session.add(Guild(guild_id="g"))
+        session.add_all(
+            User(user_id=str(i), guild_id="g", username=str(i), wins=0, losses=0, coins=0.0)
+            for i in range(users)
+        )
+        session.flush()
+        ids = []
+        for m in range(matches):
+            match = Match(guild_id="g", bet_value=1.0, match_id=f"B{m}", status='confirmed')
+            session.add(match)
+            session.flush()
+            ids.append(match.id)
+            session.add_all(
+                MatchParticipant(
+                    match_id=match.id,
+                    user_id=str((m * PLAYERS + p) * 7919 % users),
+                    team='team1' if p % 2 == 0 else 'team2'
+                )
+                for p in range(PLAYERS)
+            )
+        session.commit()
+    return ids, statements
+
+
+def settle_legacy(session, match_pk: int, winner: str):
+    """Reprodução do /resultado antigo"""
+    match = session.get(Match, match_pk)
+    match.status = 'completed'
+    match.winner_team = winner
+    for participant in session.query(MatchParticipant).filter_by(match_id=match.id).all():
+        user = session.query(User).filter_by(user_id=participant.user_id).first()
+        if user:
+            if participant.team == winner:
+                user.wins += 1
+                user.coins += match.bet_value
+            else:
+                user.losses += 1
+
+
+def run(name: str, matches: int, settle):
+    ids, statements = setup_database(matches)
+    statements.clear()
+    start = time.perf_counter()
+    settle(ids)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<22} {elapsed * 1000:8.1f}ms total  {elapsed / matches * 1000:6.2f}ms/partida  "
+        f"{len(statements):6d} instruções"
+    )
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    
+    def legacy(ids):
+        for match_pk in ids:
+            with models.SessionLocal() as session:
+                settle_legacy(session, match_pk, 'team1')
+                session.commit()
+    
+    def one_by_one(ids):
+        for match_pk in ids:
+            with models.SessionLocal() as session:
+                settle_match(session, "g", match_pk, 'team1')
+                session.commit()
+    
+    def batch(ids):
+        with models.SessionLocal() as session:
+            settle_matches(session, "g", {match_pk: 'team1' for match_pk in ids})
+            session.commit()
+    
+    print(f"{matches} partidas de {PLAYERS} jogadores")
+    run("antes (linha a linha)", matches, legacy)
+    run("depois (uma partida)", matches, one_by_one)
+    run("depois (lote)", matches, batch)
+
+
+if __name__ == "__main__":
+    main()
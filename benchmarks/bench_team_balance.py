@@ -0,0 +1,64 @@
+"""
+Benchmark: tempo de divisão de times por sala.
+
+Mede balance_teams para cada tamanho de sala (exato até 4v4, heurística
+acima) e compara a diferença de força obtida com uma divisão ingênua pela
+ordem de entrada.
+
+Uso:
+    python benchmarks/bench_team_balance.py [salas]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teams import balance_teams
+
+
+def player_strength(wins: int, losses: int) -> float:
+    """Taxa de vitória suavizada; jogadores novos ficam em 50%"""
+    return (wins + 1) / (wins + losses + 2)
+
+
+def random_room(size: int) -> tuple:
+    players = [str(i) for i in range(size)]
+    strengths = {}
+    for player in players:
+        games = random.randint(0, 200)
+        wins = random.randint(0, games)
+        strengths[player] = player_strength(wins, games - wins)
+    return players, strengths
+
+
+def gap(team1: list, team2: list, strengths: dict) -> float:
+    return abs(sum(strengths[p] for p in team1) - sum(strengths[p] for p in team2))
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    random.seed(42)
+    
+    print(f"{rooms} salas por tamanho")
+    for size in (2, 4, 6, 8, 10, 16, 32):
+        samples = [random_room(size) for _ in range(rooms)]
+        
+        start = time.perf_counter()
+        splits = [balance_teams(players, strengths) for players, strengths in samples]
+        elapsed = time.perf_counter() - start
+        
+        balanced = [gap(t1, t2, s) for (t1, t2), (_, s) in zip(splits, samples)]
+        naive = [gap(p[:size // 2], p[size // 2:], s) for p, s in samples]
+        label = f"{size // 2}v{size // 2}"
+        print(
+            f"{label:<6} {elapsed / rooms * 1e6:8.1f}µs/sala  "
+            f"diferença média: ingênua={statistics.mean(naive):.4f} balanceada={statistics.mean(balanced):.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,18 @@ from discord.ext import commands
 from discord import app_commands
 import os
 from dotenv import load_dotenv
-from config import DISCORD_TOKEN, DISCORD_GUILD_ID
+from config import DISCORD_TOKEN, PIX_WEBHOOK_HOST, PIX_WEBHOOK_PORT, PIX_WEBHOOK_SECRET
 from models import init_db
+from audit_log import log_sink
+from outbound import outbound
+from queue_engine import queue_engine
+from leaderboard import leaderboard
+from qr_render import qr_renderer
+from pix_receivers import pix_receivers, default_receiver
+from pix_webhook import pix_webhook
+from match_lifecycle import lifecycle
+from mediators import mediator_pool
+from timer_wheel import deadlines
 import logging
 
 # Configurar logging
@@ -19,21 +29,57 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix=".", intents=intents)
+class EsquiloBot(commands.Bot):
+    """Bot com inicialização e encerramento dos serviços em segundo plano"""
+    
+    async def setup_hook(self):
+        """Hook chamado antes do bot ficar pronto"""
+        # Inicializar banco de dados
+        try:
+            await self.loop.run_in_executor(None, init_db)
+            logger.info("Banco de dados inicializado com sucesso")
+            await queue_engine.load()
+            await leaderboard.load()
+            await lifecycle.load()
+            await mediator_pool.load()
+        except Exception as e:
+            logger.error(f"Erro ao inicializar banco de dados: {e}")
+        
+        log_sink.start()
+        queue_engine.start()
+        lifecycle.start()
+        
+        # Pré-renderizar o QR Code de cada valor de aposta em segundo plano
+        pix_receivers.prewarm(default_receiver())
+        
+        await load_cogs()
+        
+        # Receptor de pagamentos Pix (depois das cogs, que tratam os avisos)
+        if PIX_WEBHOOK_PORT and not PIX_WEBHOOK_SECRET:
+            logger.error("Webhook Pix não iniciado: defina PIX_WEBHOOK_SECRET")
+        elif PIX_WEBHOOK_PORT:
+            try:
+                await pix_webhook.listen(PIX_WEBHOOK_HOST, PIX_WEBHOOK_PORT)
+            except OSError as e:
+                logger.error(f"Erro ao iniciar o webhook Pix: {e}")
+    
+    async def close(self):
+        """Esvazia as filas de envio, da fila de partidas e de logs antes de desconectar"""
+        await deadlines.close()
+        await pix_webhook.close()
+        await outbound.close()
+        await queue_engine.close()
+        await log_sink.close()
+        qr_renderer.close()
+        await super().close()
+
+bot = EsquiloBot(command_prefix=".", intents=intents)
 
-# Inicializar banco de dados
 @bot.event
 async def on_ready():
     """Evento disparado quando o bot está pronto"""
     logger.info(f"Bot conectado como {bot.user}")
     
-    # Inicializar banco de dados
-    try:
-        init_db()
-        logger.info("Banco de dados inicializado com sucesso")
-    except Exception as e:
-        logger.error(f"Erro ao inicializar banco de dados: {e}")
-    
     # Sincronizar comandos slash
     try:
         synced = await bot.tree.sync()
@@ -57,11 +103,6 @@ async def load_cogs():
             except Exception as e:
                 logger.error(f"Erro ao carregar cog {filename}: {e}")
 
-@bot.event
-async def setup_hook():
-    """Hook chamado antes do bot ficar pronto"""
-    await load_cogs()
-
 # Comando de teste
 @bot.tree.command(name="ping", description="Verifica se o bot está online")
 async def ping(interaction: discord.Interaction):
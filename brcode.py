@@ -0,0 +1,197 @@
+"""
+Codificação e decodificação do BR Code (Pix Copia e Cola).
+
+O payload é uma sequência TLV no padrão EMV QRCPS-MPM: dois dígitos de ID,
+dois de tamanho e o valor. Campos usados:
+
+    00 Payload Format Indicator ("01")
+    26 Merchant Account Information
+       00 GUI ("br.gov.bcb.pix"), 01 chave Pix, 02 informação adicional
+    52 Merchant Category Code ("0000")
+    53 Moeda ("986", real)
+    54 Valor (opcional, "10.00")
+    58 País ("BR")
+    59 Nome do recebedor (até 25)
+    60 Cidade do recebedor (até 15)
+    62 Additional Data Field Template: 05 txid ("***" quando não há)
+    63 CRC16-CCITT (polinômio 0x1021, valor inicial 0xFFFF) de todo o
+       payload até "6304", inclusive
+"""
+
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+GUI = "br.gov.bcb.pix"
+NO_TXID = "***"
+
+ID_FORMAT = "00"
+ID_MERCHANT_ACCOUNT = "26"
+ID_CATEGORY = "52"
+ID_CURRENCY = "53"
+ID_AMOUNT = "54"
+ID_COUNTRY = "58"
+ID_MERCHANT_NAME = "59"
+ID_MERCHANT_CITY = "60"
+ID_ADDITIONAL_DATA = "62"
+ID_CRC = "63"
+
+ID_GUI = "00"
+ID_KEY = "01"
+ID_INFO = "02"
+ID_TXID = "05"
+
+CRC_INIT = 0xFFFF
+
+
+def _crc_table() -> list:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc16(data, crc: int = CRC_INIT) -> int:
+    """CRC16-CCITT por tabela; `crc` permite continuar a partir de um prefixo"""
+    if isinstance(data, str):
+        data = data.encode()
+    table = CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+def tlv(field_id: str, value: str) -> str:
+    """Monta um campo ID + tamanho + valor"""
+    if len(value) > 99:
+        raise ValueError(f"campo {field_id} com mais de 99 caracteres")
+    return f"{field_id}{len(value):02d}{value}"
+
+
+def _ascii(text: str, limit: int) -> str:
+    """Remove acentos e corta no tamanho máximo do campo"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return text.strip()[:limit]
+
+
+def _txid(txid: Optional[str]) -> str:
+    if not txid:
+        return NO_TXID
+    if txid != NO_TXID and (len(txid) > 25 or not txid.isalnum()):
+        raise ValueError("txid deve ter até 25 caracteres alfanuméricos")
+    return txid
+
+
+def _amount(amount: Optional[float]) -> str:
+    return tlv(ID_AMOUNT, f"{amount:.2f}") if amount else ""
+
+
+class PixTemplate:
+    """
+    Payload de um recebedor com as partes fixas já montadas.
+    
+    O trecho 00-53 não muda entre cobranças, então o CRC dele é calculado
+    uma vez; cada `render` só processa valor, nome, cidade e txid.
+    """
+    
+    def __init__(self, key: str, merchant_name: str, merchant_city: str, info: str = None):
+        account = tlv(ID_GUI, GUI) + tlv(ID_KEY, key)
+        if info:
+            account += tlv(ID_INFO, _ascii(info, 72))
+        self.key = key
+        self.prefix = (
+            tlv(ID_FORMAT, "01")
+            + tlv(ID_MERCHANT_ACCOUNT, account)
+            + tlv(ID_CATEGORY, "0000")
+            + tlv(ID_CURRENCY, "986")
+        )
+        self.middle = (
+            tlv(ID_COUNTRY, "BR")
+            + tlv(ID_MERCHANT_NAME, _ascii(merchant_name, 25))
+            + tlv(ID_MERCHANT_CITY, _ascii(merchant_city, 15))
+        )
+        self.prefix_crc = crc16(self.prefix)
+    
+    def render(self, amount: float = None, txid: str = None) -> str:
+        rest = (
+            _amount(amount)
+            + self.middle
+            + tlv(ID_ADDITIONAL_DATA, tlv(ID_TXID, _txid(txid)))
+            + ID_CRC + "04"
+        )
+        return f"{self.prefix}{rest}{crc16(rest, self.prefix_crc):04X}"
+
+
+@lru_cache(maxsize=256)
+def template(key: str, merchant_name: str, merchant_city: str, info: str = None) -> PixTemplate:
+    """Template em cache por recebedor"""
+    return PixTemplate(key, merchant_name, merchant_city, info)
+
+
+def encode(key: str, merchant_name: str, merchant_city: str, amount: float = None,
+           txid: str = None, info: str = None) -> str:
+    """Gera o Pix Copia e Cola"""
+    return template(key, merchant_name, merchant_city, info).render(amount, txid)
+
+
+@dataclass(frozen=True)
+class PixPayload:
+    """Campos de um BR Code decodificado"""
+    
+    key: str
+    merchant_name: str
+    merchant_city: str
+    amount: Optional[float] = None
+    txid: Optional[str] = None
+    info: Optional[str] = None
+
+
+def parse_tlv(data: str) -> dict:
+    """Separa uma sequência TLV em {ID: valor}"""
+    fields = {}
+    position = 0
+    while position < len(data):
+        header = data[position:position + 4]
+        if len(header) < 4 or not header.isdigit():
+            raise ValueError(f"campo malformado na posição {position}")
+        size = int(header[2:])
+        value = data[position + 4:position + 4 + size]
+        if len(value) != size:
+            raise ValueError(f"campo {header[:2]} truncado")
+        fields[header[:2]] = value
+        position += 4 + size
+    return fields
+
+
+def decode(payload: str) -> PixPayload:
+    """Lê e valida um Pix Copia e Cola (estrutura, GUI e CRC)"""
+    if len(payload) < 8 or payload[-8:-4] != ID_CRC + "04":
+        raise ValueError("payload sem CRC")
+    if crc16(payload[:-4]) != int(payload[-4:], 16):
+        raise ValueError("CRC inválido")
+    
+    fields = parse_tlv(payload)
+    if fields.get(ID_FORMAT) != "01":
+        raise ValueError("Payload Format Indicator inválido")
+    
+    account = parse_tlv(fields.get(ID_MERCHANT_ACCOUNT, ""))
+    if account.get(ID_GUI, "").lower() != GUI or ID_KEY not in account:
+        raise ValueError("não é um BR Code Pix")
+    
+    additional = parse_tlv(fields.get(ID_ADDITIONAL_DATA, ""))
+    txid = additional.get(ID_TXID)
+    return PixPayload(
+        key=account[ID_KEY],
+        merchant_name=fields.get(ID_MERCHANT_NAME, ""),
+        merchant_city=fields.get(ID_MERCHANT_CITY, ""),
+        amount=float(fields[ID_AMOUNT]) if ID_AMOUNT in fields else None,
+        txid=None if txid in (None, NO_TXID) else txid,
+        info=account.get(ID_INFO),
+    )
@@ -6,7 +6,7 @@ from utils import (
     create_matches_config_embed, create_roles_config_embed, create_logs_config_embed,
     create_modality_config_embed, log_action
 )
-from models import get_session, Guild, Modality, Mode
+from guild_settings import guild_settings
 from config import MODALITIES, BET_VALUES
 import logging
 
@@ -31,7 +31,7 @@ class CentralView(discord.ui.View):
     async def select_menu(self, interaction: discord.Interaction, select: discord.ui.Select):
         await interaction.response.defer()
         
-        guild = get_or_create_guild(self.guild_id)
+        guild = await get_or_create_guild(self.guild_id)
         
         if select.values[0] == "general":
             embed = create_general_config_embed(guild)
@@ -104,26 +104,19 @@ class RoomValueModal(discord.ui.Modal, title="Editar Valor da Sala"):
         try:
             new_value = float(self.value.value)
             
-            session = get_session()
-            try:
-                guild = session.query(Guild).filter_by(guild_id=str(self.guild_id)).first()
-                if guild:
-                    guild.room_price = new_value
-                    session.commit()
-                    
-                    log_action(
-                        self.guild_id,
-                        str(interaction.user.id),
-                        "room_price_updated",
-                        details=f"Novo valor: R$ {new_value:.2f}"
-                    )
-                    
-                    await interaction.response.send_message(
-                        f"✅ Valor da sala atualizado para R$ {new_value:.2f}",
-                        ephemeral=True
-                    )
-            finally:
-                session.close()
+            await guild_settings.update(self.guild_id, room_price=new_value)
+            
+            await log_action(
+                self.guild_id,
+                str(interaction.user.id),
+                "room_price_updated",
+                details=f"Novo valor: R$ {new_value:.2f}"
+            )
+            
+            await interaction.response.send_message(
+                f"✅ Valor da sala atualizado para R$ {new_value:.2f}",
+                ephemeral=True
+            )
         
         except ValueError:
             await interaction.response.send_message(
@@ -175,7 +168,7 @@ class BetValuesView(discord.ui.View):
     
     @discord.ui.button(label="Voltar", style=discord.ButtonStyle.danger, emoji="↩️")
     async def back_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        embed = create_general_config_embed(get_or_create_guild(self.guild_id))
+        embed = create_general_config_embed(await get_or_create_guild(self.guild_id))
         view = GeneralConfigView(self.guild_id)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
@@ -275,20 +268,12 @@ class CoinsModal(discord.ui.Modal, title="Configurar Coins"):
             winner = int(self.winner_coins.value)
             loser = int(self.loser_coins.value)
             
-            session = get_session()
-            try:
-                guild = session.query(Guild).filter_by(guild_id=str(self.guild_id)).first()
-                if guild:
-                    guild.coins_winner = winner
-                    guild.coins_loser = loser
-                    session.commit()
-                    
-                    await interaction.response.send_message(
-                        f"✅ Coins atualizados:\n• Vencedor: {winner}\n• Perdedor: {loser}",
-                        ephemeral=True
-                    )
-            finally:
-                session.close()
+            await guild_settings.update(self.guild_id, coins_winner=winner, coins_loser=loser)
+            
+            await interaction.response.send_message(
+                f"✅ Coins atualizados:\n• Vencedor: {winner}\n• Perdedor: {loser}",
+                ephemeral=True
+            )
         
         except ValueError:
             await interaction.response.send_message(
@@ -318,7 +303,7 @@ class ModalityConfigView(discord.ui.View):
     
     @discord.ui.button(label="Voltar", style=discord.ButtonStyle.danger, emoji="↩️")
     async def back_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        embed = create_matches_config_embed(get_or_create_guild(self.guild_id))
+        embed = create_matches_config_embed(await get_or_create_guild(self.guild_id))
         view = MatchesConfigView(self.guild_id)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
@@ -338,19 +323,12 @@ class RolesConfigView(discord.ui.View):
     async def mediator_role_select(self, interaction: discord.Interaction, select: discord.ui.Select):
         role_id = select.values[0]
         
-        session = get_session()
-        try:
-            guild = session.query(Guild).filter_by(guild_id=str(self.guild_id)).first()
-            if guild:
-                guild.mediator_role_id = role_id
-                session.commit()
-                
-                await interaction.response.send_message(
-                    f"✅ Cargo de Mediador definido",
-                    ephemeral=True
-                )
-        finally:
-            session.close()
+        await guild_settings.update(self.guild_id, mediator_role_id=role_id)
+        
+        await interaction.response.send_message(
+            f"✅ Cargo de Mediador definido",
+            ephemeral=True
+        )
     
     @discord.ui.button(label="Voltar", style=discord.ButtonStyle.danger, emoji="↩️")
     async def back_button(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -392,14 +370,14 @@ class Central(commands.Cog):
             return
         
         guild_id = str(interaction.guild.id)
-        get_or_create_guild(guild_id)
+        await get_or_create_guild(guild_id)
         
         embed = create_central_embed()
         view = CentralView(guild_id)
         
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         
-        log_action(guild_id, str(interaction.user.id), "central_opened")
+        await log_action(guild_id, str(interaction.user.id), "central_opened")
 
 
 async def setup(bot):
@@ -1,166 +1,400 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from sqlalchemy import insert
 from utils import (
-    get_or_create_guild, get_or_create_user, create_match_embed, log_action,
-    generate_room_id, generate_room_password
+    get_or_create_guild, create_match_embed, log_action,
+    generate_room_ids, generate_room_password, static_view, mode_capacity
 )
-from models import get_session, Guild, Match, Modality, Mode, MatchParticipant, User
+from queue_engine import queue_engine, QueueResult
+from match_state import WAITING, QUEUE_IDLE
+from queue_board import plan_board, load_board, save_board
+from match_lifecycle import lifecycle
+from mediators import mediator_pool
+from teams import assign_teams
+from guild_settings import guild_settings
+from models import run_db, Match
 from config import MODALITIES, BET_VALUES
+from outbound import outbound, Priority
+from datetime import datetime
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-class QueueView(discord.ui.View):
-    """View para a fila de partidas"""
+QUEUE_BUTTONS = {
+    "enter": ("Entrar", discord.ButtonStyle.success, "✅"),
+    "leave": ("Sair", discord.ButtonStyle.danger, "❌"),
+    "ump": ("Full ump xm8", discord.ButtonStyle.primary, "🎮"),
+    "gelo_inf": ("Gelo Infinito", discord.ButtonStyle.primary, "❄️"),
+    "gelo": ("Gelo Normal", discord.ButtonStyle.primary, "🧊"),
+}
+
+
+class QueueButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"fila:(?P<action>[a-z_]+):(?P<match_id>\d+):(?P<modality>[^:]+):(?P<mode>\d+v\d+)"
+):
+    """Botão persistente da fila; o custom_id carrega a partida e o modo"""
     
-    def __init__(self, match_id: int, modality_name: str, mode_name: str, price: float):
-        super().__init__(timeout=None)
+    def __init__(self, action: str, match_id: int, modality_name: str, mode_name: str):
+        label, style, emoji = QUEUE_BUTTONS[action]
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=style,
+            emoji=emoji,
+            custom_id=f"fila:{action}:{match_id}:{modality_name}:{mode_name}"
+        ))
+        self.action = action
         self.match_id = match_id
         self.modality_name = modality_name
         self.mode_name = mode_name
-        self.price = price
-        self.players = []
     
-    @discord.ui.button(label="Entrar", style=discord.ButtonStyle.success, emoji="✅")
-    async def enter_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para entrar na fila"""
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], int(match["match_id"]), match["modality"], match["mode"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "enter":
+            await self.enter(interaction)
+        elif self.action == "leave":
+            await self.leave(interaction)
+        elif self.action == "ump":
+            await interaction.response.send_message("🎮 Modo Full UMP ativado", ephemeral=True)
+        elif self.action == "gelo_inf":
+            await interaction.response.send_message("❄️ Modo Gelo Infinito ativado", ephemeral=True)
+        elif self.action == "gelo":
+            await interaction.response.send_message("🧊 Modo Gelo Normal ativado", ephemeral=True)
+    
+    async def enter(self, interaction: discord.Interaction):
+        """Entra na fila"""
         
-        session = get_session()
-        try:
-            match = session.query(Match).filter_by(id=self.match_id).first()
-            
-            if not match:
-                await interaction.response.send_message(
-                    "❌ Partida não encontrada",
-                    ephemeral=True
-                )
-                return
-            
-            # Verificar se já está na fila
-            existing = session.query(MatchParticipant).filter_by(
-                match_id=self.match_id,
-                user_id=str(interaction.user.id)
-            ).first()
-            
-            if existing:
-                await interaction.response.send_message(
-                    "⚠️ Você já está nesta fila",
-                    ephemeral=True
-                )
-                return
-            
-            # Adicionar à fila
-            participant = MatchParticipant(
-                match_id=self.match_id,
-                user_id=str(interaction.user.id),
-                team=None
+        user_id = str(interaction.user.id)
+        self.bind_message(interaction.message)
+        result, room, previous = await queue_engine.join(
+            self.match_id, user_id, capacity=mode_capacity(self.mode_name)
+        )
+        
+        if result is QueueResult.NOT_FOUND:
+            await interaction.response.send_message(
+                "❌ Partida não encontrada",
+                ephemeral=True
             )
-            session.add(participant)
-            session.commit()
-            
-            # Atualizar lista de jogadores
-            self.players.append(interaction.user.mention)
-            
-            log_action(
-                str(interaction.guild.id),
-                str(interaction.user.id),
-                "join_queue",
-                match_id=match.match_id
+            return
+        
+        if result is QueueResult.CLOSED:
+            await interaction.response.send_message(
+                "⚠️ Esta sala já está completa",
+                ephemeral=True
             )
-            
+            return
+        
+        if result is QueueResult.ALREADY_IN:
             await interaction.response.send_message(
-                f"✅ Você entrou na fila de {self.modality_name} {self.mode_name}",
+                "⚠️ Você já está nesta fila",
                 ephemeral=True
             )
-            
-            # Verificar se a sala está cheia
-            total_players = session.query(MatchParticipant).filter_by(match_id=self.match_id).count()
-            mode_size = int(self.mode_name.split('v')[0]) * 2
-            
-            if total_players >= mode_size:
-                match.status = 'full'
-                session.commit()
-                
-                # Enviar mensagem de sala cheia
-                await interaction.channel.send(
-                    f"🎮 **Sala cheia!** {self.modality_name} {self.mode_name} está pronta para começar!"
-                )
-        
-        finally:
-            session.close()
-    
-    @discord.ui.button(label="Sair", style=discord.ButtonStyle.danger, emoji="❌")
-    async def leave_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para sair da fila"""
+            return
+        
+        if result is QueueResult.IN_OTHER_ROOM:
+            await interaction.response.send_message(
+                f"⚠️ Você já está na fila de {describe_room(previous)}. Deseja mudar para esta?",
+                view=MoveView(self),
+                ephemeral=True
+            )
+            return
         
-        session = get_session()
-        try:
-            match = session.query(Match).filter_by(id=self.match_id).first()
-            
-            if not match:
-                await interaction.response.send_message(
-                    "❌ Partida não encontrada",
-                    ephemeral=True
-                )
-                return
-            
-            # Remover da fila
-            participant = session.query(MatchParticipant).filter_by(
-                match_id=self.match_id,
-                user_id=str(interaction.user.id)
-            ).first()
-            
-            if participant:
-                session.delete(participant)
-                session.commit()
-                
-                if interaction.user.mention in self.players:
-                    self.players.remove(interaction.user.mention)
-                
-                log_action(
-                    str(interaction.guild.id),
-                    str(interaction.user.id),
-                    "leave_queue",
-                    match_id=match.match_id
-                )
-                
-                await interaction.response.send_message(
-                    f"✅ Você saiu da fila de {self.modality_name} {self.mode_name}",
-                    ephemeral=True
-                )
-            else:
-                await interaction.response.send_message(
-                    "⚠️ Você não está nesta fila",
-                    ephemeral=True
-                )
-        
-        finally:
-            session.close()
-    
-    @discord.ui.button(label="Full ump xm8", style=discord.ButtonStyle.primary, emoji="🎮")
-    async def full_ump_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para modo Full UMP"""
         await interaction.response.send_message(
-            "🎮 Modo Full UMP ativado",
+            f"✅ Você entrou na fila de {self.modality_name} {self.mode_name}",
             ephemeral=True
         )
+        
+        await self.after_join(interaction, result, room, previous)
     
-    @discord.ui.button(label="Gelo Infinito", style=discord.ButtonStyle.primary, emoji="❄️")
-    async def infinite_ice_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para modo Gelo Infinito"""
-        await interaction.response.send_message(
-            "❄️ Modo Gelo Infinito ativado",
-            ephemeral=True
+    async def after_join(self, interaction: discord.Interaction, result: QueueResult, room, previous):
+        """Atualiza os painéis e registra a entrada"""
+        user_id = str(interaction.user.id)
+        
+        refresh_room_embed(room)
+        if previous is not None:
+            refresh_room_embed(previous)
+            await log_action(
+                str(interaction.guild.id),
+                user_id,
+                "leave_queue",
+                match_id=previous.room_id
+            )
+        
+        await log_action(
+            str(interaction.guild.id),
+            user_id,
+            "join_queue",
+            match_id=room.room_id
         )
+        
+        if result is QueueResult.FULL:
+            # Dividir os times e escolher o mediador antes de anunciar a sala
+            teams = await assign_teams(room)
+            mediator_id = await mediator_pool.assign(room.guild_id, room.match_id, room.bet_value)
+            lines = [
+                f"**{label}:** " + ", ".join(f"<@{p}>" for p in room.players if teams.get(p) == team)
+                for team, label in (("team1", "Time 1"), ("team2", "Time 2"))
+            ]
+            lines.append(
+                f"**Mediador:** <@{mediator_id}>" if mediator_id
+                else "**Mediador:** aguardando um mediador ficar online"
+            )
+            
+            # Enviar mensagem de sala cheia
+            await outbound.send(
+                room.message.channel if room.message else interaction.channel,
+                priority=Priority.HIGH,
+                content=f"🎮 **Sala cheia!** {self.modality_name} {self.mode_name} está pronta para começar!\n"
+                        + "\n".join(lines)
+            )
     
-    @discord.ui.button(label="Gelo Normal", style=discord.ButtonStyle.primary, emoji="🧊")
-    async def normal_ice_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para modo Gelo Normal"""
+    async def leave(self, interaction: discord.Interaction):
+        """Sai da fila"""
+        
+        user_id = str(interaction.user.id)
+        self.bind_message(interaction.message)
+        result, room = await queue_engine.leave(self.match_id, user_id)
+        
+        if result is QueueResult.NOT_FOUND:
+            await interaction.response.send_message(
+                "❌ Partida não encontrada",
+                ephemeral=True
+            )
+            return
+        
+        if result is QueueResult.NOT_IN:
+            await interaction.response.send_message(
+                "⚠️ Você não está nesta fila",
+                ephemeral=True
+            )
+            return
+        
+        if result is QueueResult.CLOSED:
+            await interaction.response.send_message(
+                "⚠️ A sala já está completa, fale com o mediador",
+                ephemeral=True
+            )
+            return
+        
         await interaction.response.send_message(
-            "🧊 Modo Gelo Normal ativado",
+            f"✅ Você saiu da fila de {self.modality_name} {self.mode_name}",
             ephemeral=True
         )
+        
+        refresh_room_embed(room)
+        
+        await log_action(
+            str(interaction.guild.id),
+            user_id,
+            "leave_queue",
+            match_id=room.room_id
+        )
+    
+    def bind_message(self, message: discord.Message):
+        """Guarda a mensagem e o modo na sala (necessário após reiniciar o bot)"""
+        room = queue_engine.get(self.match_id)
+        if room is None:
+            return
+        room.modality = self.modality_name
+        room.mode = self.mode_name
+        if message is not None:
+            room.message = message
+
+
+class MoveView(discord.ui.View):
+    """Confirmação efêmera para trocar de fila"""
+    
+    def __init__(self, button: QueueButton):
+        super().__init__(timeout=60)
+        self.button = button
+    
+    @discord.ui.button(label="Mover para esta fila", style=discord.ButtonStyle.primary, emoji="🔁")
+    async def move(self, interaction: discord.Interaction, _: discord.ui.Button):
+        button = self.button
+        result, room, previous = await queue_engine.join(
+            button.match_id, str(interaction.user.id), capacity=mode_capacity(button.mode_name), move=True
+        )
+        self.stop()
+        
+        if result not in (QueueResult.JOINED, QueueResult.FULL):
+            await interaction.response.edit_message(
+                content="⚠️ Não foi possível mudar de fila, a sala não está mais disponível",
+                view=None
+            )
+            return
+        
+        await interaction.response.edit_message(
+            content=f"✅ Você entrou na fila de {button.modality_name} {button.mode_name}",
+            view=None
+        )
+        await button.after_join(interaction, result, room, previous)
+
+
+def describe_room(room) -> str:
+    """Nome curto da sala para mensagens"""
+    if room.modality and room.mode:
+        return f"{room.modality} {room.mode}"
+    return f"R$ {room.bet_value:.2f}" if room.bet_value is not None else room.room_id
+
+
+def refresh_room_embed(room):
+    """Agenda a atualização do embed da fila com o roster atual"""
+    message = room.message
+    if message is None or room.modality is None:
+        return
+    
+    color = message.embeds[0].color if message.embeds else None
+    
+    def render():
+        return {"embed": create_match_embed(
+            room.modality, room.mode, room.bet_value,
+            list(room.players), room.capacity, color
+        )}
+    
+    outbound.schedule_edit(message, render)
+
+
+def create_queue_view(match_id: int, modality_name: str, mode_name: str) -> discord.ui.View:
+    """Cria a view com os botões de uma fila"""
+    return static_view(*(
+        QueueButton(action, match_id, modality_name, mode_name) for action in QUEUE_BUTTONS
+    ))
+
+
+def provision_matches(session, guild_id: str, slots: list) -> list:
+    """
+    Cria as partidas de todas as filas com um único INSERT multi-linha.
+    
+    Os IDs de sala são gerados sem colisão entre si e conferidos contra o
+    banco em uma consulta; em seguida uma segunda consulta recupera as chaves
+    primárias. Retorna uma lista de (id, ID da sala, modalidade, modo, valor).
+    """
+    if not slots:
+        return []
+    
+    room_ids = generate_room_ids(len(slots))
+    while True:
+        taken = {
+            row[0] for row in session.query(Match.match_id).filter(Match.match_id.in_(room_ids))
+        }
+        if not taken:
+            break
+        kept = [room_id for room_id in room_ids if room_id not in taken]
+        room_ids = kept + generate_room_ids(len(taken), exclude=set(kept) | taken)
+    
+    now = datetime.utcnow()
+    session.execute(insert(Match).values([
+        {
+            "guild_id": guild_id,
+            "modality_id": None,
+            "mode_id": None,
+            "bet_value": price,
+            "status": WAITING,
+            "match_id": room_id,
+            "match_password": generate_room_password(),
+            "created_at": now,
+        }
+        for room_id, (_, _, price) in zip(room_ids, slots)
+    ]))
+    
+    ids = dict(session.query(Match.match_id, Match.id).filter(Match.match_id.in_(room_ids)))
+    return [(ids[room_id], room_id, *slot) for room_id, slot in zip(room_ids, slots)]
+
+
+async def sync_board(guild, channel, slots: list) -> dict:
+    """
+    Reconcilia o painel de filas do canal com as filas ativas `slots`.
+    
+    Cada fila (modalidade, modo, valor) tem sua mensagem salva em
+    queue_board_slots: mensagens existentes são editadas no lugar, só as
+    filas sem mensagem são enviadas e as de modalidades desativadas são
+    apagadas. Filas cuja sala ainda está em espera e já tem a mensagem
+    ligada nesta execução do bot não geram nenhuma chamada à API.
+    """
+    guild_id = str(guild.id)
+    existing = await run_db(load_board, guild_id)
+    plan = plan_board(existing, slots, str(channel.id))
+    
+    fresh = plan.needs_match()
+    created = await run_db(provision_matches, guild_id, [slot.key for slot in fresh])
+    for slot, (match_pk, room_id, *_) in zip(fresh, created):
+        slot.match_id, slot.room_id = match_pk, room_id
+    
+    counts = {"kept": 0, "edited": 0, "posted": 0, "deleted": 0, "failed": 0}
+    published = []
+    
+    def room_for(slot):
+        room = queue_engine.get(slot.match_id)
+        if room is None:
+            room = queue_engine.register(
+                slot.match_id, slot.room_id, mode_capacity(slot.mode), slot.bet_value, guild_id
+            )
+        room.modality = slot.modality
+        room.mode = slot.mode
+        return room
+    
+    async def publish(slot):
+        room = room_for(slot)
+        kwargs = {
+            "embed": create_match_embed(
+                slot.modality, slot.mode, slot.bet_value, list(room.players), room.capacity
+            ),
+            "view": create_queue_view(slot.match_id, slot.modality, slot.mode),
+        }
+        message = None
+        if slot.message_id is not None:
+            try:
+                message = await outbound.edit(channel.get_partial_message(int(slot.message_id)), **kwargs)
+                counts["edited"] += 1
+            except discord.NotFound:
+                pass  # mensagem apagada no Discord: envia de novo
+        if message is None:
+            message = await outbound.send(channel, **kwargs)
+            counts["posted"] += 1
+        
+        room.message = message
+        slot.channel_id = str(channel.id)
+        slot.message_id = str(message.id)
+        published.append(slot)
+    
+    async def remove(slot):
+        old = channel if slot.channel_id == str(channel.id) else guild.get_channel(int(slot.channel_id))
+        if old is not None:
+            try:
+                await outbound.delete(old.get_partial_message(int(slot.message_id)))
+            except discord.NotFound:
+                pass
+        counts["deleted"] += 1
+    
+    jobs = [remove(slot) for slot in plan.delete]
+    for slot in plan.keep:
+        room = room_for(slot)
+        if room.message is None:
+            jobs.append(publish(slot))  # mensagem de antes de reiniciar: atualiza o roster
+        else:
+            counts["kept"] += 1
+    jobs.extend(publish(slot) for slot in plan.reprovision + plan.post)
+    
+    # O agendador espaça os envios conforme o limite do canal
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    counts["failed"] = len(errors)
+    for error in errors:
+        logger.error(f"Erro ao atualizar o painel de filas da guilda {guild_id}: {error}")
+    
+    # Salas novas sem mensagem não ficam vivas só na memória
+    sent = {id(slot) for slot in published}
+    failed = [slot for slot in fresh if id(slot) not in sent]
+    
+    cancelled = await run_db(save_board, guild_id, published, plan.removed, failed)
+    for match_pk in cancelled:
+        queue_engine.close_room(match_pk)
+    return counts
 
 
 class Filas(commands.Cog):
@@ -168,6 +402,17 @@ class Filas(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        lifecycle.listen(self.rooms_expired)
+    
+    async def rooms_expired(self, kind: str, expired: list):
+        """Atualiza o painel das salas esvaziadas por inatividade"""
+        if kind != QUEUE_IDLE:
+            return
+        for match in expired:
+            room = queue_engine.get(match.match_id)
+            if room is not None:
+                refresh_room_embed(room)
+            await log_action(match.guild_id, self.bot.user.id, "queue_expired", match_id=match.room_id)
     
     @app_commands.command(name="filas", description="Envia as filas ativas para o canal configurado")
     async def filas(self, interaction: discord.Interaction):
@@ -182,52 +427,45 @@ class Filas(commands.Cog):
             return
         
         guild_id = str(interaction.guild.id)
-        guild = get_or_create_guild(guild_id)
+        guild = await get_or_create_guild(guild_id)
         
         await interaction.response.defer()
         
-        session = get_session()
+        # Filas de cada modalidade ativa, na ordem do painel
+        slots = [
+            (modality_name, mode_name, price)
+            for modality_name, modality_config in MODALITIES.items()
+            if modality_config['enabled']
+            for mode_name in modality_config['modes']
+            for price in BET_VALUES
+        ]
+        
+        channel = None
+        if guild.queue_channel_id:
+            channel = interaction.guild.get_channel(int(guild.queue_channel_id))
+        
+        if channel is None:
+            await interaction.followup.send(
+                "❌ Canal das filas não configurado, use /filas-canal",
+                ephemeral=True
+            )
+            return
+        
         try:
-            # Criar filas para cada modalidade ativa
-            for modality_name, modality_config in MODALITIES.items():
-                if not modality_config['enabled']:
-                    continue
-                
-                for mode_name in modality_config['modes']:
-                    for price in BET_VALUES:
-                        # Criar match
-                        match = Match(
-                            guild_id=guild_id,
-                            modality_id=None,
-                            mode_id=None,
-                            bet_value=price,
-                            status='waiting',
-                            match_id=generate_room_id(),
-                            match_password=generate_room_password()
-                        )
-                        session.add(match)
-                        session.flush()
-                        
-                        # Criar embed
-                        embed = create_match_embed(modality_name, mode_name, price)
-                        
-                        # Criar view
-                        view = QueueView(match.id, modality_name, mode_name, price)
-                        
-                        # Enviar para o canal
-                        if guild.queue_channel_id:
-                            channel = interaction.guild.get_channel(int(guild.queue_channel_id))
-                            if channel:
-                                await channel.send(embed=embed, view=view)
-            
-            session.commit()
+            counts = await sync_board(interaction.guild, channel, slots)
             
+            summary = (
+                f"{counts['posted']} enviadas, {counts['edited']} editadas, "
+                f"{counts['kept']} sem mudança, {counts['deleted']} removidas"
+            )
+            if counts["failed"]:
+                summary += f", {counts['failed']} com erro"
             await interaction.followup.send(
-                "✅ Filas enviadas com sucesso!",
+                f"✅ Filas atualizadas: {summary}",
                 ephemeral=True
             )
             
-            log_action(guild_id, str(interaction.user.id), "filas_sent")
+            await log_action(guild_id, str(interaction.user.id), "filas_sent", details=summary)
         
         except Exception as e:
             logger.error(f"Erro ao enviar filas: {e}")
@@ -235,9 +473,6 @@ class Filas(commands.Cog):
                 f"❌ Erro ao enviar filas: {str(e)}",
                 ephemeral=True
             )
-        
-        finally:
-            session.close()
     
     @app_commands.command(name="filas-canal", description="Define o canal para as filas")
     @app_commands.describe(canal="Canal onde as filas serão enviadas")
@@ -253,50 +488,17 @@ class Filas(commands.Cog):
         
         guild_id = str(interaction.guild.id)
         
-        session = get_session()
-        try:
-            guild = session.query(Guild).filter_by(guild_id=guild_id).first()
-            if guild:
-                guild.queue_channel_id = str(canal.id)
-                session.commit()
-                
-                await interaction.response.send_message(
-                    f"✅ Canal das filas definido para {canal.mention}",
-                    ephemeral=True
-                )
-                
-                log_action(guild_id, str(interaction.user.id), "queue_channel_set", details=str(canal.id))
-        
-        finally:
-            session.close()
-
-
-def create_match_embed(modality: str, mode: str, price: float, players: list = None) -> discord.Embed:
-    """Cria o embed de partida"""
-    if players is None:
-        players = []
-    
-    embed = discord.Embed(
-        title=modality,
-        description=f"{modality} {mode}\nR$ {price:.2f}",
-        color=discord.Color.random()
-    )
-    
-    if players:
-        players_text = "\n".join([f"@{p}" for p in players])
-    else:
-        players_text = "Nenhum jogador ainda"
-    
-    embed.add_field(
-        name="🎮 Jogadores",
-        value=players_text,
-        inline=False
-    )
-    
-    embed.set_footer(text="🐿️ Esquilo Aposta")
-    return embed
+        await guild_settings.update(guild_id, queue_channel_id=str(canal.id))
+        
+        await interaction.response.send_message(
+            f"✅ Canal das filas definido para {canal.mention}",
+            ephemeral=True
+        )
+        
+        await log_action(guild_id, str(interaction.user.id), "queue_channel_set", details=str(canal.id))
 
 
 async def setup(bot):
     """Setup da cog"""
+    bot.add_dynamic_items(QueueButton)
     await bot.add_cog(Filas(bot))
@@ -0,0 +1,74 @@
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from utils import log_action
+from sweeper import sweeper
+from config import SWEEP_INTERVAL
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Manutencao(commands.Cog):
+    """Cog da limpeza periódica do banco"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.sweep.change_interval(seconds=SWEEP_INTERVAL)
+    
+    async def cog_load(self):
+        if SWEEP_INTERVAL > 0:
+            self.sweep.start()
+    
+    async def cog_unload(self):
+        self.sweep.cancel()
+    
+    @tasks.loop(hours=1)
+    async def sweep(self):
+        """Varredura em segundo plano"""
+        try:
+            await sweeper.run()
+        except Exception as e:
+            logger.error(f"Erro na limpeza de partidas: {e}")
+    
+    @sweep.before_loop
+    async def before_sweep(self):
+        await self.bot.wait_until_ready()
+    
+    @app_commands.command(name="manutencao", description="Mostra ou executa a limpeza de partidas antigas")
+    @app_commands.describe(executar="Executar uma varredura agora")
+    async def manutencao(self, interaction: discord.Interaction, executar: bool = False):
+        """Comando /manutencao - Estatísticas da limpeza"""
+        
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message(
+                "❌ Você precisa ser administrador para usar este comando",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        stats = await sweeper.run() if executar else sweeper.last_run
+        if stats is None:
+            await interaction.followup.send("ℹ️ Nenhuma limpeza executada ainda", ephemeral=True)
+            return
+        
+        embed = discord.Embed(title="🧹 Limpeza de partidas", color=discord.Color.blue())
+        embed.add_field(name="Salas de espera", value=str(stats["waiting"]), inline=True)
+        embed.add_field(name="Canceladas", value=str(stats["cancelled"]), inline=True)
+        embed.add_field(name="Participantes", value=str(stats["participants"] + stats["orphans"]), inline=True)
+        embed.add_field(name="Blocos", value=str(stats["chunks"]), inline=True)
+        embed.add_field(name="Duração", value=f"{stats['elapsed_ms']:.0f} ms", inline=True)
+        embed.add_field(name="Concluída", value="✅" if stats["complete"] else "⏳ continua na próxima", inline=True)
+        embed.set_footer(text=f"Executada em {stats['finished_at']} UTC")
+        
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        
+        if executar:
+            await log_action(str(interaction.guild.id), str(interaction.user.id), "sweep_run")
+
+
+async def setup(bot):
+    """Setup da cog"""
+    await bot.add_cog(Manutencao(bot))
@@ -2,96 +2,157 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from utils import (
-    get_or_create_guild, get_or_create_user, log_action
+    get_or_create_guild, get_or_create_user, log_action, static_view
 )
-from models import get_session, Match, MatchParticipant, User
-from pix_utils import generate_pix_qrcode, create_pix_embed
+from models import run_db, Match, User
+from pix_utils import create_pix_embed
+from pix_receivers import pix_receivers
+from pix_webhook import pix_webhook, generate_txid
+from config import QR_FORMAT, PIX_WEBHOOK_PORT
+from outbound import outbound, Priority
+from queue_engine import queue_engine
+from leaderboard import leaderboard, changed_players
+from settlement import settle_match, settle_batch, parse_results, MAX_BATCH_BYTES
+from match_state import CONFIRMED, CANCELLED, FINAL_STATUSES, CONFIRMATION, PAYMENT, transition
+from match_lifecycle import lifecycle
+from confirmations import confirmations, ConfirmResult
+from mediators import mediator_pool
+import asyncio
+import csv
 import logging
-from io import BytesIO
+from datetime import datetime
+from io import BytesIO, StringIO
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-class MatchConfirmationView(discord.ui.View):
-    """View para confirmação de partida"""
+CONFIRMATION_BUTTONS = {
+    "confirm": ("Confirmar", discord.ButtonStyle.success, "✅"),
+    "cancel": ("Encerrar", discord.ButtonStyle.danger, "❌"),
+}
+
+
+class ConfirmationButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"partida:(?P<action>confirm|cancel):(?P<match_id>\d+):(?P<mediator_id>\d+)"
+):
+    """Botão persistente do painel de confirmação"""
     
-    def __init__(self, match_id: int, mediator_id: str):
-        super().__init__(timeout=None)
+    def __init__(self, action: str, match_id: int, mediator_id: str):
+        label, style, emoji = CONFIRMATION_BUTTONS[action]
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=style,
+            emoji=emoji,
+            custom_id=f"partida:{action}:{match_id}:{mediator_id}"
+        ))
+        self.action = action
         self.match_id = match_id
         self.mediator_id = mediator_id
-        self.confirmations = set()
     
-    @discord.ui.button(label="Confirmar", style=discord.ButtonStyle.success, emoji="✅")
-    async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para confirmar partida"""
-        
-        self.confirmations.add(str(interaction.user.id))
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], int(match["match_id"]), match["mediator_id"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "confirm":
+            await self.confirm(interaction)
+        else:
+            await self.cancel(interaction)
+    
+    async def confirm(self, interaction: discord.Interaction):
+        """Confirma a partida"""
         
         await interaction.response.defer()
+        channel_id = str(interaction.channel.id)
         
-        session = get_session()
-        try:
+        result, remaining = await confirmations.confirm(self.match_id, str(interaction.user.id))
+        
+        if result is not ConfirmResult.ALL_CONFIRMED:
+            messages = {
+                ConfirmResult.NOT_FOUND: "❌ Partida não encontrada",
+                ConfirmResult.CLOSED: "❌ Esta partida não pode ser confirmada (sala incompleta ou já encerrada)",
+                ConfirmResult.NOT_PARTICIPANT: "❌ Apenas os jogadores da partida podem confirmar",
+                ConfirmResult.ALREADY: f"⚠️ Você já confirmou ({remaining} confirmações restantes)",
+                ConfirmResult.CONFIRMED: f"✅ Você confirmou! Aguardando os outros jogadores ({remaining} restantes)...",
+            }
+            await interaction.followup.send(messages[result], ephemeral=True)
+            return
+        
+        def _confirm(session):
             match = session.query(Match).filter_by(id=self.match_id).first()
-            
             if not match:
-                await interaction.followup.send(
-                    "❌ Partida não encontrada",
-                    ephemeral=True
-                )
-                return
+                return None, None
             
-            # Verificar se todos confirmaram
-            participants = session.query(MatchParticipant).filter_by(match_id=self.match_id).all()
-            participant_ids = {p.user_id for p in participants}
+            # Todos confirmaram
+            values = {"confirmed_at": datetime.utcnow()}
             
-            if participant_ids.issubset(self.confirmations):
-                # Todos confirmaram
-                match.status = 'confirmed'
-                session.commit()
-                
-                # Gerar QR Code Pix
-                try:
-                    qr_code_bytes = generate_pix_qrcode(match.bet_value, f"Aposta {match.match_id}")
-                    
-                    # Criar arquivo
-                    file = discord.File(qr_code_bytes, filename="pix_qrcode.png")
-                    
-                    # Mediador
-                    mediator = session.query(User).filter_by(user_id=self.mediator_id).first()
-                    mediator_name = mediator.username if mediator else "Mediador"
-                    
-                    # Criar embed
-                    embed = create_pix_embed(match.bet_value, match.match_id, mediator_name)
-                    
-                    # Enviar QR Code
-                    await interaction.channel.send(
-                        embed=embed,
-                        file=file
-                    )
-                    
-                    log_action(
-                        str(interaction.guild.id),
-                        str(interaction.user.id),
-                        "match_confirmed",
-                        match_id=match.match_id
-                    )
-                
-                except Exception as e:
-                    logger.error(f"Erro ao gerar QR Code: {e}")
-                    await interaction.channel.send(
-                        f"❌ Erro ao gerar QR Code: {str(e)}"
-                    )
-            else:
-                await interaction.followup.send(
-                    f"✅ Você confirmou! Aguardando confirmação dos outros jogadores...",
-                    ephemeral=True
-                )
+            # Com o webhook ativo, a cobrança leva um txid próprio para conciliar o pagamento
+            if PIX_WEBHOOK_PORT and not match.txid:
+                values.update(txid=generate_txid(), confirmation_channel_id=channel_id)
+            
+            # UPDATE guardado: um prazo vencido ou um cancelamento no meio do caminho vence
+            if not transition(session, [self.match_id], CONFIRMED, **values):
+                return None, None
+            session.refresh(match)
+            
+            # Mediador
+            mediator = session.query(User).filter_by(
+                user_id=self.mediator_id, guild_id=match.guild_id
+            ).first()
+            mediator_name = mediator.username if mediator else "Mediador"
+            return match, mediator_name
+        
+        match, mediator_name = await run_db(_confirm)
+        confirmations.forget(self.match_id)
+        
+        if not match:
+            await interaction.followup.send(
+                "❌ Esta partida não pode ser confirmada (sala incompleta ou já encerrada)",
+                ephemeral=True
+            )
+            return
         
-        finally:
-            session.close()
+        lifecycle.confirmed(match.id, charged=match.txid is not None)
+        
+        # Gerar QR Code Pix
+        try:
+            # Pix do mediador da partida; renderizado no pool e em cache
+            receiver = await pix_receivers.get(match.guild_id, self.mediator_id)
+            if receiver is None:
+                raise ValueError("nem o mediador nem o bot têm chave Pix configurada")
+            image = await pix_receivers.render(receiver, match.bet_value, match.txid)
+            
+            # Criar arquivo
+            file = discord.File(BytesIO(image), filename=f"pix_qrcode.{QR_FORMAT}")
+            
+            # Criar embed
+            embed = create_pix_embed(match.bet_value, match.match_id, mediator_name, receiver.key)
+            
+            # Enviar QR Code
+            await outbound.send(
+                interaction.channel,
+                priority=Priority.HIGH,
+                embed=embed,
+                file=file
+            )
+            
+            await log_action(
+                str(interaction.guild.id),
+                str(interaction.user.id),
+                "match_confirmed",
+                match_id=match.match_id
+            )
+        
+        except Exception as e:
+            logger.error(f"Erro ao gerar QR Code: {e}")
+            await outbound.send(
+                interaction.channel,
+                content=f"❌ Erro ao gerar QR Code: {str(e)}"
+            )
     
-    @discord.ui.button(label="Encerrar", style=discord.ButtonStyle.danger, emoji="❌")
-    async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para encerrar partida"""
+    async def cancel(self, interaction: discord.Interaction):
+        """Encerra a partida"""
         
         # Apenas mediador pode encerrar
         if str(interaction.user.id) != self.mediator_id:
@@ -101,28 +162,54 @@ class MatchConfirmationView(discord.ui.View):
             )
             return
         
-        session = get_session()
-        try:
-            match = session.query(Match).filter_by(id=self.match_id).first()
-            
-            if match:
-                match.status = 'cancelled'
-                session.commit()
-                
-                await interaction.response.send_message(
-                    "❌ Partida encerrada pelo mediador",
-                    ephemeral=False
-                )
-                
-                log_action(
-                    str(interaction.guild.id),
-                    str(interaction.user.id),
-                    "match_cancelled",
-                    match_id=match.match_id
-                )
+        def _cancel(session):
+            room_id = session.query(Match.match_id).filter_by(id=self.match_id).scalar()
+            if room_id is None:
+                return None, False
+            return room_id, bool(transition(session, [self.match_id], CANCELLED))
+        
+        room_id, cancelled = await run_db(_cancel)
         
-        finally:
-            session.close()
+        if room_id and not cancelled:
+            await interaction.response.send_message(
+                "⚠️ Esta partida já foi finalizada",
+                ephemeral=True
+            )
+            return
+        
+        confirmations.forget(self.match_id)
+        queue_engine.close_room(self.match_id)
+        mediator_pool.release(self.match_id)
+        
+        if room_id:
+            await interaction.response.send_message(
+                "❌ Partida encerrada pelo mediador",
+                ephemeral=False
+            )
+            
+            await log_action(
+                str(interaction.guild.id),
+                str(interaction.user.id),
+                "match_cancelled",
+                match_id=room_id
+            )
+
+
+def create_confirmation_view(match_id: int, mediator_id: str) -> discord.ui.View:
+    """Cria a view do painel de confirmação"""
+    return static_view(*(
+        ConfirmationButton(action, match_id, mediator_id) for action in CONFIRMATION_BUTTONS
+    ))
+
+
+def can_settle(member: discord.Member, guild) -> bool:
+    """Mediadores (cargo configurado na central) e quem gerencia o servidor"""
+    permissions = member.guild_permissions
+    if permissions.administrator or permissions.manage_guild:
+        return True
+    return bool(guild.mediator_role_id) and any(
+        str(role.id) == guild.mediator_role_id for role in member.roles
+    )
 
 
 class MatchFlow(commands.Cog):
@@ -130,86 +217,143 @@ class MatchFlow(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        pix_webhook.on_paid = self.notify_paid
+        lifecycle.listen(self.notify_expired)
+    
+    async def notify_paid(self, paid: list):
+        """Avisa no canal da confirmação cada partida paga pelo webhook Pix"""
+        
+        async def _notify(match):
+            lifecycle.paid(match.id)
+            channel = self.bot.get_channel(int(match.channel_id)) if match.channel_id else None
+            if channel:
+                await outbound.send(
+                    channel,
+                    priority=Priority.HIGH,
+                    content=f"💸 Pagamento de R$ {match.amount:.2f} recebido para a partida `{match.match_id}`!"
+                )
+            await log_action(match.guild_id, match.mediator_id, "match_paid", match_id=match.match_id)
+        
+        await asyncio.gather(*(_notify(match) for match in paid), return_exceptions=True)
+    
+    async def notify_expired(self, kind: str, expired: list):
+        """Avisa as partidas canceladas por falta de confirmação ou de pagamento"""
+        if kind not in (CONFIRMATION, PAYMENT):
+            return
+        reason = "não foi confirmada" if kind == CONFIRMATION else "não foi paga"
+        
+        async def _notify(match):
+            confirmations.forget(match.match_id)
+            channel = self.bot.get_channel(match.channel_id) if match.channel_id else None
+            if channel:
+                await outbound.send(
+                    channel,
+                    content=f"⌛ Partida `{match.room_id}` cancelada: {reason} a tempo"
+                )
+            await log_action(match.guild_id, self.bot.user.id, "match_expired", match_id=match.room_id, details=kind)
+        
+        await asyncio.gather(*(_notify(match) for match in expired), return_exceptions=True)
     
     @app_commands.command(name="confirmar-partida", description="Cria painel de confirmação de partida")
     @app_commands.describe(
         match_id="ID da partida",
-        mediador="Mediador da partida"
+        mediador="Mediador da partida (padrão: o mediador atribuído automaticamente)"
     )
     async def confirmar_partida(
         self,
         interaction: discord.Interaction,
         match_id: str,
-        mediador: discord.User
+        mediador: Optional[discord.User] = None
     ):
         """Comando para criar painel de confirmação"""
         
         guild_id = str(interaction.guild.id)
         
-        session = get_session()
-        try:
+        def _load(session):
             match = session.query(Match).filter_by(match_id=match_id).first()
-            
             if not match:
-                await interaction.response.send_message(
-                    "❌ Partida não encontrada",
-                    ephemeral=True
-                )
-                return
-            
-            # Criar embed de confirmação
-            embed = discord.Embed(
-                title="🎮 Confirmação de Partida",
-                description=f"Clique em **Confirmar** para iniciar a partida",
-                color=discord.Color.blue()
-            )
-            
-            embed.add_field(
-                name="📱 Modalidade",
-                value=match.modality.name if match.modality else "N/A",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="🎯 Modo",
-                value=match.mode.name if match.mode else "N/A",
-                inline=True
-            )
-            
-            embed.add_field(
-                name="💰 Valor",
-                value=f"R$ {match.bet_value:.2f}",
-                inline=True
+                return None, None, None
+            return (
+                match,
+                match.modality.name if match.modality else "N/A",
+                match.mode.name if match.mode else "N/A"
             )
-            
-            embed.add_field(
-                name="🆔 ID da Sala",
-                value=f"`{match.match_id}`",
-                inline=False
+        
+        match, modality_name, mode_name = await run_db(_load)
+        
+        if not match:
+            await interaction.response.send_message(
+                "❌ Partida não encontrada",
+                ephemeral=True
             )
-            
-            embed.add_field(
-                name="🔐 Senha",
-                value=f"`{match.match_password}`",
-                inline=False
+            return
+        
+        if mediador is not None:
+            mediator_id = str(mediador.id)
+        else:
+            mediator_id = (
+                mediator_pool.assignment(match.id)
+                or await mediator_pool.assign(match.guild_id, match.id, match.bet_value)
             )
-            
-            embed.set_footer(text="🐿️ Esquilo Aposta")
-            
-            # Criar view
-            view = MatchConfirmationView(match.id, str(mediador.id))
-            
-            await interaction.response.send_message(embed=embed, view=view)
-            
-            log_action(
-                guild_id,
-                str(interaction.user.id),
-                "match_confirmation_panel_created",
-                match_id=match_id
+        if mediator_id is None:
+            await interaction.response.send_message(
+                "❌ Nenhum mediador online para esta partida; informe o mediador manualmente",
+                ephemeral=True
             )
+            return
+        
+        # Criar embed de confirmação
+        embed = discord.Embed(
+            title="🎮 Confirmação de Partida",
+            description=f"Clique em **Confirmar** para iniciar a partida",
+            color=discord.Color.blue()
+        )
+        
+        embed.add_field(
+            name="📱 Modalidade",
+            value=modality_name,
+            inline=True
+        )
+        
+        embed.add_field(
+            name="🎯 Modo",
+            value=mode_name,
+            inline=True
+        )
+        
+        embed.add_field(
+            name="💰 Valor",
+            value=f"R$ {match.bet_value:.2f}",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="🆔 ID da Sala",
+            value=f"`{match.match_id}`",
+            inline=False
+        )
+        
+        embed.add_field(
+            name="🔐 Senha",
+            value=f"`{match.match_password}`",
+            inline=False
+        )
+        
+        embed.set_footer(text="🐿️ Esquilo Aposta")
         
-        finally:
-            session.close()
+        # Criar view
+        view = create_confirmation_view(match.id, mediator_id)
+        
+        # Com o painel criado o mediador não muda mais
+        mediator_pool.pin(match.id)
+        await interaction.response.send_message(content=f"<@{mediator_id}>", embed=embed, view=view)
+        
+        await log_action(
+            guild_id,
+            str(interaction.user.id),
+            "match_confirmation_panel_created",
+            match_id=match_id
+        )
     
     @app_commands.command(name="resultado", description="Registra o resultado da partida")
     @app_commands.describe(
@@ -232,53 +376,145 @@ class MatchFlow(commands.Cog):
             return
         
         guild_id = str(interaction.guild.id)
+        guild = await get_or_create_guild(guild_id)
         
-        session = get_session()
-        try:
-            match = session.query(Match).filter_by(match_id=match_id).first()
-            
-            if not match:
-                await interaction.response.send_message(
-                    "❌ Partida não encontrada",
-                    ephemeral=True
-                )
-                return
-            
-            match.status = 'completed'
-            match.winner_team = vencedor
-            
-            # Atualizar estatísticas dos jogadores
-            participants = session.query(MatchParticipant).filter_by(match_id=match.id).all()
-            
-            for participant in participants:
-                user = session.query(User).filter_by(user_id=participant.user_id).first()
-                
-                if user:
-                    if participant.team == vencedor:
-                        user.wins += 1
-                        user.coins += match.bet_value
-                    else:
-                        user.losses += 1
-            
-            session.commit()
+        def _register(session):
+            row = session.query(Match.id, Match.status).filter_by(match_id=match_id, guild_id=guild_id).first()
+            if row is None:
+                return None, None, False, []
             
+            settled = settle_match(
+                session, guild_id, row.id, vencedor, guild.coins_winner, guild.coins_loser
+            )
+            return row.id, row.status, settled, changed_players(session, guild_id, [row.id]) if settled else []
+        
+        match_pk, status, settled, players = await run_db(_register)
+        
+        if match_pk is None:
             await interaction.response.send_message(
-                f"✅ Resultado registrado! Time {vencedor} venceu!",
+                "❌ Partida não encontrada",
                 ephemeral=True
             )
-            
-            log_action(
-                guild_id,
-                str(interaction.user.id),
-                "match_result_registered",
-                match_id=match_id,
-                details=f"Vencedor: {vencedor}"
+            return
+        
+        if not settled:
+            await interaction.response.send_message(
+                "⚠️ O resultado desta partida já foi registrado" if status in FINAL_STATUSES
+                else "⚠️ A partida ainda não começou (sala em espera)",
+                ephemeral=True
             )
+            return
+        
+        queue_engine.close_room(match_pk)
+        mediator_pool.release(match_pk)
+        leaderboard.apply(guild_id, players)
+        
+        await interaction.response.send_message(
+            f"✅ Resultado registrado! Time {vencedor} venceu!",
+            ephemeral=True
+        )
+        
+        await log_action(
+            guild_id,
+            str(interaction.user.id),
+            "match_result_registered",
+            match_id=match_id,
+            details=f"Vencedor: {vencedor}"
+        )
         
-        finally:
-            session.close()
+        # Espelhar no canal de log de partidas, sem disputar com envios urgentes
+        if guild.match_log_channel_id:
+            channel = interaction.guild.get_channel(int(guild.match_log_channel_id))
+            if channel:
+                await outbound.send(
+                    channel,
+                    priority=Priority.LOW,
+                    content=f"📋 Partida `{match_id}` finalizada por {interaction.user.mention} — vencedor: {vencedor}"
+                )
 
+    
+    @app_commands.command(name="resultado-lote", description="Registra vários resultados a partir de um arquivo")
+    @app_commands.describe(arquivo="CSV ou JSON com pares match_id,winner")
+    async def resultado_lote(self, interaction: discord.Interaction, arquivo: discord.Attachment):
+        """Comando para registrar resultados em lote"""
+        
+        if not arquivo.filename.lower().endswith(('.csv', '.json')):
+            await interaction.response.send_message(
+                "❌ Envie um arquivo .csv ou .json",
+                ephemeral=True
+            )
+            return
+        
+        if arquivo.size > MAX_BATCH_BYTES:
+            await interaction.response.send_message(
+                f"❌ Arquivo muito grande (máximo {MAX_BATCH_BYTES // 1000} KB)",
+                ephemeral=True
+            )
+            return
+        
+        guild_id = str(interaction.guild.id)
+        guild = await get_or_create_guild(guild_id)
+        
+        if not can_settle(interaction.user, guild):
+            await interaction.response.send_message(
+                "❌ Apenas mediadores podem registrar resultados em lote",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        data = await arquivo.read()
+        
+        def _import(session):
+            report = settle_batch(
+                session, guild_id, parse_results(data, arquivo.filename),
+                guild.coins_winner, guild.coins_loser
+            )
+            settled = [match_pk for _, _, outcome, match_pk in report if outcome == 'ok']
+            return report, changed_players(session, guild_id, settled)
+        
+        try:
+            report, players = await run_db(_import)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ Arquivo inválido: {e}", ephemeral=True)
+            return
+        
+        settled = [entry for entry in report if entry[2] == 'ok']
+        for _, _, _, match_pk in settled:
+            queue_engine.close_room(match_pk)
+            mediator_pool.release(match_pk)
+        leaderboard.apply(guild_id, players)
+        
+        # Relatório linha a linha em anexo
+        output = StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["linha", "match_id", "situacao"])
+        writer.writerows((line, match_id, outcome) for line, match_id, outcome, _ in report)
+        
+        await interaction.followup.send(
+            f"✅ {len(settled)} de {len(report)} resultados registrados",
+            file=discord.File(BytesIO(output.getvalue().encode('utf-8')), filename="relatorio.csv"),
+            ephemeral=True
+        )
+        
+        await log_action(
+            guild_id,
+            str(interaction.user.id),
+            "match_results_imported",
+            details=f"{len(settled)}/{len(report)}"
+        )
+        
+        if settled and guild.match_log_channel_id:
+            channel = interaction.guild.get_channel(int(guild.match_log_channel_id))
+            if channel:
+                await outbound.send(
+                    channel,
+                    priority=Priority.LOW,
+                    content=f"📋 {len(settled)} partidas finalizadas em lote por {interaction.user.mention}"
+                )
 
 async def setup(bot):
     """Setup da cog"""
+    bot.add_dynamic_items(ConfirmationButton)
     await bot.add_cog(MatchFlow(bot))
@@ -3,26 +3,60 @@ from discord.ext import commands
 from discord import app_commands
 from utils import (
     get_or_create_guild, get_or_create_user, create_mediator_panel_embed,
-    create_room_info_embed, log_action
+    create_room_info_embed, log_action, static_view
 )
-from models import get_session, Guild, User
+from guild_settings import guild_settings
+from outbound import outbound
+from models import run_db, User
+from pix_receivers import pix_receivers
+from mediators import mediator_pool
+from queue_engine import queue_engine
+from typing import Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-class MediatorPanelView(discord.ui.View):
-    """View para o painel de mediador"""
+MEDIATOR_BUTTONS = {
+    "enter": ("Entrar", discord.ButtonStyle.success, "✅"),
+    "leave": ("Sair", discord.ButtonStyle.danger, "❌"),
+    "pix": ("Configurar Pix", discord.ButtonStyle.primary, "💳"),
+}
+
+
+class MediatorPanelButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"mediador:(?P<action>enter|leave|pix):(?P<guild_id>\d+)"
+):
+    """Botão persistente do painel de mediador"""
     
-    def __init__(self, guild_id: str):
-        super().__init__(timeout=None)
+    def __init__(self, action: str, guild_id: str):
+        label, style, emoji = MEDIATOR_BUTTONS[action]
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=style,
+            emoji=emoji,
+            custom_id=f"mediador:{action}:{guild_id}"
+        ))
+        self.action = action
         self.guild_id = guild_id
     
-    @discord.ui.button(label="Entrar", style=discord.ButtonStyle.success, emoji="✅")
-    async def enter_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para entrar como mediador"""
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], match["guild_id"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "enter":
+            await self.enter(interaction)
+        elif self.action == "leave":
+            await self.leave(interaction)
+        else:
+            await self.configure_pix(interaction)
+    
+    async def enter(self, interaction: discord.Interaction):
+        """Entra como mediador"""
         
-        session = get_session()
-        try:
+        def _login(session):
             user = session.query(User).filter_by(
                 user_id=str(interaction.user.id),
                 guild_id=str(self.guild_id)
@@ -38,29 +72,31 @@ class MediatorPanelView(discord.ui.View):
                 session.add(user)
             else:
                 user.is_mediator = True
-            
-            session.commit()
-            
-            log_action(
-                str(self.guild_id),
-                str(interaction.user.id),
-                "mediator_login"
-            )
-            
-            await interaction.response.send_message(
-                "✅ Você entrou como mediador!",
-                ephemeral=True
-            )
+            return user.mediator_min_bet, user.mediator_max_bet
+        
+        min_bet, max_bet = await run_db(_login)
         
-        finally:
-            session.close()
+        await interaction.response.send_message(
+            "✅ Você entrou como mediador!",
+            ephemeral=True
+        )
+        
+        pix_receivers.prewarm(await pix_receivers.get(self.guild_id, interaction.user.id))
+        
+        # Salas cheias que esperavam um mediador
+        assigned = await mediator_pool.login(str(self.guild_id), str(interaction.user.id), min_bet, max_bet)
+        await announce_mediators(assigned)
+        
+        await log_action(
+            str(self.guild_id),
+            str(interaction.user.id),
+            "mediator_login"
+        )
     
-    @discord.ui.button(label="Sair", style=discord.ButtonStyle.danger, emoji="❌")
-    async def leave_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para sair como mediador"""
+    async def leave(self, interaction: discord.Interaction):
+        """Sai como mediador"""
         
-        session = get_session()
-        try:
+        def _logout(session):
             user = session.query(User).filter_by(
                 user_id=str(interaction.user.id),
                 guild_id=str(self.guild_id)
@@ -68,30 +104,53 @@ class MediatorPanelView(discord.ui.View):
             
             if user:
                 user.is_mediator = False
-                session.commit()
-                
-                log_action(
-                    str(self.guild_id),
-                    str(interaction.user.id),
-                    "mediator_logout"
-                )
-                
-                await interaction.response.send_message(
-                    "✅ Você saiu como mediador!",
-                    ephemeral=True
-                )
+                return True
+            return False
         
-        finally:
-            session.close()
+        if await run_db(_logout):
+            await interaction.response.send_message(
+                "✅ Você saiu como mediador!",
+                ephemeral=True
+            )
+            
+            # Suas salas ainda sem painel de confirmação passam para outros mediadores
+            moved = await mediator_pool.logout(str(self.guild_id), str(interaction.user.id))
+            await announce_mediators(moved)
+            
+            await log_action(
+                str(self.guild_id),
+                str(interaction.user.id),
+                "mediator_logout"
+            )
     
-    @discord.ui.button(label="Configurar Pix", style=discord.ButtonStyle.primary, emoji="💳")
-    async def configure_pix_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para configurar Pix"""
+    async def configure_pix(self, interaction: discord.Interaction):
+        """Abre o formulário de Pix"""
         
         modal = PixConfigModal(self.guild_id)
         await interaction.response.send_modal(modal)
 
 
+async def announce_mediators(assignments: list):
+    """Avisa no canal da fila o mediador (novo) de cada sala [(partida, mediador ou None)]"""
+    
+    async def _announce(match_id, mediator_id):
+        room = queue_engine.get(match_id)
+        if room is None or room.message is None:
+            return
+        text = (
+            f"🧑‍⚖️ Mediador da sala `{room.room_id}`: <@{mediator_id}>" if mediator_id
+            else f"⏳ A sala `{room.room_id}` está aguardando um mediador ficar online"
+        )
+        await outbound.send(room.message.channel, content=text)
+    
+    await asyncio.gather(*(_announce(*assignment) for assignment in assignments), return_exceptions=True)
+
+
+def create_mediator_panel_view(guild_id: str) -> discord.ui.View:
+    """Cria a view do painel de mediador"""
+    return static_view(*(MediatorPanelButton(action, guild_id) for action in MEDIATOR_BUTTONS))
+
+
 class PixConfigModal(discord.ui.Modal, title="Configurar Pix"):
     """Modal para configurar dados de Pix"""
     
@@ -118,8 +177,7 @@ class PixConfigModal(discord.ui.Modal, title="Configurar Pix"):
         self.guild_id = guild_id
     
     async def on_submit(self, interaction: discord.Interaction):
-        session = get_session()
-        try:
+        def _save(session):
             user = session.query(User).filter_by(
                 user_id=str(interaction.user.id),
                 guild_id=str(self.guild_id)
@@ -136,22 +194,22 @@ class PixConfigModal(discord.ui.Modal, title="Configurar Pix"):
             user.pix_bank = self.bank.value
             user.pix_account_holder = self.account_holder.value
             user.pix_key = self.pix_key.value
-            
-            session.commit()
-            
-            log_action(
-                str(self.guild_id),
-                str(interaction.user.id),
-                "pix_configured"
-            )
-            
-            await interaction.response.send_message(
-                "✅ Dados de Pix configurados com sucesso!",
-                ephemeral=True
-            )
         
-        finally:
-            session.close()
+        await run_db(_save)
+        
+        await interaction.response.send_message(
+            "✅ Dados de Pix configurados com sucesso!",
+            ephemeral=True
+        )
+        
+        # Troca o recebedor em cache e pré-renderiza os QR Codes da nova chave
+        await pix_receivers.invalidate(self.guild_id, interaction.user.id)
+        
+        await log_action(
+            str(self.guild_id),
+            str(interaction.user.id),
+            "pix_configured"
+        )
 
 
 class Mediador(commands.Cog):
@@ -172,30 +230,74 @@ class Mediador(commands.Cog):
             )
             return
         
+        # O envio do painel espera a vez do canal no agendador: responde antes
+        await interaction.response.defer(ephemeral=True)
+        
         guild_id = str(interaction.guild.id)
         
-        session = get_session()
-        try:
-            guild = session.query(Guild).filter_by(guild_id=guild_id).first()
-            if guild:
-                guild.mediator_panel_channel_id = str(canal.id)
-                session.commit()
-                
-                # Enviar embed do painel
-                embed = create_mediator_panel_embed()
-                view = MediatorPanelView(guild_id)
-                
-                await canal.send(embed=embed, view=view)
-                
-                await interaction.response.send_message(
-                    f"✅ Painel de mediador enviado para {canal.mention}",
-                    ephemeral=True
-                )
-                
-                log_action(guild_id, str(interaction.user.id), "mediator_panel_set", details=str(canal.id))
+        await guild_settings.update(guild_id, mediator_panel_channel_id=str(canal.id))
+        
+        # Enviar embed do painel
+        embed = create_mediator_panel_embed()
+        view = create_mediator_panel_view(guild_id)
+        
+        await outbound.send(canal, embed=embed, view=view)
+        
+        await interaction.followup.send(
+            f"✅ Painel de mediador enviado para {canal.mention}",
+            ephemeral=True
+        )
+        
+        await log_action(guild_id, str(interaction.user.id), "mediator_panel_set", details=str(canal.id))
+    
+    @app_commands.command(name="mediador-faixa", description="Define a faixa de apostas que você media")
+    @app_commands.describe(
+        minimo="Menor valor de aposta (vazio = sem mínimo)",
+        maximo="Maior valor de aposta (vazio = sem máximo)"
+    )
+    async def mediador_faixa(
+        self,
+        interaction: discord.Interaction,
+        minimo: Optional[float] = None,
+        maximo: Optional[float] = None
+    ):
+        """Comando /mediador-faixa - Especialização por valor de aposta"""
+        
+        if minimo is not None and maximo is not None and minimo > maximo:
+            await interaction.response.send_message(
+                "❌ O mínimo não pode ser maior que o máximo",
+                ephemeral=True
+            )
+            return
+        
+        guild_id = str(interaction.guild.id)
+        user_id = str(interaction.user.id)
+        
+        def _save(session):
+            user = session.query(User).filter_by(user_id=user_id, guild_id=guild_id).first()
+            if not user or not user.is_mediator:
+                return False
+            user.mediator_min_bet = minimo
+            user.mediator_max_bet = maximo
+            return True
+        
+        if not await run_db(_save):
+            await interaction.response.send_message(
+                "❌ Entre como mediador no painel antes de definir a faixa",
+                ephemeral=True
+            )
+            return
+        
+        assigned = await mediator_pool.login(guild_id, user_id, minimo, maximo)
+        
+        faixa = f"R$ {minimo or 0:.2f} a " + (f"R$ {maximo:.2f}" if maximo is not None else "qualquer valor")
+        await interaction.response.send_message(
+            f"✅ Você mediará apostas de {faixa}",
+            ephemeral=True
+        )
+        await announce_mediators(assigned)
         
-        finally:
-            session.close()
+        await log_action(guild_id, user_id, "mediator_range_set", details=faixa)
     
     @app_commands.command(name="id", description="Informa o ID e senha da sala")
     @app_commands.describe(
@@ -211,7 +313,7 @@ class Mediador(commands.Cog):
         
         await interaction.response.send_message(embed=embed)
         
-        log_action(
+        await log_action(
             guild_id,
             str(interaction.user.id),
             "room_info_sent",
@@ -221,4 +323,5 @@ class Mediador(commands.Cog):
 
 async def setup(bot):
     """Setup da cog"""
+    bot.add_dynamic_items(MediatorPanelButton)
     await bot.add_cog(Mediador(bot))
@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands
 from utils import get_or_create_user, create_profile_embed, log_action
-from models import get_session, User
+from outbound import outbound
+from leaderboard import leaderboard
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,35 +22,19 @@ class Perfil(commands.Cog):
         
         guild_id = str(ctx.guild.id)
         
-        session = get_session()
-        try:
-            db_user = session.query(User).filter_by(
-                user_id=str(user.id),
-                guild_id=guild_id
-            ).first()
-            
-            if not db_user:
-                db_user = User(
-                    user_id=str(user.id),
-                    guild_id=guild_id,
-                    username=user.name
-                )
-                session.add(db_user)
-                session.commit()
-            
-            embed = create_profile_embed(db_user)
-            
-            await ctx.send(embed=embed)
-            
-            log_action(
-                guild_id,
-                str(ctx.author.id),
-                "profile_viewed",
-                details=f"Perfil de {user.name}"
-            )
+        db_user = await get_or_create_user(str(user.id), guild_id, user.name)
         
-        finally:
-            session.close()
+        leaderboard.apply(guild_id, [(db_user.user_id, db_user.wins, db_user.losses, db_user.coins)])
+        embed = create_profile_embed(db_user, leaderboard.rank(guild_id, db_user.user_id))
+        
+        await outbound.send(ctx.channel, embed=embed)
+        
+        await log_action(
+            guild_id,
+            str(ctx.author.id),
+            "profile_viewed",
+            details=f"Perfil de {user.name}"
+        )
 
 
 async def setup(bot):
@@ -0,0 +1,78 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils import create_ranking_embed, log_action, static_view
+from leaderboard import leaderboard, METRICS
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 10
+
+
+class RankingPageButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"ranking:(?P<metric>wins|winrate|coins):(?P<page>\d+):(?P<direction>prev|next)"
+):
+    """Botão persistente de paginação do ranking"""
+    
+    def __init__(self, metric: str, page: int, direction: str, disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label="Anterior" if direction == "prev" else "Próxima",
+            style=discord.ButtonStyle.secondary,
+            emoji="⬅️" if direction == "prev" else "➡️",
+            custom_id=f"ranking:{metric}:{page}:{direction}",
+            disabled=disabled
+        ))
+        self.metric = metric
+        self.page = page
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["metric"], int(match["page"]), match["direction"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        embed, view = render_ranking(str(interaction.guild.id), self.metric, self.page)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+
+def render_ranking(guild_id: str, metric: str, page: int) -> tuple:
+    """Monta o embed e os botões de uma página do ranking"""
+    pages = max((leaderboard.size(guild_id, metric) + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    page = min(max(page, 0), pages - 1)
+    rows = leaderboard.page(guild_id, metric, page, PAGE_SIZE)
+    
+    embed = create_ranking_embed(METRICS[metric], rows, page, pages)
+    view = static_view(
+        RankingPageButton(metric, max(page - 1, 0), "prev", disabled=page == 0),
+        RankingPageButton(metric, page + 1, "next", disabled=page >= pages - 1)
+    )
+    return embed, view
+
+
+class Ranking(commands.Cog):
+    """Cog para o comando /ranking"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @app_commands.command(name="ranking", description="Mostra o ranking dos jogadores")
+    @app_commands.describe(criterio="Critério de ordenação")
+    @app_commands.choices(criterio=[
+        app_commands.Choice(name=label, value=metric) for metric, label in METRICS.items()
+    ])
+    async def ranking(self, interaction: discord.Interaction, criterio: str = "wins"):
+        """Comando /ranking - Mostra o ranking da guilda"""
+        
+        guild_id = str(interaction.guild.id)
+        embed, view = render_ranking(guild_id, criterio, 0)
+        
+        await interaction.response.send_message(embed=embed, view=view)
+        
+        await log_action(guild_id, str(interaction.user.id), "ranking_viewed", details=criterio)
+
+
+async def setup(bot):
+    """Setup da cog"""
+    bot.add_dynamic_items(RankingPageButton)
+    await bot.add_cog(Ranking(bot))
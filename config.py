@@ -13,6 +13,15 @@ DB_USER = os.getenv('DB_USER', 'root')
 DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 DB_NAME = os.getenv('DB_NAME', 'bot_esquilo_aposta')
 DB_PORT = int(os.getenv('DB_PORT', 3306))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+
+# Audit Log Configuration
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 200))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 2.0))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 5000))
+
+# Cache Configuration
+GUILD_CACHE_TTL = float(os.getenv('GUILD_CACHE_TTL', 300))
 
 # Database URL for SQLAlchemy
 DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
@@ -29,6 +38,55 @@ ROOM_PRICE = float(os.getenv('ROOM_PRICE', 0.40))
 COINS_WINNER = int(os.getenv('COINS_WINNER', 1))
 COINS_LOSER = int(os.getenv('COINS_LOSER', 0))
 
+# Queue write-behind: seconds between persisting queue changes
+QUEUE_FLUSH_INTERVAL = float(os.getenv('QUEUE_FLUSH_INTERVAL', 1.0))
+
+# Match deadlines (seconds, 0 disables): idle waiting room, full room without
+# confirmation and confirmed match without payment (only with the Pix webhook)
+QUEUE_IDLE_TIMEOUT = float(os.getenv('QUEUE_IDLE_TIMEOUT', 1800))
+CONFIRMATION_TIMEOUT = float(os.getenv('CONFIRMATION_TIMEOUT', 900))
+PAYMENT_TIMEOUT = float(os.getenv('PAYMENT_TIMEOUT', 1800))
+# Timer wheel resolution: seconds per tick and number of slots
+DEADLINE_TICK = float(os.getenv('DEADLINE_TICK', 1.0))
+DEADLINE_SLOTS = int(os.getenv('DEADLINE_SLOTS', 512))
+
+# Maintenance sweeper: run interval (s), rows per chunk, pause between chunks (s),
+# chunks per run, and retention in days for empty waiting rooms and cancelled matches (0 keeps them)
+SWEEP_INTERVAL = float(os.getenv('SWEEP_INTERVAL', 3600))
+SWEEP_CHUNK = int(os.getenv('SWEEP_CHUNK', 500))
+SWEEP_PAUSE = float(os.getenv('SWEEP_PAUSE', 0.1))
+SWEEP_MAX_CHUNKS = int(os.getenv('SWEEP_MAX_CHUNKS', 200))
+RETENTION_WAITING_DAYS = float(os.getenv('RETENTION_WAITING_DAYS', 7))
+RETENTION_CANCELLED_DAYS = float(os.getenv('RETENTION_CANCELLED_DAYS', 30))
+
+# Outbound Messages: at most OUTBOUND_RATE sends per OUTBOUND_PER seconds per channel
+OUTBOUND_RATE = int(os.getenv('OUTBOUND_RATE', 5))
+OUTBOUND_PER = float(os.getenv('OUTBOUND_PER', 5.0))
+# Minimum seconds between live edits of the same queue embed
+EMBED_EDIT_WINDOW = float(os.getenv('EMBED_EDIT_WINDOW', 2.0))
+
+# QR rendering: worker pool (processes keep qrcode/Pillow off the bot's GIL) and cache size
+QR_WORKERS = int(os.getenv('QR_WORKERS', 2))
+QR_USE_PROCESSES = os.getenv('QR_USE_PROCESSES', 'true').lower() == 'true'
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', 256))
+# QR image: pixels per module and output format (png or svg; Discord only previews png)
+QR_BOX_SIZE = int(os.getenv('QR_BOX_SIZE', 6))
+QR_FORMAT = os.getenv('QR_FORMAT', 'png').lower()
+
+# Pix webhook: payment notifications from the PSP (port 0 disables the receiver)
+PIX_WEBHOOK_HOST = os.getenv('PIX_WEBHOOK_HOST', '0.0.0.0')
+PIX_WEBHOOK_PORT = int(os.getenv('PIX_WEBHOOK_PORT', 0))
+PIX_WEBHOOK_PATH = os.getenv('PIX_WEBHOOK_PATH', '/pix/webhook')
+# Required: the receiver refuses to start without a shared secret
+PIX_WEBHOOK_SECRET = os.getenv('PIX_WEBHOOK_SECRET', '')
+PIX_WEBHOOK_BATCH = int(os.getenv('PIX_WEBHOOK_BATCH', 200))
+PIX_WEBHOOK_INTERVAL = float(os.getenv('PIX_WEBHOOK_INTERVAL', 0.5))
+PIX_WEBHOOK_QUEUE = int(os.getenv('PIX_WEBHOOK_QUEUE', 10000))
+
+# Rating (Elo): initial rating and K factor per match
+RATING_INITIAL = float(os.getenv('RATING_INITIAL', 1000))
+RATING_K = float(os.getenv('RATING_K', 32))
+
 # Modalities Configuration
 MODALITIES = {
     'Mobile': {
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import update
+from models import run_db, Match, MatchParticipant
+from match_state import CONFIRMED, can_transition
+
+logger = logging.getLogger(__name__)
+
+
+class ConfirmResult(Enum):
+    """Resultado de um clique em Confirmar"""
+    CONFIRMED = "confirmed"             # confirmou, ainda faltam jogadores
+    ALL_CONFIRMED = "all_confirmed"     # foi a última confirmação
+    ALREADY = "already"
+    NOT_PARTICIPANT = "not_participant"
+    CLOSED = "closed"                   # a partida não pode mais ser confirmada
+    NOT_FOUND = "not_found"
+
+
+class _Entry:
+    __slots__ = ("participants", "pending")
+    
+    def __init__(self, participants: set, pending: set):
+        self.participants = participants
+        self.pending = pending
+
+
+def _load_entry(session, match_id: int):
+    status = session.query(Match.status).filter_by(id=match_id).scalar()
+    if status is None:
+        return None, None
+    rows = (
+        session.query(MatchParticipant.user_id, MatchParticipant.confirmed_at)
+        .filter_by(match_id=match_id)
+        .all()
+    )
+    participants = {user_id for user_id, _ in rows}
+    pending = {user_id for user_id, confirmed_at in rows if confirmed_at is None}
+    return status, _Entry(participants, pending)
+
+
+def _store_confirmation(session, match_id: int, user_id: str):
+    session.execute(
+        update(MatchParticipant)
+        .where(
+            MatchParticipant.match_id == match_id,
+            MatchParticipant.user_id == user_id,
+            MatchParticipant.confirmed_at.is_(None)
+        )
+        .values(confirmed_at=datetime.utcnow())
+    )
+
+
+class ConfirmationTracker:
+    """
+    Confirmações das partidas, gravadas em match_participants.confirmed_at.
+    
+    Cada partida é lida do banco uma vez; depois disso o clique consulta só
+    a memória (jogadores e pendentes), então "todos confirmaram" e "não é
+    jogador" são O(1). A confirmação é gravada antes de responder, então
+    sobrevive a reinícios.
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._loading = {}
+    
+    async def _entry(self, match_id: int):
+        entry = self._entries.get(match_id)
+        if entry is not None:
+            return entry, None
+        
+        # Cliques simultâneos na mesma partida compartilham a leitura
+        future = self._loading.get(match_id)
+        if future is None:
+            future = self._loading[match_id] = asyncio.ensure_future(run_db(_load_entry, match_id))
+            future.add_done_callback(lambda _: self._loading.pop(match_id, None))
+        status, entry = await asyncio.shield(future)
+        if entry is None or not can_transition(status, CONFIRMED):
+            return None, status
+        return self._entries.setdefault(match_id, entry), None
+    
+    async def confirm(self, match_id: int, user_id: str) -> tuple:
+        """Registra a confirmação do jogador; retorna (ConfirmResult, jogadores que faltam)"""
+        entry, status = await self._entry(match_id)
+        if entry is None:
+            return (ConfirmResult.NOT_FOUND if status is None else ConfirmResult.CLOSED), 0
+        if user_id not in entry.participants:
+            return ConfirmResult.NOT_PARTICIPANT, len(entry.pending)
+        if user_id not in entry.pending:
+            return ConfirmResult.ALREADY, len(entry.pending)
+        
+        # Sem await entre o teste e a remoção: só um clique vê a contagem chegar a zero
+        entry.pending.discard(user_id)
+        remaining = len(entry.pending)
+        try:
+            await run_db(_store_confirmation, match_id, user_id)
+        except Exception:
+            entry.pending.add(user_id)
+            raise
+        
+        if remaining == 0:
+            return ConfirmResult.ALL_CONFIRMED, 0
+        return ConfirmResult.CONFIRMED, remaining
+    
+    def remaining(self, match_id: int):
+        """Jogadores que ainda não confirmaram, se a partida estiver em memória"""
+        entry = self._entries.get(match_id)
+        return len(entry.pending) if entry is not None else None
+    
+    def forget(self, match_id: int):
+        """Descarta a partida (confirmada, cancelada ou finalizada)"""
+        self._entries.pop(match_id, None)
+    
+    def stats(self) -> dict:
+        return {"matches": len(self._entries)}
+
+
+confirmations = ConfirmationTracker()
@@ -0,0 +1,111 @@
+import time
+from dataclasses import dataclass, fields
+from typing import Optional
+from models import run_db, Guild
+from config import GUILD_CACHE_TTL
+
+
+@dataclass(frozen=True)
+class GuildSettings:
+    """Cópia imutável das configurações de uma guilda"""
+    
+    guild_id: str
+    queue_channel_id: Optional[str] = None
+    mediator_panel_channel_id: Optional[str] = None
+    mediator_log_channel_id: Optional[str] = None
+    match_log_channel_id: Optional[str] = None
+    mediator_role_id: Optional[str] = None
+    analyst_role_id: Optional[str] = None
+    room_price: float = 0.40
+    coins_winner: int = 1
+    coins_loser: int = 0
+    
+    @classmethod
+    def from_model(cls, guild: Guild) -> 'GuildSettings':
+        return cls(**{field.name: getattr(guild, field.name) for field in fields(cls)})
+
+
+def _get_or_create_guild(session, guild_id: str) -> Guild:
+    """Obtém ou cria uma guilda usando a sessão informada"""
+    guild = session.query(Guild).filter_by(guild_id=str(guild_id)).first()
+    if not guild:
+        guild = Guild(guild_id=str(guild_id))
+        session.add(guild)
+        session.flush()
+    return guild
+
+
+def _load_settings(session, guild_id: str) -> GuildSettings:
+    return GuildSettings.from_model(_get_or_create_guild(session, guild_id))
+
+
+def _update_settings(session, guild_id: str, values: dict) -> GuildSettings:
+    guild = _get_or_create_guild(session, guild_id)
+    for name, value in values.items():
+        setattr(guild, name, value)
+    session.flush()
+    return GuildSettings.from_model(guild)
+
+
+class GuildSettingsCache:
+    """
+    Cache por guilda das configurações da tabela `guilds`.
+    
+    As leituras expiram após `ttl` segundos; as escritas feitas por `update`
+    vão para o banco e substituem a entrada do cache na mesma hora.
+    """
+    
+    def __init__(self, ttl: float = GUILD_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    async def get(self, guild_id: str) -> GuildSettings:
+        """Retorna as configurações da guilda, criando-a se necessário"""
+        guild_id = str(guild_id)
+        entry = self._entries.get(guild_id)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        
+        self.misses += 1
+        settings = await run_db(_load_settings, guild_id)
+        self._store(settings)
+        return settings
+    
+    async def update(self, guild_id: str, **values) -> GuildSettings:
+        """Grava os campos informados no banco e atualiza o cache"""
+        unknown = set(values) - {field.name for field in fields(GuildSettings)}
+        if unknown:
+            raise ValueError(f"Campos desconhecidos: {', '.join(sorted(unknown))}")
+        
+        settings = await run_db(_update_settings, str(guild_id), values)
+        self._store(settings)
+        return settings
+    
+    def invalidate(self, guild_id: str = None):
+        """Descarta a entrada de uma guilda (ou todas, sem argumento)"""
+        self.invalidations += 1
+        if guild_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(guild_id), None)
+    
+    def _store(self, settings: GuildSettings):
+        self._entries[settings.guild_id] = (time.monotonic() + self.ttl, settings)
+    
+    def stats(self) -> dict:
+        """Retorna os contadores do cache"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+guild_settings = GuildSettingsCache()
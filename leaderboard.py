@@ -0,0 +1,140 @@
+import logging
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from models import run_db, User, MatchParticipant
+
+logger = logging.getLogger(__name__)
+
+# Critérios do ranking: nome -> rótulo
+METRICS = {
+    "wins": "Vitórias",
+    "winrate": "Taxa de vitória",
+    "coins": "Coins",
+}
+
+
+def _sort_key(metric: str, user_id: str, wins: int, losses: int, coins: float):
+    """Chave crescente de ordenação (o primeiro colocado tem a menor chave)"""
+    if metric == "wins":
+        return (-wins, losses, user_id)
+    if metric == "coins":
+        return (-coins, -wins, user_id)
+    games = wins + losses
+    if games == 0:
+        return None  # sem partidas não entra no ranking por taxa
+    return (-wins / games, -games, user_id)
+
+
+class GuildLeaderboard:
+    """Listas ordenadas (SortedList) de uma guilda, uma por critério"""
+    
+    def __init__(self):
+        self.players = {}
+        self.keys = {metric: SortedList() for metric in METRICS}
+    
+    def set(self, user_id: str, wins: int, losses: int, coins: float):
+        """Insere ou atualiza um jogador em O(log n) por critério"""
+        old = self.players.get(user_id)
+        if old is not None:
+            for metric, keys in self.keys.items():
+                key = _sort_key(metric, user_id, *old)
+                if key is not None:
+                    keys.remove(key)
+        
+        stats = (wins or 0, losses or 0, coins or 0.0)
+        self.players[user_id] = stats
+        for metric, keys in self.keys.items():
+            key = _sort_key(metric, user_id, *stats)
+            if key is not None:
+                keys.add(key)
+    
+    def rank(self, user_id: str, metric: str):
+        """Posição (1 = primeiro) do jogador no critério, ou None"""
+        stats = self.players.get(user_id)
+        if stats is None:
+            return None
+        key = _sort_key(metric, user_id, *stats)
+        if key is None:
+            return None
+        return self.keys[metric].bisect_left(key) + 1
+    
+    def page(self, metric: str, page: int, per_page: int) -> list:
+        """Retorna [(posição, user_id, (vitórias, derrotas, coins))] da página"""
+        start = page * per_page
+        return [
+            (start + i + 1, key[-1], self.players[key[-1]])
+            for i, key in enumerate(self.keys[metric].islice(start, start + per_page))
+        ]
+    
+    def size(self, metric: str) -> int:
+        return len(self.keys[metric])
+
+
+def _load_all(session) -> list:
+    return session.execute(
+        select(User.guild_id, User.user_id, User.wins, User.losses, User.coins)
+    ).all()
+
+
+def changed_players(session, guild_id: str, match_ids: list) -> list:
+    """Estatísticas atuais dos jogadores das partidas, para atualizar o ranking"""
+    if not match_ids:
+        return []
+    return session.execute(
+        select(User.user_id, User.wins, User.losses, User.coins)
+        .where(
+            User.guild_id == guild_id,
+            User.user_id.in_(
+                select(MatchParticipant.user_id).where(MatchParticipant.match_id.in_(match_ids))
+            )
+        )
+    ).all()
+
+
+class Leaderboard:
+    """
+    Ranking por guilda mantido em memória.
+    
+    É reconstruído do banco ao iniciar e atualizado a cada liquidação com as
+    estatísticas dos jogadores envolvidos, então /ranking e .p nunca ordenam
+    a tabela `users`.
+    """
+    
+    def __init__(self):
+        self.guilds = {}
+    
+    async def load(self):
+        """Reconstrói o ranking a partir do banco"""
+        rows = await run_db(_load_all)
+        guilds = {}
+        for guild_id, user_id, wins, losses, coins in rows:
+            guilds.setdefault(guild_id, GuildLeaderboard()).set(user_id, wins, losses, coins)
+        self.guilds = guilds
+        logger.info(f"Ranking carregado: {len(rows)} jogadores em {len(guilds)} guildas")
+    
+    def apply(self, guild_id: str, rows):
+        """Aplica estatísticas novas [(user_id, vitórias, derrotas, coins)]"""
+        board = self.guilds.setdefault(guild_id, GuildLeaderboard())
+        for user_id, wins, losses, coins in rows:
+            board.set(user_id, wins, losses, coins)
+    
+    def rank(self, guild_id: str, user_id: str, metric: str = "wins"):
+        board = self.guilds.get(guild_id)
+        return board.rank(user_id, metric) if board else None
+    
+    def page(self, guild_id: str, metric: str, page: int, per_page: int) -> list:
+        board = self.guilds.get(guild_id)
+        return board.page(metric, page, per_page) if board else []
+    
+    def size(self, guild_id: str, metric: str) -> int:
+        board = self.guilds.get(guild_id)
+        return board.size(metric) if board else 0
+    
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.guilds),
+            "players": sum(len(board.players) for board in self.guilds.values()),
+        }
+
+
+leaderboard = Leaderboard()
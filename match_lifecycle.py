@@ -0,0 +1,153 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func
+from models import run_db, Match, MatchParticipant
+from match_state import FULL, CONFIRMED, CANCELLED, QUEUE_IDLE, CONFIRMATION, PAYMENT, transition
+from queue_engine import queue_engine
+from mediators import mediator_pool
+from timer_wheel import deadlines
+from config import CONFIRMATION_TIMEOUT, PAYMENT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Expired:
+    """Partida afetada por um prazo vencido"""
+    
+    match_id: int
+    room_id: str
+    guild_id: str
+    channel_id: Optional[int] = None
+
+
+def _open_deadlines(session) -> tuple:
+    """
+    Partidas cheias sem confirmação e confirmadas com cobrança ainda não paga.
+    
+    A sala ficou cheia com a última entrada, então o instante em que encheu
+    é o maior joined_at dos participantes.
+    """
+    full = (
+        session.query(Match.id, func.max(MatchParticipant.joined_at))
+        .outerjoin(MatchParticipant, MatchParticipant.match_id == Match.id)
+        .filter(Match.status == FULL)
+        .group_by(Match.id)
+        .all()
+    )
+    unpaid = (
+        session.query(Match.id, Match.confirmed_at)
+        .filter(Match.status == CONFIRMED, Match.txid.isnot(None), Match.paid_at.is_(None))
+        .all()
+    )
+    return full, unpaid
+
+
+def _cancel(session, match_ids: list, expected: tuple, where: tuple = ()) -> list:
+    cancelled = transition(session, match_ids, CANCELLED, expected=expected, where=where)
+    if not cancelled:
+        return []
+    return (
+        session.query(Match.id, Match.match_id, Match.guild_id, Match.confirmation_channel_id)
+        .filter(Match.id.in_(cancelled))
+        .all()
+    )
+
+
+class MatchLifecycle:
+    """
+    Prazos da máquina de estados das partidas.
+    
+    - inatividade: sala de espera sem entradas/saídas é esvaziada
+    - confirmação: sala cheia que não foi confirmada é cancelada
+    - pagamento: partida confirmada cuja cobrança não foi paga é cancelada
+    
+    Os prazos vivem no agendador único (`timer_wheel.deadlines`); as cogs
+    recebem as partidas afetadas com `listen(callback)`.
+    """
+    
+    def __init__(self, engine=queue_engine, scheduler=deadlines, mediators=mediator_pool,
+                 confirmation_timeout: float = CONFIRMATION_TIMEOUT, payment_timeout: float = PAYMENT_TIMEOUT):
+        self.engine = engine
+        self.scheduler = scheduler
+        self.mediators = mediators
+        self.confirmation_timeout = confirmation_timeout
+        self.payment_timeout = payment_timeout
+        self._listeners = []
+    
+    def listen(self, callback):
+        """Registra `callback(tipo de prazo, lista de Expired)`"""
+        self._listeners.append(callback)
+    
+    def start(self):
+        self.scheduler.on(QUEUE_IDLE, self._expire_idle)
+        self.scheduler.on(CONFIRMATION, self._expire_confirmation)
+        self.scheduler.on(PAYMENT, self._expire_payment)
+        self.scheduler.start()
+    
+    async def load(self):
+        """Reagenda os prazos de confirmação e pagamento depois de reiniciar"""
+        full, unpaid = await run_db(_open_deadlines)
+        now = datetime.utcnow()
+        if self.confirmation_timeout:
+            for match_id, full_at in full:
+                elapsed = (now - full_at).total_seconds() if full_at else 0
+                self.scheduler.schedule(CONFIRMATION, match_id, max(0.0, self.confirmation_timeout - elapsed))
+        for match_id, confirmed_at in unpaid:
+            self.confirmed(match_id, True, confirmed_at, now)
+        logger.info(f"Prazos carregados: {len(full)} confirmações, {len(unpaid)} pagamentos")
+    
+    def confirmed(self, match_id: int, charged: bool, confirmed_at: datetime = None, now: datetime = None):
+        """A partida foi confirmada: troca o prazo de confirmação pelo de pagamento, se houver cobrança"""
+        self.scheduler.cancel(CONFIRMATION, match_id)
+        if not charged or not self.payment_timeout:
+            return
+        elapsed = ((now or datetime.utcnow()) - confirmed_at).total_seconds() if confirmed_at else 0
+        self.scheduler.schedule(PAYMENT, match_id, max(0.0, self.payment_timeout - elapsed))
+    
+    def paid(self, match_id: int):
+        self.scheduler.cancel(PAYMENT, match_id)
+    
+    async def _notify(self, kind: str, expired: list):
+        if not expired:
+            return
+        logger.info(f"{len(expired)} partidas expiradas por '{kind}'")
+        for callback in self._listeners:
+            try:
+                await callback(kind, expired)
+            except Exception as e:
+                logger.error(f"Erro ao avisar prazos '{kind}': {e}")
+    
+    async def _expire_idle(self, match_ids: list):
+        rooms = await self.engine.expire_idle(match_ids)
+        await self._notify(QUEUE_IDLE, [
+            Expired(room.match_id, room.room_id, room.guild_id,
+                    room.message.channel.id if room.message else None)
+            for room in rooms
+        ])
+    
+    async def _expire_confirmation(self, match_ids: list):
+        rows = await run_db(_cancel, match_ids, (FULL,))
+        expired = []
+        for match_id, room_id, guild_id, _ in rows:
+            room = self.engine.get(match_id)
+            channel_id = room.message.channel.id if room is not None and room.message else None
+            self.engine.close_room(match_id)
+            self.mediators.release(match_id)
+            expired.append(Expired(match_id, room_id, guild_id, channel_id))
+        await self._notify(CONFIRMATION, expired)
+    
+    async def _expire_payment(self, match_ids: list):
+        rows = await run_db(_cancel, match_ids, (CONFIRMED,), (Match.paid_at.is_(None),))
+        for match_id, *_ in rows:
+            self.engine.close_room(match_id)
+            self.mediators.release(match_id)
+        await self._notify(PAYMENT, [
+            Expired(match_id, room_id, guild_id, int(channel_id) if channel_id else None)
+            for match_id, room_id, guild_id, channel_id in rows
+        ])
+
+
+lifecycle = MatchLifecycle()
@@ -0,0 +1,81 @@
+from sqlalchemy import select, update
+from models import Match
+
+# Status de Match.status
+WAITING = 'waiting'
+FULL = 'full'
+CONFIRMED = 'confirmed'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+
+# Transições permitidas: status atual -> próximos status
+TRANSITIONS = {
+    WAITING: {FULL, CANCELLED},
+    FULL: {CONFIRMED, COMPLETED, CANCELLED},
+    CONFIRMED: {COMPLETED, CANCELLED},
+    COMPLETED: set(),
+    CANCELLED: set(),
+}
+
+# Partidas nestes status não mudam mais
+FINAL_STATUSES = (COMPLETED, CANCELLED)
+
+# Prazos controlados pelo agendador (chave: (prazo, id interno da partida))
+QUEUE_IDLE = 'queue_idle'
+CONFIRMATION = 'confirmation'
+PAYMENT = 'payment'
+
+
+class InvalidTransition(ValueError):
+    """Mudança de status que a máquina de estados não permite"""
+    
+    def __init__(self, current: str, target: str):
+        super().__init__(f"transição inválida: {current} -> {target}")
+        self.current = current
+        self.target = target
+
+
+def can_transition(current: str, target: str) -> bool:
+    return target in TRANSITIONS.get(current, ())
+
+
+def check(current: str, target: str) -> str:
+    """Retorna `target` se a transição for válida; senão levanta InvalidTransition"""
+    if not can_transition(current, target):
+        raise InvalidTransition(current, target)
+    return target
+
+
+def sources(target: str) -> tuple:
+    """Status a partir dos quais se pode chegar em `target`"""
+    return tuple(status for status, targets in TRANSITIONS.items() if target in targets)
+
+
+def transition(session, match_ids: list, target: str, expected: tuple = None, where: tuple = (),
+               **values) -> list:
+    """
+    Muda o status das partidas em um UPDATE guardado pela máquina de estados.
+    
+    Só são alteradas as partidas cujo status atual permite ir para `target`
+    (restrito a `expected`, se informado) e que atendem às condições extras
+    de `where`. Retorna os ids alterados.
+    """
+    allowed = sources(target)
+    if expected is not None:
+        allowed = tuple(status for status in allowed if status in expected)
+    if not match_ids or not allowed:
+        return []
+    
+    ids = session.execute(
+        select(Match.id)
+        .where(Match.id.in_(list(match_ids)), Match.status.in_(allowed), *where)
+        .with_for_update()
+    ).scalars().all()
+    if ids:
+        session.execute(
+            update(Match)
+            .where(Match.id.in_(ids))
+            .values(status=target, **values)
+            .execution_options(synchronize_session=False)
+        )
+    return ids
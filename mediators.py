@@ -0,0 +1,275 @@
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Optional
+from sqlalchemy import update
+from models import run_db, Match, User
+from match_state import FULL, CONFIRMED
+
+logger = logging.getLogger(__name__)
+
+
+class _Mediator:
+    __slots__ = ("user_id", "load", "min_bet", "max_bet", "entry")
+    
+    def __init__(self, user_id: str, min_bet: float = None, max_bet: float = None):
+        self.user_id = user_id
+        self.load = 0
+        self.min_bet = min_bet
+        self.max_bet = max_bet
+        self.entry = None
+    
+    def accepts(self, bet_value: Optional[float]) -> bool:
+        if bet_value is None:
+            return True
+        if self.min_bet is not None and bet_value < self.min_bet:
+            return False
+        return self.max_bet is None or bet_value <= self.max_bet
+
+
+class _GuildPool:
+    """Heap de mediadores online de uma guilda, ordenado por (carga, ordem de chegada)"""
+    
+    def __init__(self):
+        self.heap = []
+        self.online = {}
+        # Salas cheias esperando um mediador: (id da partida, valor, instante em que encheu)
+        self.waiting = deque()
+
+
+def _load_mediators(session) -> tuple:
+    mediators = (
+        session.query(User.guild_id, User.user_id, User.mediator_min_bet, User.mediator_max_bet)
+        .filter(User.is_mediator.is_(True))
+        .all()
+    )
+    active = (
+        session.query(Match.id, Match.guild_id, Match.mediator_id, Match.status, Match.bet_value)
+        .filter(Match.mediator_id.isnot(None), Match.status.in_((FULL, CONFIRMED)))
+        .all()
+    )
+    return mediators, active
+
+
+def _store_mediators(session, assignments: list):
+    """Grava matches.mediator_id das atribuições [(id da partida, mediador)]"""
+    for match_id, user_id in assignments:
+        session.execute(update(Match).where(Match.id == match_id).values(mediator_id=user_id))
+
+
+class MediatorPool:
+    """
+    Atribuição automática de mediadores pela menor carga.
+    
+    Cada guilda tem um heap de mediadores online com chave (partidas ativas,
+    ordem); entradas antigas ficam no heap e são descartadas ao sair do topo,
+    então atribuir e liberar custam O(log n). Mediadores podem aceitar só
+    uma faixa de valores de aposta. Uma sala que enche sem mediador elegível
+    fica na fila da guilda até alguém entrar; ao sair, as salas do mediador
+    que ainda não têm painel de confirmação passam para os outros.
+    """
+    
+    def __init__(self):
+        self._guilds = {}
+        self._assignments = {}  # id da partida -> (guilda, mediador, valor)
+        self._pinned = set()    # partidas com painel criado: não mudam de mediador
+        self._order = itertools.count()
+        
+        # Métricas
+        self.assigned = 0
+        self.reassigned = 0
+        self.queued = 0
+        self.last_assign_ms = 0.0
+        self.max_assign_ms = 0.0
+        self.total_assign_ms = 0.0
+        self.max_wait_s = 0.0
+    
+    def _pool(self, guild_id: str) -> _GuildPool:
+        pool = self._guilds.get(guild_id)
+        if pool is None:
+            pool = self._guilds[guild_id] = _GuildPool()
+        return pool
+    
+    def _push(self, pool: _GuildPool, mediator: _Mediator):
+        mediator.entry = [mediator.load, next(self._order), mediator]
+        heapq.heappush(pool.heap, mediator.entry)
+        # Muitas entradas antigas: refaz o heap só com as atuais
+        if len(pool.heap) > 4 * len(pool.online) + 16:
+            pool.heap = [m.entry for m in pool.online.values() if m.entry is not None]
+            heapq.heapify(pool.heap)
+    
+    def _pick(self, pool: _GuildPool, bet_value: Optional[float], exclude: str = None) -> Optional[_Mediator]:
+        """Remove e retorna o mediador elegível de menor carga"""
+        skipped = []
+        chosen = None
+        while pool.heap:
+            entry = heapq.heappop(pool.heap)
+            mediator = entry[2]
+            if mediator.entry is not entry or pool.online.get(mediator.user_id) is not mediator:
+                continue  # entrada antiga ou mediador que saiu
+            if mediator.user_id != exclude and mediator.accepts(bet_value):
+                chosen = mediator
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(pool.heap, entry)
+        return chosen
+    
+    async def load(self):
+        """Reconstrói os mediadores online e as cargas a partir do banco"""
+        mediators, active = await run_db(_load_mediators)
+        self._guilds = {}
+        self._assignments = {}
+        self._pinned = set()
+        for guild_id, user_id, min_bet, max_bet in mediators:
+            self._pool(guild_id).online[user_id] = _Mediator(user_id, min_bet, max_bet)
+        for match_id, guild_id, user_id, status, bet_value in active:
+            self._assignments[match_id] = (guild_id, user_id, bet_value)
+            if status == CONFIRMED:
+                self._pinned.add(match_id)
+            mediator = self._pool(guild_id).online.get(user_id)
+            if mediator is not None:
+                mediator.load += 1
+        for pool in self._guilds.values():
+            for mediator in pool.online.values():
+                self._push(pool, mediator)
+        logger.info(f"{len(mediators)} mediadores online, {len(active)} partidas atribuídas")
+    
+    def assignment(self, match_id: int) -> Optional[str]:
+        entry = self._assignments.get(match_id)
+        return entry[1] if entry else None
+    
+    def _take(self, guild_id: str, match_id: int, bet_value: float, exclude: str = None) -> Optional[str]:
+        start = time.perf_counter()
+        pool = self._pool(guild_id)
+        mediator = self._pick(pool, bet_value, exclude)
+        if mediator is None:
+            return None
+        mediator.load += 1
+        self._push(pool, mediator)
+        self._assignments[match_id] = (guild_id, mediator.user_id, bet_value)
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        self.assigned += 1
+        self.last_assign_ms = elapsed
+        self.max_assign_ms = max(self.max_assign_ms, elapsed)
+        self.total_assign_ms += elapsed
+        return mediator.user_id
+    
+    async def assign(self, guild_id: str, match_id: int, bet_value: float = None) -> Optional[str]:
+        """Atribui a sala cheia ao mediador de menor carga; sem mediador, a sala espera na fila"""
+        current = self.assignment(match_id)
+        if current is not None:
+            return current
+        
+        user_id = self._take(guild_id, match_id, bet_value)
+        if user_id is None:
+            self._pool(guild_id).waiting.append((match_id, bet_value, time.monotonic()))
+            self.queued += 1
+            return None
+        
+        await run_db(_store_mediators, [(match_id, user_id)])
+        return user_id
+    
+    def pin(self, match_id: int):
+        """O painel de confirmação foi criado: a partida não muda mais de mediador"""
+        self._pinned.add(match_id)
+    
+    def release(self, match_id: int):
+        """A partida terminou ou foi cancelada: diminui a carga do mediador"""
+        self._pinned.discard(match_id)
+        entry = self._assignments.pop(match_id, None)
+        if entry is None:
+            for pool in self._guilds.values():
+                pool.waiting = deque(w for w in pool.waiting if w[0] != match_id)
+            return
+        
+        guild_id, user_id, _ = entry
+        pool = self._pool(guild_id)
+        mediator = pool.online.get(user_id)
+        if mediator is not None and mediator.load > 0:
+            mediator.load -= 1
+            self._push(pool, mediator)
+    
+    def _drain(self, guild_id: str) -> list:
+        """Atribui as salas da fila da guilda que já têm mediador elegível"""
+        pool = self._pool(guild_id)
+        assigned = []
+        still_waiting = deque()
+        now = time.monotonic()
+        while pool.waiting:
+            match_id, bet_value, since = pool.waiting.popleft()
+            user_id = self._take(guild_id, match_id, bet_value)
+            if user_id is None:
+                still_waiting.append((match_id, bet_value, since))
+                continue
+            self.max_wait_s = max(self.max_wait_s, now - since)
+            assigned.append((match_id, user_id))
+        pool.waiting = still_waiting
+        return assigned
+    
+    async def login(self, guild_id: str, user_id: str, min_bet: float = None, max_bet: float = None) -> list:
+        """Coloca o mediador online; retorna as salas da fila atribuídas a ele [(partida, mediador)]"""
+        pool = self._pool(guild_id)
+        mediator = pool.online.get(user_id)
+        if mediator is None:
+            mediator = pool.online[user_id] = _Mediator(user_id, min_bet, max_bet)
+            mediator.load = sum(
+                1 for g, u, _ in self._assignments.values() if g == guild_id and u == user_id
+            )
+        else:
+            mediator.min_bet, mediator.max_bet = min_bet, max_bet
+        self._push(pool, mediator)
+        
+        assigned = self._drain(guild_id)
+        if assigned:
+            await run_db(_store_mediators, assigned)
+        return assigned
+    
+    async def logout(self, guild_id: str, user_id: str) -> list:
+        """
+        Tira o mediador do heap e redistribui as salas dele ainda sem painel.
+        
+        Retorna [(partida, novo mediador ou None)]; salas sem outro mediador
+        elegível voltam para a fila da guilda.
+        """
+        pool = self._pool(guild_id)
+        if pool.online.pop(user_id, None) is None:
+            return []
+        
+        moved = []
+        for match_id, (g, u, bet_value) in list(self._assignments.items()):
+            if g != guild_id or u != user_id or match_id in self._pinned:
+                continue
+            del self._assignments[match_id]
+            new_id = self._take(guild_id, match_id, bet_value, exclude=user_id)
+            if new_id is None:
+                pool.waiting.append((match_id, bet_value, time.monotonic()))
+                self.queued += 1
+            else:
+                self.reassigned += 1
+            moved.append((match_id, new_id))
+        
+        if moved:
+            await run_db(_store_mediators, moved)
+        return moved
+    
+    def stats(self) -> dict:
+        """Retorna as métricas de atribuição"""
+        return {
+            "online": sum(len(pool.online) for pool in self._guilds.values()),
+            "active_matches": len(self._assignments),
+            "waiting_rooms": sum(len(pool.waiting) for pool in self._guilds.values()),
+            "assigned": self.assigned,
+            "reassigned": self.reassigned,
+            "queued": self.queued,
+            "last_assign_ms": round(self.last_assign_ms, 3),
+            "max_assign_ms": round(self.max_assign_ms, 3),
+            "avg_assign_ms": round(self.total_assign_ms / self.assigned, 3) if self.assigned else 0.0,
+            "max_wait_s": round(self.max_wait_s, 1),
+        }
+
+
+mediator_pool = MediatorPool()
@@ -0,0 +1,70 @@
+"""Índices compostos para as consultas mais frequentes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Adiciona:
+- ix_users_user_id_guild_id em users(user_id, guild_id)
+- uq_match_participants_match_id_user_id em match_participants(match_id, user_id)
+- ix_logs_guild_id_created_at em logs(guild_id, created_at)
+
+matches.match_id já é UNIQUE e portanto já indexado.
+
+Bancos criados por init_db() depois desta versão já possuem os índices;
+a migração verifica o que existe antes de criar, então pode ser aplicada
+em qualquer banco.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing(table: str):
+    """Retorna (tabela existe, nomes de índices e uniques da tabela)"""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return False, set()
+    names = {index['name'] for index in inspector.get_indexes(table)}
+    names |= {constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+    return True, names
+
+
+def upgrade() -> None:
+    exists, names = _existing('users')
+    if exists and 'ix_users_user_id_guild_id' not in names:
+        op.create_index('ix_users_user_id_guild_id', 'users', ['user_id', 'guild_id'])
+
+    exists, names = _existing('match_participants')
+    if exists and 'uq_match_participants_match_id_user_id' not in names:
+        # Remove entradas duplicadas antigas, mantendo a mais antiga
+        op.execute(
+            "DELETE FROM match_participants WHERE id NOT IN ("
+            " SELECT keep_id FROM ("
+            "  SELECT MIN(id) AS keep_id FROM match_participants GROUP BY match_id, user_id"
+            " ) AS keep"
+            ")"
+        )
+        with op.batch_alter_table('match_participants') as batch_op:
+            batch_op.create_unique_constraint(
+                'uq_match_participants_match_id_user_id', ['match_id', 'user_id']
+            )
+
+    exists, names = _existing('logs')
+    if exists and 'ix_logs_guild_id_created_at' not in names:
+        op.create_index('ix_logs_guild_id_created_at', 'logs', ['guild_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_logs_guild_id_created_at', table_name='logs')
+    with op.batch_alter_table('match_participants') as batch_op:
+        batch_op.drop_constraint('uq_match_participants_match_id_user_id', type_='unique')
+    op.drop_index('ix_users_user_id_guild_id', table_name='users')
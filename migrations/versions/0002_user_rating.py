@@ -0,0 +1,40 @@
+"""Coluna de rating (Elo) dos jogadores
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Adiciona users.rating com valor inicial RATING_INITIAL para todos os
+jogadores. Para recalcular o rating a partir do histórico de partidas já
+registradas, rode `python rating_replay.py <guild_id>` depois da migração.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import RATING_INITIAL
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('users'):
+        return
+    if 'rating' in {column['name'] for column in inspector.get_columns('users')}:
+        return
+    op.add_column(
+        'users',
+        sa.Column('rating', sa.Float(), nullable=True, server_default=sa.text(str(RATING_INITIAL)))
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('rating')
@@ -0,0 +1,41 @@
+"""Conciliação de pagamentos Pix das partidas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Adiciona matches.txid (UNIQUE, usado pelo webhook Pix para achar a partida
+paga) e matches.paid_at. Partidas confirmadas antes desta versão ficam sem
+txid e continuam sendo conferidas pelo mediador.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('matches'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('matches')}
+    
+    if 'txid' not in columns:
+        op.add_column('matches', sa.Column('txid', sa.String(35), nullable=True))
+        op.create_index('ix_matches_txid', 'matches', ['txid'], unique=True)
+    if 'paid_at' not in columns:
+        op.add_column('matches', sa.Column('paid_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_matches_txid', table_name='matches')
+    with op.batch_alter_table('matches') as batch_op:
+        batch_op.drop_column('paid_at')
+        batch_op.drop_column('txid')
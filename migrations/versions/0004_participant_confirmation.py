@@ -0,0 +1,35 @@
+"""Confirmação dos jogadores no painel da partida
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Adiciona match_participants.confirmed_at. As confirmações passam a ser
+gravadas no clique e sobrevivem a reinícios do bot; confirmações feitas
+antes desta versão ficavam só em memória e não são recuperadas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('match_participants'):
+        return
+    if 'confirmed_at' in {column['name'] for column in inspector.get_columns('match_participants')}:
+        return
+    op.add_column('match_participants', sa.Column('confirmed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('match_participants') as batch_op:
+        batch_op.drop_column('confirmed_at')
@@ -0,0 +1,36 @@
+"""Faixa de apostas dos mediadores
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Adiciona users.mediator_min_bet e users.mediator_max_bet, usadas pela
+atribuição automática de mediadores (vazio = qualquer valor).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('users'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('users')}
+    for name in ('mediator_min_bet', 'mediator_max_bet'):
+        if name not in columns:
+            op.add_column('users', sa.Column(name, sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('mediator_max_bet')
+        batch_op.drop_column('mediator_min_bet')
@@ -0,0 +1,34 @@
+"""Índice para a limpeza de partidas antigas
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+Adiciona ix_matches_status_created_at em matches(status, created_at),
+usado pelo sweeper para achar salas de espera e partidas canceladas
+antigas sem varrer a tabela.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('matches'):
+        return
+    if 'ix_matches_status_created_at' in {index['name'] for index in inspector.get_indexes('matches')}:
+        return
+    op.create_index('ix_matches_status_created_at', 'matches', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_matches_status_created_at', table_name='matches')
@@ -0,0 +1,45 @@
+"""Mensagens do painel de filas
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Cria queue_board_slots, com a mensagem de cada fila (guilda, modalidade,
+modo, valor) enviada pelo /filas, para editar o painel em vez de reenviar.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('guilds') or not inspector.has_table('matches'):
+        return
+    if inspector.has_table('queue_board_slots'):
+        return
+    op.create_table(
+        'queue_board_slots',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('guild_id', sa.String(50), sa.ForeignKey('guilds.guild_id'), nullable=False),
+        sa.Column('modality', sa.String(50), nullable=False),
+        sa.Column('mode', sa.String(10), nullable=False),
+        sa.Column('bet_value', sa.Float(), nullable=False),
+        sa.Column('channel_id', sa.String(50), nullable=False),
+        sa.Column('message_id', sa.String(50), nullable=False),
+        sa.Column('match_id', sa.Integer(), sa.ForeignKey('matches.id'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('guild_id', 'modality', 'mode', 'bet_value', name='uq_queue_board_slots_slot'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('queue_board_slots')
@@ -0,0 +1,41 @@
+"""Canal da confirmação das partidas
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Adiciona matches.confirmation_channel_id, o canal em que a partida foi
+confirmada, avisado pelo webhook Pix e pelo prazo de pagamento. Antes ele
+era gravado em matches.thread_id.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('matches'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('matches')}
+    
+    if 'confirmation_channel_id' not in columns:
+        op.add_column('matches', sa.Column('confirmation_channel_id', sa.String(50), nullable=True))
+        # Cobranças ainda em aberto gravaram o canal em thread_id
+        op.execute(
+            "UPDATE matches SET confirmation_channel_id = thread_id "
+            "WHERE txid IS NOT NULL AND thread_id IS NOT NULL"
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('matches') as batch_op:
+        batch_op.drop_column('confirmation_channel_id')
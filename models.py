@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
-from config import DATABASE_URL
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+from config import DATABASE_URL, DB_POOL_SIZE, RATING_INITIAL
 
 Base = declarative_base()
 
@@ -58,6 +61,9 @@ class Mode(Base):
 
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_user_id_guild_id', 'user_id', 'guild_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(String(50), nullable=False)
@@ -66,7 +72,10 @@ class User(Base):
     wins = Column(Integer, default=0)
     losses = Column(Integer, default=0)
     coins = Column(Float, default=0.0)
+    rating = Column(Float, default=RATING_INITIAL)
     is_mediator = Column(Boolean, default=False)
+    mediator_min_bet = Column(Float)  # faixa de apostas que o mediador aceita (vazio = qualquer)
+    mediator_max_bet = Column(Float)
     pix_key = Column(String(100))
     pix_bank = Column(String(10))
     pix_account_holder = Column(String(100))
@@ -80,6 +89,10 @@ class User(Base):
 
 class Match(Base):
     __tablename__ = 'matches'
+    __table_args__ = (
+        Index('ix_matches_status_created_at', 'status', 'created_at'),
+        Index('ix_matches_txid', 'txid', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     guild_id = Column(String(50), ForeignKey('guilds.guild_id'))
@@ -95,6 +108,9 @@ class Match(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     confirmed_at = Column(DateTime)
     completed_at = Column(DateTime)
+    txid = Column(String(35))  # txid do Pix cobrado na confirmação
+    paid_at = Column(DateTime)
+    confirmation_channel_id = Column(String(50))  # canal avisado do pagamento ou do prazo vencido
     
     guild = relationship('Guild', back_populates='matches')
     modality = relationship('Modality', back_populates='matches')
@@ -105,19 +121,43 @@ class Match(Base):
 
 class MatchParticipant(Base):
     __tablename__ = 'match_participants'
+    __table_args__ = (
+        UniqueConstraint('match_id', 'user_id', name='uq_match_participants_match_id_user_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     match_id = Column(Integer, ForeignKey('matches.id'))
     user_id = Column(String(50), ForeignKey('users.user_id'))
     team = Column(String(10))  # team1 ou team2
     joined_at = Column(DateTime, default=datetime.utcnow)
+    confirmed_at = Column(DateTime)  # clique em Confirmar no painel da partida
     
     match = relationship('Match', back_populates='participants')
     user = relationship('User', back_populates='participants')
 
 
+class QueueBoardSlot(Base):
+    __tablename__ = 'queue_board_slots'
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'modality', 'mode', 'bet_value', name='uq_queue_board_slots_slot'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(50), ForeignKey('guilds.guild_id'), nullable=False)
+    modality = Column(String(50), nullable=False)
+    mode = Column(String(10), nullable=False)
+    bet_value = Column(Float, nullable=False)
+    channel_id = Column(String(50), nullable=False)
+    message_id = Column(String(50), nullable=False)  # mensagem da fila no canal
+    match_id = Column(Integer, ForeignKey('matches.id'))  # sala ligada aos botões da mensagem
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Log(Base):
     __tablename__ = 'logs'
+    __table_args__ = (
+        Index('ix_logs_guild_id_created_at', 'guild_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     guild_id = Column(String(50), ForeignKey('guilds.guild_id'))
@@ -141,8 +181,12 @@ class BetValue(Base):
 
 
 # Create engine and session
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(DATABASE_URL, echo=False, pool_size=DB_POOL_SIZE, pool_pre_ping=True)
+# expire_on_commit=False: objects are returned from the DB threads and read on the event loop
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# One worker per pooled connection, so DB work queues here instead of on the pool
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
 
 def init_db():
     """Initialize database tables"""
@@ -151,3 +195,27 @@ def init_db():
 def get_session():
     """Get database session"""
     return SessionLocal()
+
+def _run_in_session(func, *args, **kwargs):
+    """Run func inside a fresh session, committing on success"""
+    session = get_session()
+    try:
+        result = func(session, *args, **kwargs)
+        session.commit()
+        return result
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run func(session, *args, **kwargs) on the database executor.
+
+    Blocking SQLAlchemy calls never touch the event loop; the session is
+    committed when func returns and rolled back if it raises.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_run_in_session, func, *args, **kwargs)
+    return await loop.run_in_executor(_db_executor, call)
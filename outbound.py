@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from config import OUTBOUND_RATE, OUTBOUND_PER, EMBED_EDIT_WINDOW
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Prioridade das mensagens enviadas (menor sai primeiro)"""
+    HIGH = 0     # QR Code Pix, "Sala cheia"
+    NORMAL = 1   # Filas, painéis
+    LOW = 2      # Espelhos de log
+
+
+class _Bucket:
+    """Token bucket com `rate` envios a cada `per` segundos"""
+    
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+    
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+
+class _Job:
+    __slots__ = ("action", "target", "kwargs", "futures", "priority", "enqueued_at", "edit_key")
+    
+    def __init__(self, action, target, kwargs, priority, edit_key=None):
+        self.action = action
+        self.target = target
+        self.kwargs = kwargs
+        self.futures = []
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.edit_key = edit_key
+
+
+class _Debounce:
+    __slots__ = ("message", "render", "dirty")
+    
+    def __init__(self, message, render):
+        self.message = message
+        self.render = render
+        self.dirty = True
+
+
+class _Channel:
+    __slots__ = ("heap", "bucket", "task")
+    
+    def __init__(self, bucket: _Bucket):
+        self.heap = []
+        self.bucket = bucket
+        self.task = None
+
+
+class OutboundScheduler:
+    """
+    Fila central de envios para o Discord.
+    
+    Cada canal tem sua fila por prioridade e seu próprio token bucket, então
+    rajadas (como o /filas) são espaçadas antes de atingir o limite do
+    Discord em vez de ficarem presas nas esperas internas do discord.py.
+    Edições pendentes da mesma mensagem são agrupadas: só o último estado é
+    enviado e todos os chamadores recebem o resultado.
+    """
+    
+    def __init__(self, rate: int = OUTBOUND_RATE, per: float = OUTBOUND_PER):
+        self.rate = rate
+        self.per = per
+        self._channels = {}
+        self._pending_edits = {}
+        self._debounced = {}
+        self._seq = itertools.count()
+        
+        # Métricas
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.wait_total = {priority: 0.0 for priority in Priority}
+        self.wait_max = {priority: 0.0 for priority in Priority}
+        self.wait_count = {priority: 0 for priority in Priority}
+    
+    async def send(self, channel, *, priority: Priority = Priority.NORMAL, **kwargs):
+        """Enfileira channel.send(**kwargs) e retorna a mensagem enviada"""
+        job = _Job("send", channel, kwargs, priority)
+        return await self._submit(channel.id, job)
+    
+    async def edit(self, message, *, priority: Priority = Priority.NORMAL, **kwargs):
+        """Enfileira message.edit(**kwargs), agrupando com edições pendentes"""
+        pending = self._pending_edits.get(message.id)
+        if pending is not None:
+            pending.kwargs.update(kwargs)
+            self.coalesced += 1
+            future = asyncio.get_running_loop().create_future()
+            pending.futures.append(future)
+            return await future
+        
+        job = _Job("edit", message, kwargs, priority, edit_key=message.id)
+        self._pending_edits[message.id] = job
+        return await self._submit(message.channel.id, job)
+    
+    async def delete(self, message, *, priority: Priority = Priority.NORMAL):
+        """Enfileira message.delete()"""
+        job = _Job("delete", message, {}, priority)
+        return await self._submit(message.channel.id, job)
+    
+    def schedule_edit(self, message, render, *, window: float = EMBED_EDIT_WINDOW,
+                      priority: Priority = Priority.NORMAL):
+        """
+        Agenda uma edição com debounce de `message`.
+        
+        `render()` retorna os kwargs de message.edit e é chamado só na hora do
+        envio, então o estado mais recente sempre vence. A mensagem recebe no
+        máximo uma edição a cada `window` segundos.
+        """
+        entry = self._debounced.get(message.id)
+        if entry is not None:
+            entry.render = render
+            entry.dirty = True
+            self.coalesced += 1
+            return
+        
+        entry = self._debounced[message.id] = _Debounce(message, render)
+        asyncio.create_task(self._debounce(entry, window, priority))
+    
+    async def _debounce(self, entry: _Debounce, window: float, priority: Priority):
+        try:
+            while entry.dirty:
+                entry.dirty = False
+                try:
+                    await self.edit(entry.message, priority=priority, **entry.render())
+                except Exception as e:
+                    logger.error(f"Erro ao atualizar a mensagem {entry.message.id}: {e}")
+                await asyncio.sleep(window)
+        finally:
+            self._debounced.pop(entry.message.id, None)
+    
+    def _submit(self, channel_id: int, job: _Job):
+        state = self._channels.get(channel_id)
+        if state is None:
+            state = self._channels[channel_id] = _Channel(_Bucket(self.rate, self.per))
+        
+        future = asyncio.get_running_loop().create_future()
+        job.futures.append(future)
+        heapq.heappush(state.heap, (job.priority, next(self._seq), job))
+        
+        if state.task is None:
+            state.task = asyncio.create_task(self._worker(channel_id, state))
+        return future
+    
+    async def _worker(self, channel_id: int, state: _Channel):
+        try:
+            while state.heap:
+                await state.bucket.acquire()
+                _, _, job = heapq.heappop(state.heap)
+                if job.edit_key is not None:
+                    self._pending_edits.pop(job.edit_key, None)
+                
+                waited = time.monotonic() - job.enqueued_at
+                self.wait_total[job.priority] += waited
+                self.wait_count[job.priority] += 1
+                self.wait_max[job.priority] = max(self.wait_max[job.priority], waited)
+                
+                try:
+                    result = await getattr(job.target, job.action)(**job.kwargs)
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Erro ao executar {job.action} no canal {channel_id}: {e}")
+                    for future in job.futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    self.sent += 1
+                    for future in job.futures:
+                        if not future.done():
+                            future.set_result(result)
+        finally:
+            state.task = None
+            if not state.heap:
+                self._channels.pop(channel_id, None)
+    
+    def queue_depth(self) -> int:
+        """Total de envios aguardando em todos os canais"""
+        return sum(len(state.heap) for state in self._channels.values())
+    
+    async def close(self):
+        """Aguarda o esvaziamento das filas"""
+        tasks = [state.task for state in self._channels.values() if state.task]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def stats(self) -> dict:
+        """Retorna as métricas do agendador"""
+        return {
+            "queue_depth": self.queue_depth(),
+            "channels": len(self._channels),
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "wait_avg_ms": {
+                priority.name: round(self.wait_total[priority] / self.wait_count[priority] * 1000, 2)
+                for priority in Priority if self.wait_count[priority]
+            },
+            "wait_max_ms": {
+                priority.name: round(self.wait_max[priority] * 1000, 2)
+                for priority in Priority if self.wait_count[priority]
+            },
+        }
+
+
+outbound = OutboundScheduler()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+import brcode
+from models import run_db, User
+from qr_render import qr_renderer
+from config import PIX_KEY, PIX_ACCOUNT_HOLDER, BET_VALUES
+
+logger = logging.getLogger(__name__)
+
+MERCHANT_CITY = "Sao Paulo"
+
+
+@dataclass(frozen=True)
+class PixReceiver:
+    """Recebedor dos pagamentos de uma partida"""
+    
+    key: str
+    name: str
+    city: str = MERCHANT_CITY
+    
+    def payload(self, amount: float, txid: str = None) -> str:
+        """Pix Copia e Cola do valor, a partir do template em cache do recebedor"""
+        return brcode.template(self.key, self.name, self.city).render(amount, txid)
+
+
+def default_receiver() -> Optional[PixReceiver]:
+    """Recebedor global do .env, usado quando o mediador não configurou o Pix"""
+    if not PIX_KEY:
+        return None
+    return PixReceiver(PIX_KEY, PIX_ACCOUNT_HOLDER or "Bot Esquilo")
+
+
+def _load_receiver(session, guild_id: str, user_id: str):
+    return (
+        session.query(User.pix_key, User.pix_account_holder, User.username)
+        .filter_by(guild_id=guild_id, user_id=user_id)
+        .first()
+    )
+
+
+class PixReceivers:
+    """
+    Recebedor Pix de cada mediador, em cache.
+    
+    Quando o mediador muda seus dados, `invalidate` descarta a entrada e os
+    QR Codes da chave antiga e pré-renderiza os da nova, então a confirmação
+    de partida nunca renderiza imagem para trocar de recebedor.
+    """
+    
+    def __init__(self, renderer=qr_renderer, amounts=BET_VALUES):
+        self.renderer = renderer
+        self.amounts = list(amounts)
+        self._entries = {}
+        self._tasks = set()
+    
+    async def get(self, guild_id: str, user_id: str) -> Optional[PixReceiver]:
+        """Recebedor do mediador, ou o global se ele não tiver chave"""
+        key = (str(guild_id), str(user_id))
+        if key in self._entries:
+            return self._entries[key]
+        
+        row = await run_db(_load_receiver, *key)
+        if row is not None and row.pix_key:
+            receiver = PixReceiver(row.pix_key, row.pix_account_holder or row.username)
+        else:
+            receiver = default_receiver()
+        self._entries[key] = receiver
+        return receiver
+    
+    async def render(self, receiver: PixReceiver, amount: float, txid: str = None) -> bytes:
+        """PNG do QR Code do recebedor para o valor; com txid a imagem é única e não entra no cache"""
+        return await self.renderer.render(receiver.payload(amount, txid), cache=txid is None)
+    
+    def prewarm(self, receiver: Optional[PixReceiver]):
+        """Pré-renderiza em segundo plano os QR Codes de todos os valores de aposta"""
+        if receiver is None:
+            return
+        task = asyncio.create_task(
+            self.renderer.prewarm(receiver.payload(amount) for amount in self.amounts)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def invalidate(self, guild_id: str, user_id: str):
+        """Descarta o recebedor do mediador e as imagens da chave antiga"""
+        old = self._entries.pop((str(guild_id), str(user_id)), None)
+        if old is not None and old != default_receiver():
+            field = brcode.tlv(brcode.ID_KEY, old.key)
+            if not any(r is not None and r.key == old.key for r in self._entries.values()):
+                self.renderer.invalidate(lambda payload: field in payload)
+        
+        self.prewarm(await self.get(guild_id, user_id))
+    
+    def stats(self) -> dict:
+        return {"receivers": len(self._entries)}
+
+
+pix_receivers = PixReceivers()
@@ -1,58 +1,111 @@
 import qrcode
 import io
+import brcode
+from PIL import Image
 from datetime import datetime
-import uuid
-from config import PIX_KEY, PIX_BANK_CODE, PIX_ACCOUNT_HOLDER, PIX_ACCOUNT_NUMBER
+from config import (
+    PIX_KEY, PIX_BANK_CODE, PIX_ACCOUNT_HOLDER, PIX_ACCOUNT_NUMBER, QR_BOX_SIZE, QR_FORMAT
+)
 
-def generate_pix_qrcode(amount: float, description: str = None) -> io.BytesIO:
+def pix_payload(amount: float, description: str = None, pix_key: str = None) -> str:
     """
-    Gera um QR Code Pix com os dados da transação.
-    
-    Args:
-        amount: Valor da transação em reais
-        description: Descrição da transação (opcional)
+    Monta o Pix Copia e Cola do recebedor configurado.
     
-    Returns:
-        BytesIO object com a imagem PNG do QR Code
+    Sem descrição o payload depende só da chave e do valor, então o QR Code
+    de cada valor pode ser renderizado uma vez e reaproveitado.
     """
-    
-    # Estrutura do Pix Copia e Cola (EMV)
-    # Formato: 00020126360014br.gov.bcb.pix...
-    
-    if not PIX_KEY:
+    pix_key = pix_key or PIX_KEY
+    if not pix_key:
         raise ValueError("PIX_KEY não configurada no arquivo .env")
     
-    # Gerar ID único para a transação
-    transaction_id = str(uuid.uuid4())[:8].upper()
-    
-    # Montar a string Pix
-    pix_string = mount_pix_string(
-        pix_key=PIX_KEY,
+    return mount_pix_string(
+        pix_key=pix_key,
         amount=amount,
-        description=description or f"Aposta Esquilo - {transaction_id}",
+        description=description,
         merchant_name=PIX_ACCOUNT_HOLDER or "Bot Esquilo",
         merchant_city="Sao Paulo"
     )
-    
-    # Gerar QR Code
+
+
+def qr_matrix(payload: str, border: int = 2) -> list:
+    """Módulos do QR Code (True = escuro), já com a borda"""
     qr = qrcode.QRCode(
-        version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=2,
+        border=border,
     )
-    qr.add_data(pix_string)
+    qr.add_data(payload)
     qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_qr_png(payload: str, box_size: int = QR_BOX_SIZE, border: int = 2) -> bytes:
+    """
+    Renderiza o QR Code do payload em PNG de 1 bit (CPU; rodar fora do event loop).
     
-    # Criar imagem
-    img = qr.make_image(fill_color="black", back_color="white")
+    A imagem é montada com um pixel por módulo e ampliada sem interpolação,
+    então sai em preto e branco puro e o PNG comprime bem.
+    """
+    matrix = qr_matrix(payload, border)
+    size = len(matrix)
+    
+    data = bytes(0 if dark else 255 for row in matrix for dark in row)
+    img = Image.frombytes('L', (size, size), data).convert('1', dither=Image.Dither.NONE)
+    if box_size > 1:
+        img = img.resize((size * box_size, size * box_size), Image.Resampling.NEAREST)
     
-    # Converter para BytesIO
     img_bytes = io.BytesIO()
-    img.save(img_bytes, format='PNG')
-    img_bytes.seek(0)
+    img.save(img_bytes, format='PNG', optimize=True)
+    return img_bytes.getvalue()
+
+
+def render_qr_svg(payload: str, box_size: int = QR_BOX_SIZE, border: int = 2) -> bytes:
+    """Renderiza o QR Code como SVG com um único path (um retângulo por trecho escuro de cada linha)"""
+    matrix = qr_matrix(payload, border)
+    size = len(matrix)
+    
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+    
+    pixels = size * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(path)}"/></svg>'
+    ).encode()
+
+
+def render_qr(payload: str, fmt: str = QR_FORMAT, box_size: int = QR_BOX_SIZE) -> bytes:
+    """Renderiza no formato configurado ('png' ou 'svg')"""
+    if fmt == 'svg':
+        return render_qr_svg(payload, box_size)
+    return render_qr_png(payload, box_size)
+
+
+def generate_pix_qrcode(amount: float, description: str = None) -> io.BytesIO:
+    """
+    Gera um QR Code Pix com os dados da transação.
+    
+    Síncrono; no bot use `pix_receivers.render(...)`, que usa a chave do
+    mediador, roda em um pool e guarda o resultado em cache.
     
-    return img_bytes
+    Args:
+        amount: Valor da transação em reais
+        description: Descrição da transação (opcional)
+    
+    Returns:
+        BytesIO object com a imagem PNG do QR Code
+    """
+    return io.BytesIO(render_qr_png(pix_payload(amount, description)))
 
 
 def mount_pix_string(pix_key: str, amount: float, description: str, 
@@ -70,37 +123,7 @@ def mount_pix_string(pix_key: str, amount: float, description: str,
     Returns:
         String Pix formatada
     """
-    
-    # Formato EMV Pix
-    payload = "00020126360014br.gov.bcb.pix"
-    
-    # Adicionar chave Pix
-    payload += f"0136{len(pix_key):02d}{pix_key}"
-    
-    # Adicionar informações do merchant
-    merchant_info = f"5204{merchant_name[:25]}"
-    payload += f"52{len(merchant_info):02d}{merchant_info}"
-    
-    # Adicionar cidade
-    city_info = f"05{len(merchant_city):02d}{merchant_city}"
-    payload += f"50{len(city_info):02d}{city_info}"
-    
-    # Adicionar valor (se houver)
-    if amount > 0:
-        amount_str = f"{amount:.2f}".replace(".", "")
-        payload += f"54{len(amount_str):02d}{amount_str}"
-    
-    # Adicionar descrição
-    if description:
-        desc_info = f"05{len(description):02d}{description}"
-        payload += f"62{len(desc_info):02d}{desc_info}"
-    
-    # Adicionar checksum (CRC16)
-    payload += "63"
-    crc = calculate_crc16(payload + "0000")
-    payload += f"{crc:04X}"
-    
-    return payload
+    return brcode.encode(pix_key, merchant_name, merchant_city, amount, info=description)
 
 
 def calculate_crc16(data: str) -> int:
@@ -113,20 +136,10 @@ def calculate_crc16(data: str) -> int:
     Returns:
         Valor CRC16
     """
-    crc = 0xFFFF
-    
-    for byte in data.encode():
-        crc ^= byte << 8
-        for _ in range(8):
-            crc <<= 1
-            if crc & 0x10000:
-                crc ^= 0x1021
-            crc &= 0xFFFF
-    
-    return crc
+    return brcode.crc16(data)
 
 
-def create_pix_embed(amount: float, match_id: str, mediator_name: str):
+def create_pix_embed(amount: float, match_id: str, mediator_name: str, pix_key: str = None):
     """
     Cria um embed Discord com informações de pagamento Pix.
     
@@ -134,6 +147,7 @@ def create_pix_embed(amount: float, match_id: str, mediator_name: str):
         amount: Valor em reais
         match_id: ID da partida
         mediator_name: Nome do mediador
+        pix_key: Chave Pix do recebedor (padrão: PIX_KEY)
     
     Returns:
         Dicionário com dados do embed
@@ -167,7 +181,7 @@ def create_pix_embed(amount: float, match_id: str, mediator_name: str):
     
     embed.add_field(
         name="🔑 Chave Pix",
-        value=f"`{PIX_KEY}`",
+        value=f"`{pix_key or PIX_KEY}`",
         inline=False
     )
     
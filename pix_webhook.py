@@ -0,0 +1,331 @@
+import asyncio
+import hmac
+import logging
+import secrets
+import string
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from aiohttp import web
+from sqlalchemy import update
+from models import run_db, Match
+from match_state import CONFIRMED
+from config import (
+    PIX_WEBHOOK_PATH, PIX_WEBHOOK_SECRET, PIX_WEBHOOK_BATCH, PIX_WEBHOOK_INTERVAL, PIX_WEBHOOK_QUEUE
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Webhook-Secret"
+TXID_ALPHABET = string.ascii_letters + string.digits
+TXID_LENGTH = 25
+
+# Tolerância de arredondamento ao comparar o valor pago com a aposta
+AMOUNT_TOLERANCE = 0.005
+
+# Espera antes de tentar de novo um lote que falhou (dobra a cada falha)
+RETRY_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# Sentinela usada para encerrar a tarefa de conciliação
+_STOP = object()
+
+
+def generate_txid() -> str:
+    """txid aleatório de 25 caracteres alfanuméricos (limite do BR Code)"""
+    return "".join(secrets.choice(TXID_ALPHABET) for _ in range(TXID_LENGTH))
+
+
+@dataclass(frozen=True)
+class Payment:
+    """Pix recebido, como enviado pelo PSP"""
+    
+    txid: str
+    amount: float
+    end_to_end_id: str = ""
+
+
+@dataclass(frozen=True)
+class PaidMatch:
+    """Partida de um Pix conciliado em um lote"""
+    
+    id: int
+    match_id: str
+    guild_id: str
+    mediator_id: Optional[str]
+    channel_id: Optional[str]
+    amount: float
+
+
+def parse_notification(body) -> list:
+    """
+    Extrai os pagamentos do corpo no formato do webhook Pix do BCB.
+    
+    {"pix": [{"endToEndId": "...", "txid": "...", "valor": "10.00", ...}]}
+    Pix sem txid não pode ser conciliado e é ignorado.
+    """
+    entries = body.get("pix") if isinstance(body, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError("campo 'pix' ausente")
+    
+    payments = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError("notificação inválida")
+        txid = entry.get("txid")
+        if not txid:
+            continue
+        try:
+            amount = float(entry["valor"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"valor inválido para o txid {txid}")
+        payments.append(Payment(str(txid), amount, str(entry.get("endToEndId", ""))))
+    return payments
+
+
+def mark_paid(session, payments: list) -> tuple:
+    """
+    Marca como pagas, em um único UPDATE, as partidas confirmadas dos txids do lote.
+    
+    Notificações repetidas, txids desconhecidos e valores abaixo da aposta são
+    ignorados; o filtro `paid_at IS NULL` garante que cada partida é paga uma vez.
+    Pix de partidas que não estão mais confirmadas (canceladas ou expiradas)
+    não marcam a partida e voltam em `late`, para estorno.
+    Retorna (pagas, atrasadas).
+    """
+    by_txid = {}
+    for payment in payments:
+        by_txid.setdefault(payment.txid, payment)
+    if not by_txid:
+        return [], []
+    
+    rows = (
+        session.query(
+            Match.id, Match.match_id, Match.guild_id, Match.mediator_id, Match.confirmation_channel_id,
+            Match.bet_value, Match.txid, Match.status
+        )
+        .filter(Match.txid.in_(list(by_txid)), Match.paid_at.is_(None))
+        .with_for_update()
+        .all()
+    )
+    
+    paid, late = [], []
+    for row in rows:
+        payment = by_txid[row.txid]
+        match = PaidMatch(row.id, row.match_id, row.guild_id, row.mediator_id, row.confirmation_channel_id, payment.amount)
+        if row.status != CONFIRMED:
+            logger.warning(
+                f"Pix {row.txid} de R$ {payment.amount:.2f} ({payment.end_to_end_id}) recebido para a "
+                f"partida {row.match_id} com status {row.status}: estornar"
+            )
+            late.append(match)
+            continue
+        if payment.amount + AMOUNT_TOLERANCE < row.bet_value:
+            logger.warning(f"Pix {row.txid} de R$ {payment.amount:.2f} abaixo da aposta da partida {row.match_id}")
+            continue
+        paid.append(match)
+    
+    if paid:
+        session.execute(
+            update(Match)
+            .where(
+                Match.id.in_([match.id for match in paid]), Match.status == CONFIRMED, Match.paid_at.is_(None)
+            )
+            .values(paid_at=datetime.utcnow())
+        )
+    return paid, late
+
+
+class PixWebhook:
+    """
+    Receptor dos webhooks de pagamento do PSP.
+    
+    O handler HTTP só valida e enfileira as notificações, respondendo na hora;
+    uma tarefa em segundo plano concilia os pagamentos em lotes de até
+    `batch_size` (ou a cada `flush_interval` segundos) fora do event loop e
+    chama `on_paid` com as partidas pagas. Como o PSP não reenvia uma
+    notificação respondida com 200, um lote que falha no banco é tentado de
+    novo com espera crescente até dar certo; enquanto isso a fila enche e o
+    handler responde 503, e o PSP reenvia depois.
+    """
+    
+    def __init__(self, on_paid=None, secret: str = PIX_WEBHOOK_SECRET, path: str = PIX_WEBHOOK_PATH,
+                 batch_size: int = PIX_WEBHOOK_BATCH, flush_interval: float = PIX_WEBHOOK_INTERVAL,
+                 max_queue: int = PIX_WEBHOOK_QUEUE, retry_delay: float = RETRY_DELAY):
+        self.on_paid = on_paid
+        self.secret = secret
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.retry_delay = retry_delay
+        self._queue = None
+        self._closing = None
+        self._task = None
+        self._runner = None
+        
+        # Contadores
+        self.received = 0
+        self.paid = 0
+        self.late = 0
+        self.ignored = 0
+        self.rejected = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+        self.max_batch_ms = 0.0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def app(self) -> web.Application:
+        """Aplicação aiohttp com a rota do webhook"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+    
+    def start(self):
+        """Inicia a tarefa de conciliação em segundo plano"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def listen(self, host: str, port: int):
+        """Inicia a tarefa e o servidor HTTP do webhook; sem segredo o webhook não é exposto"""
+        if not self.secret:
+            raise ValueError("PIX_WEBHOOK_SECRET não configurado")
+        self.start()
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook Pix ouvindo em {host}:{port}{self.path}")
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        """Valida a notificação e enfileira os pagamentos"""
+        if not self.secret or not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            return web.Response(status=401)
+        
+        try:
+            payments = parse_notification(await request.json())
+        except ValueError as e:
+            self.rejected += 1
+            return web.json_response({"erro": str(e)}, status=400)
+        
+        if not self.running or self._queue.maxsize - self._queue.qsize() < len(payments):
+            return web.Response(status=503, headers={"Retry-After": "5"})
+        
+        for payment in payments:
+            self._queue.put_nowait(payment)
+        self.received += len(payments)
+        return web.Response(status=200)
+    
+    async def _run(self):
+        while True:
+            payment = await self._queue.get()
+            if payment is _STOP:
+                return
+            
+            batch = [payment]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    payment = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if payment is _STOP:
+                    stop = True
+                    break
+                batch.append(payment)
+            
+            await self._flush(batch)
+            if stop:
+                return
+    
+    async def _flush(self, batch: list):
+        delay = self.retry_delay
+        while True:
+            start = time.perf_counter()
+            try:
+                paid, late = await run_db(mark_paid, batch)
+                break
+            except Exception as e:
+                txids = ', '.join(f"{p.txid}/{p.end_to_end_id}" for p in batch)
+                if self._closing is None or self._closing.is_set():
+                    # Encerrando: sem como tentar de novo, fica no log para conciliar à mão
+                    self.failed += len(batch)
+                    logger.error(f"Pix não conciliados ao encerrar ({txids}): {e}")
+                    return
+                self.retries += 1
+                logger.error(f"Erro ao conciliar {len(batch)} Pix ({txids}), nova tentativa em {delay:.0f}s: {e}")
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                self.batches += 1
+                self.last_batch_ms = elapsed
+                self.max_batch_ms = max(self.max_batch_ms, elapsed)
+            
+            try:
+                await asyncio.wait_for(self._closing.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, RETRY_MAX_DELAY)
+        
+        self.paid += len(paid)
+        self.late += len(late)
+        self.ignored += len(batch) - len(paid) - len(late)
+        if paid and self.on_paid is not None:
+            try:
+                await self.on_paid(paid)
+            except Exception as e:
+                logger.error(f"Erro ao avisar {len(paid)} pagamentos: {e}")
+    
+    async def close(self):
+        """Para o servidor e concilia o que ainda estiver na fila"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        
+        if self._task is None:
+            return
+        # Uma última tentativa para o lote em andamento e a fila restante
+        self._closing.set()
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        
+        rows = []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        for i in range(0, len(rows), self.batch_size):
+            await self._flush(rows[i:i + self.batch_size])
+        
+        logger.info(f"Webhook Pix encerrado: {self.stats()}")
+    
+    def stats(self) -> dict:
+        """Retorna os contadores do webhook"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "received": self.received,
+            "paid": self.paid,
+            "late": self.late,
+            "ignored": self.ignored,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "max_batch_ms": round(self.max_batch_ms, 2),
+        }
+
+
+pix_webhook = PixWebhook()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pix_utils import render_qr
+from config import QR_WORKERS, QR_USE_PROCESSES, QR_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class QRRenderer:
+    """
+    Renderização de QR Codes fora do event loop, com cache LRU por payload.
+    
+    O qrcode e o Pillow são CPU puro; com `use_processes` eles rodam em outros
+    processos e não disputam o GIL com o gateway. Pedidos simultâneos do
+    mesmo payload compartilham uma única renderização.
+    """
+    
+    def __init__(self, workers: int = QR_WORKERS, use_processes: bool = QR_USE_PROCESSES,
+                 cache_size: int = QR_CACHE_SIZE, render=render_qr):
+        self.workers = workers
+        self.use_processes = use_processes
+        self.cache_size = cache_size
+        self._render = render
+        self._executor = None
+        self._cache = OrderedDict()
+        self._pending = {}
+        
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.render_ms = 0.0
+    
+    def _get_executor(self):
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qr")
+        return self._executor
+    
+    async def render(self, payload: str, cache: bool = True) -> bytes:
+        """Retorna o PNG do payload, do cache ou renderizado no pool; `cache=False` para payloads únicos"""
+        image = self._cache.get(payload)
+        if image is not None:
+            self._cache.move_to_end(payload)
+            self.hits += 1
+            return image
+        
+        future = self._pending.get(payload)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+        
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[payload] = future
+        start = time.perf_counter()
+        try:
+            image = await loop.run_in_executor(self._get_executor(), self._render, payload)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # evita o aviso de exceção não recuperada
+            raise
+        else:
+            future.set_result(image)
+            if cache:
+                self._store(payload, image)
+            return image
+        finally:
+            self._pending.pop(payload, None)
+            self.render_ms = (time.perf_counter() - start) * 1000
+    
+    def _store(self, payload: str, image: bytes):
+        self._cache[payload] = image
+        self._cache.move_to_end(payload)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    async def prewarm(self, payloads):
+        """Renderiza antecipadamente os payloads informados"""
+        results = await asyncio.gather(*(self.render(p) for p in payloads), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            logger.warning(f"{len(failed)} QR Codes não puderam ser pré-renderizados: {failed[0]}")
+        logger.info(f"{len(results) - len(failed)} QR Codes pré-renderizados")
+    
+    def invalidate(self, predicate=None):
+        """Remove do cache os payloads para os quais `predicate` é verdadeiro (ou todos)"""
+        if predicate is None:
+            self._cache.clear()
+            return
+        for payload in [p for p in self._cache if predicate(p)]:
+            del self._cache[payload]
+    
+    def close(self):
+        """Encerra o pool de renderização"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def stats(self) -> dict:
+        """Retorna as métricas do renderizador"""
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "last_render_ms": round(self.render_ms, 2),
+        }
+
+
+qr_renderer = QRRenderer()
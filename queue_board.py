@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from typing import Optional
+from models import Match, QueueBoardSlot
+from match_state import WAITING, CANCELLED, transition
+
+
+@dataclass
+class BoardSlot:
+    """Uma fila do painel (modalidade, modo, valor) e a mensagem que a mostra"""
+    
+    modality: str
+    mode: str
+    bet_value: float
+    channel_id: Optional[str] = None
+    message_id: Optional[str] = None
+    match_id: Optional[int] = None
+    room_id: Optional[str] = None
+    status: Optional[str] = None  # status da partida ligada; None se ela não existe mais
+    
+    @property
+    def key(self) -> tuple:
+        return (self.modality, self.mode, self.bet_value)
+
+
+@dataclass
+class BoardPlan:
+    """Operações que levam o painel salvo ao painel desejado"""
+    
+    keep: list = field(default_factory=list)         # mensagem e sala de espera ainda válidas
+    reprovision: list = field(default_factory=list)  # mensagem reaproveitada com uma sala nova
+    post: list = field(default_factory=list)         # filas sem mensagem no canal atual
+    delete: list = field(default_factory=list)       # mensagens a apagar
+    removed: list = field(default_factory=list)      # filas que saem do painel
+    
+    def needs_match(self) -> list:
+        """Slots que precisam de uma partida nova"""
+        return [slot for slot in self.reprovision + self.post if slot.match_id is None]
+
+
+def plan_board(existing: list, wanted: list, channel_id: str) -> BoardPlan:
+    """
+    Compara os slots salvos com as filas ativas `wanted` [(modalidade, modo, valor)].
+    
+    Slots de filas desativadas são apagados; os de outro canal são apagados e
+    reenviados no canal atual (mantendo a sala, se ainda estiver em espera);
+    os que apontam para uma partida que já saiu da espera ganham uma sala
+    nova na mesma mensagem. O que falta é enviado na ordem de `wanted`.
+    """
+    plan = BoardPlan()
+    wanted_keys = set(wanted)
+    current = {}
+    for slot in existing:
+        if slot.key in wanted_keys:
+            current[slot.key] = slot
+        else:
+            plan.delete.append(slot)
+            plan.removed.append(slot)
+    
+    for key in wanted:
+        slot = current.get(key)
+        if slot is None:
+            plan.post.append(BoardSlot(*key))
+        elif slot.channel_id != channel_id:
+            plan.delete.append(slot)
+            if slot.status == WAITING:
+                plan.post.append(BoardSlot(*key, match_id=slot.match_id, room_id=slot.room_id, status=WAITING))
+            else:
+                plan.post.append(BoardSlot(*key))
+        elif slot.status == WAITING:
+            plan.keep.append(slot)
+        else:
+            plan.reprovision.append(BoardSlot(*key, channel_id=slot.channel_id, message_id=slot.message_id))
+    return plan
+
+
+def load_board(session, guild_id: str) -> list:
+    """Slots salvos da guilda com a sala e o status da partida ligada"""
+    rows = (
+        session.query(QueueBoardSlot, Match.match_id, Match.status)
+        .outerjoin(Match, Match.id == QueueBoardSlot.match_id)
+        .filter(QueueBoardSlot.guild_id == guild_id)
+        .order_by(QueueBoardSlot.id)
+        .all()
+    )
+    return [
+        BoardSlot(
+            slot.modality, slot.mode, slot.bet_value, slot.channel_id, slot.message_id,
+            slot.match_id, room_id, status
+        )
+        for slot, room_id, status in rows
+    ]
+
+
+def save_board(session, guild_id: str, slots: list, removed: list, failed: list = ()) -> list:
+    """
+    Grava as mensagens dos slots enviados ou editados e apaga os removidos.
+    
+    As salas de espera das filas removidas e as criadas para slots `failed`,
+    cuja mensagem não chegou a ser enviada, são canceladas; retorna os ids delas.
+    """
+    rows = {
+        (row.modality, row.mode, row.bet_value): row
+        for row in session.query(QueueBoardSlot).filter(QueueBoardSlot.guild_id == guild_id)
+    }
+    for slot in slots:
+        row = rows.get(slot.key)
+        if row is None:
+            row = rows[slot.key] = QueueBoardSlot(
+                guild_id=guild_id, modality=slot.modality, mode=slot.mode, bet_value=slot.bet_value
+            )
+            session.add(row)
+        row.channel_id = slot.channel_id
+        row.message_id = slot.message_id
+        row.match_id = slot.match_id
+    
+    for slot in removed:
+        row = rows.pop(slot.key, None)
+        if row is not None:
+            session.delete(row)
+    
+    return transition(
+        session, [slot.match_id for slot in [*removed, *failed] if slot.match_id is not None], CANCELLED,
+        expected=(WAITING,)
+    )
@@ -0,0 +1,373 @@
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import insert, delete, update, tuple_, case
+from models import run_db, Match, MatchParticipant
+from match_state import WAITING, FULL, QUEUE_IDLE, CONFIRMATION, check
+from timer_wheel import deadlines
+from config import QUEUE_FLUSH_INTERVAL, QUEUE_IDLE_TIMEOUT, CONFIRMATION_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class QueueResult(Enum):
+    """Resultado de uma operação na fila"""
+    JOINED = "joined"
+    FULL = "full"               # entrou e completou a sala
+    LEFT = "left"
+    ALREADY_IN = "already_in"
+    NOT_IN = "not_in"
+    CLOSED = "closed"           # a sala já está cheia ou não aceita jogadores
+    IN_OTHER_ROOM = "in_other_room"
+    NOT_FOUND = "not_found"
+
+
+class Room:
+    """Estado em memória de uma sala de espera"""
+    
+    __slots__ = (
+        "match_id", "room_id", "guild_id", "capacity", "bet_value", "modality", "mode",
+        "players", "teams", "status", "message", "lock"
+    )
+    
+    def __init__(self, match_id: int, room_id: str, capacity: int = None, bet_value: float = None,
+                 players: list = None, guild_id: str = None):
+        self.match_id = match_id
+        self.room_id = room_id
+        self.guild_id = guild_id
+        self.capacity = capacity
+        self.bet_value = bet_value
+        self.players = players or []
+        self.teams = {}
+        self.status = WAITING
+        # Preenchidos pelo painel da fila (custom_id e mensagem)
+        self.modality = None
+        self.mode = None
+        self.message = None
+        self.lock = asyncio.Lock()
+    
+    @property
+    def is_full(self) -> bool:
+        return self.capacity is not None and len(self.players) >= self.capacity
+
+
+def _load_waiting_rooms(session) -> list:
+    rows = (
+        session.query(
+            Match.id, Match.match_id, Match.guild_id, Match.bet_value,
+            MatchParticipant.user_id, MatchParticipant.joined_at
+        )
+        .outerjoin(MatchParticipant, MatchParticipant.match_id == Match.id)
+        .filter(Match.status == WAITING)
+        .order_by(Match.id, MatchParticipant.id)
+        .all()
+    )
+    return rows
+
+
+def _persist(session, joins: list, leaves: list, statuses: dict, teams: dict = None):
+    """Aplica as alterações acumuladas da fila em poucas instruções"""
+    if leaves:
+        session.execute(delete(MatchParticipant).where(
+            tuple_(MatchParticipant.match_id, MatchParticipant.user_id).in_(leaves)
+        ))
+    if joins:
+        session.execute(
+            insert(MatchParticipant)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite"),
+            [
+                {"match_id": match_id, "user_id": user_id, "team": None, "joined_at": joined_at}
+                for match_id, user_id, joined_at in joins
+            ]
+        )
+    for status, match_ids in _group_statuses(statuses).items():
+        session.execute(update(Match).where(Match.id.in_(match_ids)).values(status=status))
+    for match_id, assignment in (teams or {}).items():
+        # Um único UPDATE por sala: team = CASE user_id WHEN ... END
+        session.execute(
+            update(MatchParticipant)
+            .where(MatchParticipant.match_id == match_id, MatchParticipant.user_id.in_(assignment))
+            .values(team=case(assignment, value=MatchParticipant.user_id))
+        )
+
+
+def _group_statuses(statuses: dict) -> dict:
+    grouped = {}
+    for match_id, status in statuses.items():
+        grouped.setdefault(status, []).append(match_id)
+    return grouped
+
+
+class QueueEngine:
+    """
+    Fonte da verdade das salas de espera.
+    
+    Cada sala tem seu roster e seu lock; entrar, sair e completar a sala são
+    transições atômicas em memória, então cliques simultâneos nunca passam da
+    capacidade. As mudanças são gravadas em `match_participants` e `matches`
+    em segundo plano, agrupadas a cada `flush_interval` segundos.
+    
+    O índice (guilda, jogador) -> sala garante que cada jogador esteja em no
+    máximo uma sala de espera por guilda.
+    
+    Cada entrada ou saída reagenda o prazo de inatividade da sala; ao
+    completar, a sala passa a ter o prazo de confirmação.
+    """
+    
+    def __init__(self, flush_interval: float = QUEUE_FLUSH_INTERVAL, scheduler=deadlines,
+                 idle_timeout: float = QUEUE_IDLE_TIMEOUT, confirmation_timeout: float = CONFIRMATION_TIMEOUT):
+        self.flush_interval = flush_interval
+        self.scheduler = scheduler
+        self.idle_timeout = idle_timeout
+        self.confirmation_timeout = confirmation_timeout
+        self.rooms = {}
+        self.active = {}
+        
+        # Alterações pendentes: (match_id, user_id) -> (presente?, horário)
+        self._membership = {}
+        self._statuses = {}
+        self._teams = {}
+        self._dirty = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = None
+        
+        # Métricas
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+    
+    async def load(self):
+        """Reconstrói as salas de espera a partir do banco"""
+        rows = await run_db(_load_waiting_rooms)
+        rooms = {}
+        active = {}
+        last_join = {}
+        for match_id, room_id, guild_id, bet_value, user_id, joined_at in rows:
+            room = rooms.get(match_id)
+            if room is None:
+                room = rooms[match_id] = Room(match_id, room_id, bet_value=bet_value, guild_id=guild_id)
+            if user_id is not None:
+                room.players.append(user_id)
+                active[(guild_id, user_id)] = match_id
+            if joined_at is not None and (match_id not in last_join or joined_at > last_join[match_id]):
+                last_join[match_id] = joined_at
+        self.rooms = rooms
+        self.active = active
+        
+        # O prazo de inatividade conta da última entrada gravada, não do reinício
+        now = datetime.utcnow()
+        for room in rooms.values():
+            joined_at = last_join.get(room.match_id)
+            self._touch(room, (now - joined_at).total_seconds() if joined_at else 0.0)
+        logger.info(f"{len(rooms)} salas de espera carregadas, {len(active)} jogadores na fila")
+    
+    def register(self, match_id: int, room_id: str, capacity: int, bet_value: float = None,
+                 guild_id: str = None) -> Room:
+        """Registra uma sala recém-criada"""
+        room = self.rooms[match_id] = Room(match_id, room_id, capacity, bet_value, guild_id=guild_id)
+        return room
+    
+    def active_room(self, guild_id: str, user_id: str) -> Room:
+        """Sala de espera em que o jogador está na guilda, se houver"""
+        match_id = self.active.get((guild_id, user_id))
+        return self.rooms.get(match_id) if match_id is not None else None
+    
+    def get(self, match_id: int) -> Room:
+        return self.rooms.get(match_id)
+    
+    async def join(self, match_id: int, user_id: str, capacity: int = None, move: bool = False):
+        """
+        Coloca o jogador na sala; retorna (QueueResult, Room, sala anterior).
+        
+        Se o jogador já estiver em outra sala de espera da guilda, retorna
+        IN_OTHER_ROOM com a outra sala, ou, com `move=True`, sai dela e entra
+        nesta na mesma operação.
+        """
+        room = self.rooms.get(match_id)
+        if room is None:
+            return QueueResult.NOT_FOUND, None, None
+        
+        key = (room.guild_id, user_id)
+        while True:
+            previous = self.active_room(*key)
+            if previous is room:
+                previous = None
+            
+            # Travar as duas salas sempre na mesma ordem evita deadlock
+            rooms = sorted(filter(None, (room, previous)), key=lambda r: r.match_id)
+            async with contextlib.AsyncExitStack() as stack:
+                for locked in rooms:
+                    await stack.enter_async_context(locked.lock)
+                
+                current = self.active_room(*key)
+                if current is not previous and current is not room:
+                    continue  # o índice mudou enquanto esperava os locks
+                if current is room:
+                    previous = None
+                
+                if room.capacity is None:
+                    room.capacity = capacity
+                if user_id in room.players:
+                    return QueueResult.ALREADY_IN, room, None
+                if room.status != WAITING or room.is_full:
+                    return QueueResult.CLOSED, room, None
+                
+                if previous is not None:
+                    if not move:
+                        return QueueResult.IN_OTHER_ROOM, room, previous
+                    previous.players.remove(user_id)
+                    self._mark(previous.match_id, user_id, False)
+                    self._touch(previous)
+                
+                room.players.append(user_id)
+                self.active[key] = match_id
+                self._mark(match_id, user_id, True)
+                
+                if room.is_full:
+                    room.status = check(room.status, FULL)
+                    self._statuses[match_id] = FULL
+                    # Jogadores de uma sala cheia não estão mais esperando
+                    for player in room.players:
+                        self.active.pop((room.guild_id, player), None)
+                    self.scheduler.cancel(QUEUE_IDLE, match_id)
+                    if self.confirmation_timeout:
+                        self.scheduler.schedule(CONFIRMATION, match_id, self.confirmation_timeout)
+                    return QueueResult.FULL, room, previous
+                self._touch(room)
+                return QueueResult.JOINED, room, previous
+    
+    async def leave(self, match_id: int, user_id: str):
+        """Tira o jogador da sala; retorna (QueueResult, Room)"""
+        room = self.rooms.get(match_id)
+        if room is None:
+            return QueueResult.NOT_FOUND, None
+        
+        async with room.lock:
+            if user_id not in room.players:
+                return QueueResult.NOT_IN, room
+            if room.status != WAITING:
+                return QueueResult.CLOSED, room
+            
+            room.players.remove(user_id)
+            if self.active.get((room.guild_id, user_id)) == match_id:
+                del self.active[(room.guild_id, user_id)]
+            self._mark(match_id, user_id, False)
+            self._touch(room)
+            return QueueResult.LEFT, room
+    
+    async def expire_idle(self, match_ids: list) -> list:
+        """Esvazia as salas de espera sem movimento; retorna as salas esvaziadas"""
+        expired = []
+        for match_id in match_ids:
+            room = self.rooms.get(match_id)
+            if room is None:
+                continue
+            async with room.lock:
+                # Alguém entrou ou saiu depois do vencimento e reagendou o prazo
+                if room.status != WAITING or not room.players or self.scheduler.pending(QUEUE_IDLE, match_id):
+                    continue
+                for player in room.players:
+                    if self.active.get((room.guild_id, player)) == match_id:
+                        del self.active[(room.guild_id, player)]
+                    self._mark(match_id, player, False)
+                room.players = []
+                expired.append(room)
+        return expired
+    
+    def close_room(self, match_id: int):
+        """Remove uma sala que saiu da fase de espera"""
+        self.scheduler.cancel_all(match_id)
+        room = self.rooms.pop(match_id, None)
+        if room is None:
+            return
+        for player in room.players:
+            if self.active.get((room.guild_id, player)) == match_id:
+                del self.active[(room.guild_id, player)]
+    
+    def set_teams(self, match_id: int, teams: dict):
+        """Registra a divisão de times de uma sala cheia ({user_id: 'team1' | 'team2'})"""
+        room = self.rooms.get(match_id)
+        if room is not None:
+            room.teams = dict(teams)
+        self._teams[match_id] = dict(teams)
+        self._dirty.set()
+    
+    def _touch(self, room: Room, elapsed: float = 0.0):
+        """Reinicia o prazo de inatividade da sala (só enquanto houver jogadores esperando)"""
+        if room.status == WAITING and room.players and self.idle_timeout:
+            self.scheduler.schedule(QUEUE_IDLE, room.match_id, max(0.0, self.idle_timeout - elapsed))
+        else:
+            self.scheduler.cancel(QUEUE_IDLE, room.match_id)
+    
+    def _mark(self, match_id: int, user_id: str, present: bool):
+        self._membership[(match_id, user_id)] = (present, datetime.utcnow())
+        self._dirty.set()
+    
+    def start(self):
+        """Inicia a gravação em segundo plano"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while not self._closing.is_set():
+            await self._dirty.wait()
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    async def flush(self):
+        """Grava no banco as alterações pendentes"""
+        self._dirty.clear()
+        if not self._membership and not self._statuses and not self._teams:
+            return
+        
+        membership, self._membership = self._membership, {}
+        statuses, self._statuses = self._statuses, {}
+        teams, self._teams = self._teams, {}
+        joins = [(m, u, at) for (m, u), (present, at) in membership.items() if present]
+        leaves = [(m, u) for (m, u), (present, _) in membership.items() if not present]
+        
+        start = time.perf_counter()
+        try:
+            await run_db(_persist, joins, leaves, statuses, teams)
+        except Exception as e:
+            logger.error(f"Erro ao gravar a fila: {e}")
+            # Devolve o que não foi gravado, sem sobrescrever mudanças mais novas
+            for key, value in membership.items():
+                self._membership.setdefault(key, value)
+            for key, value in statuses.items():
+                self._statuses.setdefault(key, value)
+            for key, value in teams.items():
+                self._teams.setdefault(key, value)
+            self._dirty.set()
+        finally:
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+    
+    async def close(self):
+        """Para a tarefa e grava o que estiver pendente"""
+        if self._task is not None:
+            self._closing.set()
+            self._dirty.set()
+            await self._task
+            self._task = None
+        await self.flush()
+    
+    def stats(self) -> dict:
+        """Retorna as métricas da fila"""
+        return {
+            "rooms": len(self.rooms),
+            "players": sum(len(room.players) for room in self.rooms.values()),
+            "waiting_players": len(self.active),
+            "pending": len(self._membership) + len(self._statuses) + len(self._teams),
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+queue_engine = QueueEngine()
@@ -0,0 +1,81 @@
+from sqlalchemy import select, update, bindparam
+from models import Match, MatchParticipant, User
+from config import RATING_INITIAL, RATING_K
+
+TEAMS = ('team1', 'team2')
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    """Probabilidade de vitória prevista pelo Elo"""
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def apply_match(ratings: dict, team1: list, team2: list, winner_team: str,
+                k: float = RATING_K, initial: float = RATING_INITIAL) -> float:
+    """
+    Atualiza `ratings` com o resultado de uma partida entre dois times.
+    
+    Cada time joga com a média dos ratings dos seus jogadores; todos do time
+    vencedor ganham os mesmos pontos que os do time perdedor perdem. Retorna a
+    variação do time 1.
+    """
+    mean1 = sum(ratings.get(p, initial) for p in team1) / len(team1)
+    mean2 = sum(ratings.get(p, initial) for p in team2) / len(team2)
+    delta = k * ((1.0 if winner_team == 'team1' else 0.0) - expected_score(mean1, mean2))
+    for player in team1:
+        ratings[player] = ratings.get(player, initial) + delta
+    for player in team2:
+        ratings[player] = ratings.get(player, initial) - delta
+    return delta
+
+
+def update_ratings(session, guild_id: str, match_ids: list, k: float = RATING_K) -> dict:
+    """
+    Aplica ao rating dos jogadores as partidas liquidadas, na ordem dos ids.
+    
+    Lê os ratings atuais em uma consulta e grava os novos com um único
+    executemany. Retorna {user_id: novo rating}.
+    """
+    if not match_ids:
+        return {}
+    
+    rows = session.execute(
+        select(MatchParticipant.match_id, MatchParticipant.user_id, MatchParticipant.team, Match.winner_team)
+        .join(Match, Match.id == MatchParticipant.match_id)
+        .where(MatchParticipant.match_id.in_(match_ids), MatchParticipant.team.in_(TEAMS))
+        .order_by(MatchParticipant.match_id)
+    ).all()
+    
+    matches = {}
+    for match_id, user_id, team, winner_team in rows:
+        entry = matches.setdefault(match_id, (winner_team, {'team1': [], 'team2': []}))
+        entry[1][team].append(user_id)
+    
+    players = {user_id for _, user_id, _, _ in rows}
+    ratings = {
+        user_id: rating if rating is not None else RATING_INITIAL
+        for user_id, rating in session.execute(
+            select(User.user_id, User.rating).where(User.guild_id == guild_id, User.user_id.in_(players))
+        )
+    }
+    known = set(ratings)
+    
+    for winner_team, teams in matches.values():
+        if teams['team1'] and teams['team2'] and winner_team in TEAMS:
+            apply_match(ratings, teams['team1'], teams['team2'], winner_team, k)
+    
+    write_ratings(session, guild_id, {p: r for p, r in ratings.items() if p in known})
+    return ratings
+
+
+def write_ratings(session, guild_id: str, ratings: dict):
+    """Grava vários ratings de uma guilda com um executemany"""
+    if not ratings:
+        return
+    users = User.__table__
+    session.execute(
+        update(users)
+        .where(users.c.guild_id == guild_id, users.c.user_id == bindparam('b_user_id'))
+        .values(rating=bindparam('b_rating')),
+        [{'b_user_id': user_id, 'b_rating': rating} for user_id, rating in ratings.items()]
+    )
@@ -0,0 +1,159 @@
+"""
+Recalcula do zero o rating (Elo) dos jogadores de uma guilda.
+
+Reproduz todo o histórico de `matches`/`match_participants` em ordem de
+conclusão. Partidas sem jogadores em comum não dependem uma da outra, então
+o histórico é dividido em rodadas de partidas independentes e cada rodada é
+calculada de uma vez com NumPy; o resultado é idêntico ao das atualizações
+incrementais feitas a cada /resultado.
+
+Uso (migrações e ajuste do fator K):
+    python rating_replay.py <guild_id> [--k 32] [--initial 1000] [--dry-run]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import select, update
+
+from models import SessionLocal, Match, MatchParticipant, User
+from match_state import COMPLETED
+from config import RATING_INITIAL, RATING_K
+from rating import TEAMS, write_ratings
+
+
+def load_history(session, guild_id: str) -> list:
+    """Participações das partidas concluídas: (partida, jogador, time, vencedor), em ordem"""
+    return session.execute(
+        select(MatchParticipant.match_id, MatchParticipant.user_id, MatchParticipant.team, Match.winner_team)
+        .join(Match, Match.id == MatchParticipant.match_id)
+        .where(
+            Match.guild_id == guild_id,
+            Match.status == COMPLETED,
+            Match.winner_team.in_(TEAMS),
+            MatchParticipant.team.in_(TEAMS)
+        )
+        .order_by(Match.completed_at, Match.id)
+    ).all()
+
+
+def replay(rows: list, k: float = RATING_K, initial: float = RATING_INITIAL) -> tuple:
+    """
+    Calcula os ratings a partir das participações em ordem cronológica.
+    
+    Retorna ({user_id: rating}, log loss médio das previsões), útil para
+    comparar valores de K.
+    """
+    if not rows:
+        return {}, 0.0
+    
+    users = {}
+    player_index = np.array([users.setdefault(row[1], len(users)) for row in rows])
+    side = np.array([row[2] == 'team2' for row in rows], dtype=np.int64)
+    
+    # As participações de uma partida são contíguas (a consulta ordena por partida)
+    codes = np.array([row[0] for row in rows])
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(rows)])
+    team1_won = np.array([rows[i][3] == 'team1' for i in starts.tolist()], dtype=float)
+    
+    # Descarta partidas sem os dois times
+    team2_size = np.add.reduceat(side, starts)
+    valid = (team2_size > 0) & (team2_size < sizes)
+    
+    # Rodada de cada partida: logo depois da última rodada de qualquer um dos
+    # seus jogadores; dentro de uma rodada nenhum jogador se repete. É a única
+    # etapa sequencial, feita sobre inteiros puros.
+    player_list = player_index.tolist()
+    last_round = [0] * len(users)
+    rounds = []
+    for start, size, ok in zip(starts.tolist(), sizes.tolist(), valid.tolist()):
+        if not ok:
+            rounds.append(0)
+            continue
+        members = player_list[start:start + size]
+        number = max(map(last_round.__getitem__, members)) + 1
+        for player in members:
+            last_round[player] = number
+        rounds.append(number)
+    
+    match_index = np.repeat(np.arange(len(starts)), sizes)
+    row_round = np.repeat(np.array(rounds), sizes)
+    keep = row_round > 0
+    if not keep.any():
+        return {user_id: float(initial) for user_id in users}, 0.0
+    match_index, player_index, side, row_round = (
+        match_index[keep], player_index[keep], side[keep], row_round[keep]
+    )
+    
+    ratings = np.full(len(users), float(initial))
+    # Ordenação estável por rodada: dentro da rodada as partidas seguem em ordem
+    by_round = np.argsort(row_round, kind='stable')
+    match_index, player_index, side = match_index[by_round], player_index[by_round], side[by_round]
+    round_bounds = np.searchsorted(row_round[by_round], np.arange(1, row_round.max() + 2))
+    new_match = np.r_[True, match_index[1:] != match_index[:-1]]
+    
+    losses = []
+    for start, end in zip(round_bounds[:-1].tolist(), round_bounds[1:].tolist()):
+        players = player_index[start:end]
+        sides = side[start:end]
+        local = np.cumsum(new_match[start:end]) - 1
+        count = local[-1] + 1
+        
+        slots = local * 2 + sides
+        sums = np.bincount(slots, weights=ratings[players], minlength=count * 2).reshape(-1, 2)
+        counts = np.bincount(slots, minlength=count * 2).reshape(-1, 2)
+        means = sums / counts
+        
+        expected = 1 / (1 + 10 ** ((means[:, 1] - means[:, 0]) / 400))
+        won = team1_won[match_index[start:end][new_match[start:end]]]
+        delta = k * (won - expected)
+        ratings[players] += np.where(sides == 0, delta[local], -delta[local])
+        losses.append(-(won * np.log(expected) + (1 - won) * np.log(1 - expected)))
+    
+    log_loss = float(np.concatenate(losses).mean()) if losses else 0.0
+    return dict(zip(users, ratings.tolist())), log_loss
+
+
+def store_ratings(session, guild_id: str, ratings: dict, initial: float = RATING_INITIAL):
+    """Grava os ratings recalculados; jogadores sem partidas voltam ao inicial"""
+    session.execute(update(User).where(User.guild_id == guild_id).values(rating=initial))
+    write_ratings(session, guild_id, ratings)
+
+
+def rebuild_guild(session, guild_id: str, k: float = RATING_K, initial: float = RATING_INITIAL) -> tuple:
+    """Recalcula e grava os ratings da guilda a partir do histórico"""
+    ratings, log_loss = replay(load_history(session, guild_id), k, initial)
+    store_ratings(session, guild_id, ratings, initial)
+    return ratings, log_loss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula o rating dos jogadores de uma guilda")
+    parser.add_argument("guild_id")
+    parser.add_argument("--k", type=float, default=RATING_K)
+    parser.add_argument("--initial", type=float, default=RATING_INITIAL)
+    parser.add_argument("--dry-run", action="store_true", help="só calcula, sem gravar")
+    args = parser.parse_args()
+    
+    with SessionLocal() as session:
+        start = time.perf_counter()
+        rows = load_history(session, args.guild_id)
+        loaded = time.perf_counter()
+        ratings, log_loss = replay(rows, args.k, args.initial)
+        computed = time.perf_counter()
+        
+        if not args.dry_run:
+            store_ratings(session, args.guild_id, ratings, args.initial)
+            session.commit()
+        
+        print(
+            f"{len(rows)} participações, {len(ratings)} jogadores, K={args.k:g}: "
+            f"leitura {(loaded - start) * 1000:.0f}ms, cálculo {(computed - loaded) * 1000:.0f}ms, "
+            f"log loss {log_loss:.4f}" + (" (não gravado)" if args.dry_run else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select, update, case, func
+from models import Match, MatchParticipant, User
+from match_state import COMPLETED, FINAL_STATUSES, sources, can_transition
+from rating import update_ratings
+
+
+def _result_counts(session, match_ids: list) -> dict:
+    """Vitórias e derrotas de cada jogador nas partidas, em uma consulta agregada"""
+    won = case((MatchParticipant.team == Match.winner_team, 1), else_=0)
+    rows = session.execute(
+        select(MatchParticipant.user_id, func.sum(won), func.count())
+        .join(Match, Match.id == MatchParticipant.match_id)
+        .where(MatchParticipant.match_id.in_(match_ids))
+        .group_by(MatchParticipant.user_id)
+    ).all()
+    return {user_id: (int(wins), count - int(wins)) for user_id, wins, count in rows}
+
+
+def settle_matches(session, guild_id: str, winners: dict, coins_winner: int = 1, coins_loser: int = 0) -> list:
+    """
+    Registra o resultado de várias partidas da guilda em poucas instruções.
+    
+    `winners` mapeia o id interno da partida para 'team1' ou 'team2'. Partidas
+    de outra guilda ou já finalizadas são ignoradas, então repetir a chamada
+    não credita ninguém duas vezes. Retorna os ids das partidas liquidadas.
+    """
+    if not winners:
+        return []
+    
+    # Travar as partidas pendentes impede que duas liquidações concorrentes as contem
+    pending = session.execute(
+        select(Match.id)
+        .where(
+            Match.id.in_(list(winners)),
+            Match.guild_id == guild_id,
+            Match.status.in_(sources(COMPLETED))
+        )
+        .with_for_update()
+    ).scalars().all()
+    if not pending:
+        return []
+    
+    session.execute(
+        update(Match)
+        .where(Match.id.in_(pending))
+        .values(
+            status=COMPLETED,
+            winner_team=case({match_id: winners[match_id] for match_id in pending}, value=Match.id),
+            completed_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    
+    counts = _result_counts(session, pending)
+    if not counts:
+        return pending
+    
+    # Jogadores com o mesmo saldo formam um grupo; o CASE testa um IN por grupo
+    # (vencedores/perdedores em uma partida só), em vez de um WHEN por jogador
+    groups = {}
+    for user_id, delta in counts.items():
+        groups.setdefault(delta, []).append(user_id)
+    
+    def delta_case(value):
+        return case(
+            *((User.user_id.in_(user_ids), value(w, l)) for (w, l), user_ids in groups.items()),
+            else_=0
+        )
+    
+    wins = delta_case(lambda w, l: w)
+    losses = delta_case(lambda w, l: l)
+    coins = delta_case(lambda w, l: w * coins_winner + l * coins_loser)
+    session.execute(
+        update(User)
+        .where(User.guild_id == guild_id, User.user_id.in_(list(counts)))
+        .values(
+            wins=func.coalesce(User.wins, 0) + wins,
+            losses=func.coalesce(User.losses, 0) + losses,
+            coins=func.coalesce(User.coins, 0) + coins
+        )
+        .execution_options(synchronize_session=False)
+    )
+    
+    update_ratings(session, guild_id, pending)
+    return pending
+
+
+def settle_match(session, guild_id: str, match_pk: int, winner_team: str,
+                 coins_winner: int = 1, coins_loser: int = 0) -> bool:
+    """Registra o resultado de uma partida; False se ela já estava finalizada"""
+    return bool(settle_matches(session, guild_id, {match_pk: winner_team}, coins_winner, coins_loser))
+
+
+# Tamanho máximo do arquivo aceito por /resultado-lote e linhas por bloco
+MAX_BATCH_BYTES = 1_000_000
+BATCH_CHUNK = 500
+
+WINNERS = ('team1', 'team2')
+
+
+def _cell(value) -> str:
+    """Valor do JSON como texto; null vira vazio"""
+    return '' if value is None else str(value).strip()
+
+
+def parse_results(data: bytes, filename: str):
+    """
+    Lê pares (ID da sala, vencedor) de um CSV ou JSON.
+    
+    Gera (linha, match_id, vencedor) à medida que lê. O CSV aceita um
+    cabeçalho `match_id,winner` opcional; o JSON é uma lista de objetos
+    {"match_id": ..., "winner": ...} ou de pares [match_id, winner].
+    """
+    text = data.decode('utf-8-sig')
+    
+    if filename.lower().endswith('.json'):
+        entries = json.loads(text)
+        if not isinstance(entries, list):
+            raise ValueError("o JSON deve ser uma lista")
+        for line, entry in enumerate(entries, start=1):
+            if isinstance(entry, dict):
+                match_id, winner = entry.get('match_id'), entry.get('winner')
+            elif isinstance(entry, (list, tuple)) and len(entry) == 2:
+                match_id, winner = entry
+            else:
+                match_id = winner = None
+            yield line, _cell(match_id), _cell(winner).lower()
+        return
+    
+    for line, row in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if line == 1 and row[0].strip().lower() == 'match_id':
+            continue
+        cells = [cell.strip() for cell in row] + ['', '']
+        yield line, cells[0], cells[1].lower()
+
+
+def settle_batch(session, guild_id: str, rows, coins_winner: int = 1, coins_loser: int = 0) -> list:
+    """
+    Valida e liquida um lote de resultados na mesma transação.
+    
+    As linhas são processadas em blocos de BATCH_CHUNK; cada bloco resolve os
+    IDs de sala em uma consulta e liquida as partidas válidas de uma vez.
+    Retorna um relatório [(linha, match_id, situação, id interno ou None)].
+    """
+    report = []
+    seen = set()
+    chunk = []
+    
+    def flush():
+        statuses = {
+            room_id: (pk, status) for room_id, pk, status in session.execute(
+                select(Match.match_id, Match.id, Match.status)
+                .where(Match.guild_id == guild_id, Match.match_id.in_([m for _, m, _ in chunk]))
+            )
+        }
+        winners = {}
+        for line, match_id, winner in chunk:
+            pk, status = statuses.get(match_id, (None, None))
+            if pk is None:
+                report.append((line, match_id, 'partida não encontrada', None))
+            elif status in FINAL_STATUSES:
+                report.append((line, match_id, 'já finalizada', pk))
+            elif not can_transition(status, COMPLETED):
+                report.append((line, match_id, 'partida não iniciada', pk))
+            else:
+                winners[pk] = winner
+                report.append((line, match_id, winner, pk))
+        
+        settled = set(settle_matches(session, guild_id, winners, coins_winner, coins_loser))
+        for i in range(len(report) - len(chunk), len(report)):
+            line, match_id, outcome, pk = report[i]
+            if outcome in WINNERS:
+                report[i] = (line, match_id, 'ok' if pk in settled else 'já finalizada', pk)
+        chunk.clear()
+    
+    for line, match_id, winner in rows:
+        if not match_id:
+            report.append((line, match_id, 'linha inválida', None))
+        elif winner not in WINNERS:
+            report.append((line, match_id, 'vencedor inválido', None))
+        elif match_id in seen:
+            report.append((line, match_id, 'duplicada no arquivo', None))
+        else:
+            seen.add(match_id)
+            chunk.append((line, match_id, winner))
+            if len(chunk) >= BATCH_CHUNK:
+                flush()
+    
+    if chunk:
+        flush()
+    return sorted(report, key=lambda entry: entry[0])
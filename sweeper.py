@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, exists
+from sqlalchemy.orm import aliased
+from models import run_db, Match, MatchParticipant, QueueBoardSlot
+from match_state import WAITING, CANCELLED
+from queue_engine import queue_engine
+from config import (
+    SWEEP_CHUNK, SWEEP_PAUSE, SWEEP_MAX_CHUNKS, RETENTION_WAITING_DAYS, RETENTION_CANCELLED_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+# Salas ligadas a uma mensagem do painel de filas não são apagadas
+_on_board = exists().where(QueueBoardSlot.match_id == Match.id)
+
+
+def _stale_waiting(session, cutoff: datetime, limit: int) -> list:
+    """
+    Salas de espera vazias criadas antes de `cutoff` (índice status, created_at).
+    
+    O /filas cria todas as salas de um envio com o mesmo created_at; só são
+    apagadas as de envios substituídos por um mais novo da mesma guilda, para
+    que os botões do painel atual nunca apontem para uma partida apagada.
+    Salas ligadas a uma mensagem do painel (queue_board_slots) também ficam.
+    """
+    has_players = exists().where(MatchParticipant.match_id == Match.id)
+    newer = aliased(Match)
+    superseded = exists().where(
+        newer.guild_id == Match.guild_id, newer.status == WAITING, newer.created_at > Match.created_at
+    )
+    return session.execute(
+        select(Match.id)
+        .where(Match.status == WAITING, Match.created_at < cutoff, ~has_players, superseded, ~_on_board)
+        .order_by(Match.id)
+        .limit(limit)
+    ).scalars().all()
+
+
+def _old_cancelled(session, cutoff: datetime, limit: int) -> list:
+    """Partidas canceladas antes de `cutoff` sem pagamento recebido"""
+    return session.execute(
+        select(Match.id)
+        .where(Match.status == CANCELLED, Match.created_at < cutoff, Match.paid_at.is_(None), ~_on_board)
+        .order_by(Match.id)
+        .limit(limit)
+    ).scalars().all()
+
+
+def _orphaned_participants(session, limit: int) -> list:
+    """Participantes cuja partida não existe mais"""
+    match_exists = exists().where(Match.id == MatchParticipant.match_id)
+    return session.execute(
+        select(MatchParticipant.id).where(~match_exists).order_by(MatchParticipant.id).limit(limit)
+    ).scalars().all()
+
+
+def _delete_matches(session, match_ids: list, status: str) -> tuple:
+    """Apaga as partidas e seus participantes; o status é conferido de novo dentro da transação"""
+    participants = session.execute(
+        delete(MatchParticipant)
+        .where(MatchParticipant.match_id.in_(
+            select(Match.id).where(Match.id.in_(match_ids), Match.status == status)
+        ))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    matches = session.execute(
+        delete(Match)
+        .where(Match.id.in_(match_ids), Match.status == status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return matches, participants
+
+
+def _delete_participants(session, ids: list) -> int:
+    return session.execute(
+        delete(MatchParticipant)
+        .where(MatchParticipant.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+class Sweeper:
+    """
+    Limpeza periódica de partidas antigas.
+    
+    - salas de espera vazias mais antigas que `waiting_days`, exceto as do
+      envio mais recente do /filas da guilda (o painel atual)
+    - partidas canceladas (sem pagamento) mais antigas que `cancelled_days`
+    - participantes de partidas que não existem mais
+    
+    Salas ligadas a uma mensagem do painel de filas nunca são apagadas.
+    
+    Cada bloco de até `chunk` linhas é lido pelo índice e apagado em uma
+    transação curta própria, com uma pausa entre blocos; uma execução faz
+    no máximo `max_chunks` blocos e o resto fica para a próxima.
+    Partidas finalizadas ('completed') são mantidas para o histórico.
+    """
+    
+    def __init__(self, chunk: int = SWEEP_CHUNK, pause: float = SWEEP_PAUSE, max_chunks: int = SWEEP_MAX_CHUNKS,
+                 waiting_days: float = RETENTION_WAITING_DAYS, cancelled_days: float = RETENTION_CANCELLED_DAYS,
+                 engine=queue_engine):
+        self.chunk = chunk
+        self.pause = pause
+        self.max_chunks = max_chunks
+        self.waiting_days = waiting_days
+        self.cancelled_days = cancelled_days
+        self.engine = engine
+        self.last_run = None
+        self.runs = 0
+        self._lock = asyncio.Lock()
+    
+    async def run(self, now: datetime = None) -> dict:
+        """Executa uma varredura e retorna as estatísticas dela"""
+        async with self._lock:
+            return await self._run(now or datetime.utcnow())
+    
+    async def _run(self, now: datetime) -> dict:
+        start = time.perf_counter()
+        stats = {"waiting": 0, "cancelled": 0, "participants": 0, "orphans": 0, "chunks": 0}
+        budget = self.max_chunks
+        
+        jobs = []
+        if self.waiting_days:
+            jobs.append(("waiting", WAITING, _stale_waiting, now - timedelta(days=self.waiting_days)))
+        if self.cancelled_days:
+            jobs.append(("cancelled", CANCELLED, _old_cancelled, now - timedelta(days=self.cancelled_days)))
+        
+        for name, status, find, cutoff in jobs:
+            while budget > 0:
+                ids = await run_db(find, cutoff, self.chunk)
+                if status == WAITING:
+                    # Salas com jogadores em memória ainda não gravados ficam
+                    ids = [i for i in ids if not (self.engine.get(i) and self.engine.get(i).players)]
+                if not ids:
+                    break
+                matches, participants = await run_db(_delete_matches, ids, status)
+                for match_id in ids:
+                    self.engine.close_room(match_id)
+                stats[name] += matches
+                stats["participants"] += participants
+                stats["chunks"] += 1
+                budget -= 1
+                if len(ids) < self.chunk:
+                    break
+                await asyncio.sleep(self.pause)
+        
+        while budget > 0:
+            ids = await run_db(_orphaned_participants, self.chunk)
+            if not ids:
+                break
+            stats["orphans"] += await run_db(_delete_participants, ids)
+            stats["chunks"] += 1
+            budget -= 1
+            if len(ids) < self.chunk:
+                break
+            await asyncio.sleep(self.pause)
+        
+        stats["complete"] = budget > 0
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        stats["finished_at"] = now.isoformat(timespec="seconds")
+        self.last_run = stats
+        self.runs += 1
+        logger.info(f"Limpeza de partidas: {stats}")
+        return stats
+
+
+sweeper = Sweeper()
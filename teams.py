@@ -0,0 +1,93 @@
+from itertools import combinations
+from models import run_db, User
+from queue_engine import queue_engine
+from config import RATING_INITIAL
+
+# Até este número de jogadores (4v4) a divisão é exata
+EXACT_LIMIT = 8
+
+
+def _exact_split(players: list, strengths: dict) -> tuple:
+    """Testa todas as divisões; o primeiro jogador fica fixo no time 1 para não repetir espelhos"""
+    size = len(players) // 2
+    total = sum(strengths[p] for p in players)
+    first, rest = players[0], players[1:]
+    
+    best, best_diff = None, None
+    for others in combinations(rest, size - 1):
+        diff = abs(total - 2 * (strengths[first] + sum(strengths[p] for p in others)))
+        if best_diff is None or diff < best_diff:
+            best, best_diff = others, diff
+            if diff == 0:
+                break
+    
+    team1 = [first, *best]
+    chosen = set(team1)
+    return team1, [p for p in players if p not in chosen]
+
+
+def _heuristic_split(players: list, strengths: dict) -> tuple:
+    """Distribuição gulosa do mais forte ao mais fraco seguida de trocas que reduzem a diferença"""
+    size = len(players) // 2
+    team1, team2 = [], []
+    sum1 = sum2 = 0.0
+    for player in sorted(players, key=lambda p: strengths[p], reverse=True):
+        if len(team2) >= size or (len(team1) < size and sum1 <= sum2):
+            team1.append(player)
+            sum1 += strengths[player]
+        else:
+            team2.append(player)
+            sum2 += strengths[player]
+    
+    improved = True
+    while improved:
+        improved = False
+        diff = sum1 - sum2
+        for i, a in enumerate(team1):
+            for j, b in enumerate(team2):
+                delta = strengths[a] - strengths[b]
+                if abs(diff - 2 * delta) < abs(diff) - 1e-12:
+                    team1[i], team2[j] = b, a
+                    sum1 -= delta
+                    sum2 += delta
+                    improved = True
+                    break
+            if improved:
+                break
+    
+    return team1, team2
+
+
+def balance_teams(players: list, strengths: dict, default: float = 0.5) -> tuple:
+    """
+    Divide os jogadores em dois times com somas de força o mais próximas possível.
+    
+    Exato até 4v4 (no máximo 35 divisões); acima disso usa a heurística.
+    Retorna (team1, team2) preservando a ordem de entrada quando possível.
+    """
+    if len(players) < 2:
+        return list(players), []
+    strengths = {p: strengths.get(p, default) for p in players}
+    if len(players) <= EXACT_LIMIT:
+        return _exact_split(list(players), strengths)
+    return _heuristic_split(list(players), strengths)
+
+
+def _load_ratings(session, guild_id: str, user_ids: list) -> dict:
+    rows = (
+        session.query(User.user_id, User.rating)
+        .filter(User.guild_id == guild_id, User.user_id.in_(user_ids))
+        .all()
+    )
+    return {user_id: rating for user_id, rating in rows if rating is not None}
+
+
+async def assign_teams(room, engine=queue_engine) -> dict:
+    """Balanceia uma sala cheia e registra os times no motor da fila"""
+    players = list(room.players)
+    ratings = await run_db(_load_ratings, room.guild_id, players)
+    team1, team2 = balance_teams(players, ratings, default=RATING_INITIAL)
+    
+    teams = {**{p: 'team1' for p in team1}, **{p: 'team2' for p in team2}}
+    engine.set_teams(room.match_id, teams)
+    return teams
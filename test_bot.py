@@ -4,7 +4,10 @@ Testes básicos para o Bot Esquilo Aposta
 
 import unittest
 from unittest.mock import Mock, patch
-from pix_utils import generate_room_id, generate_room_password, mount_pix_string, calculate_crc16
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from pix_utils import mount_pix_string, calculate_crc16
+from utils import generate_room_id, generate_room_password
 from utils import generate_room_id as util_room_id, generate_room_password as util_password
 from config import BET_VALUES, MODALITIES
 
@@ -46,6 +49,57 @@ class TestPixUtils(unittest.TestCase):
         self.assertLess(crc, 65536)  # CRC16 é 16 bits
 
 
+class TestBRCode(unittest.TestCase):
+    """Testes para o codec BR Code"""
+    
+    def test_matches_central_bank_example(self):
+        """Testa o payload estático do exemplo do manual do BR Code"""
+        import brcode
+        payload = brcode.encode("123e4567-e12b-12d1-a456-426655440000", "Fulano de Tal", "BRASILIA")
+        self.assertEqual(
+            payload,
+            "00020126580014br.gov.bcb.pix0136123e4567-e12b-12d1-a456-426655440000"
+            "5204000053039865802BR5913Fulano de Tal6008BRASILIA62070503***63041D3D"
+        )
+    
+    def test_round_trip(self):
+        """Testa codificar e decodificar com valor, txid e informação adicional"""
+        import brcode
+        payload = brcode.encode(
+            "chave@teste.com", "José da Silva Sauro Comprido", "São José dos Campos",
+            amount=12.5, txid="ABC123", info="Aposta"
+        )
+        decoded = brcode.decode(payload)
+        self.assertEqual(decoded, brcode.PixPayload(
+            key="chave@teste.com", merchant_name="Jose da Silva Sauro Compr",
+            merchant_city="Sao Jose dos Ca", amount=12.5, txid="ABC123", info="Aposta"
+        ))
+        
+        with self.assertRaises(ValueError):
+            brcode.decode(payload[:-1] + ("0" if payload[-1] != "0" else "1"))
+        with self.assertRaises(ValueError):
+            brcode.encode("chave", "Nome", "Cidade", txid="com espaço")
+    
+    def test_table_crc_matches_bitwise(self):
+        """Testa o CRC por tabela contra o cálculo bit a bit"""
+        import random
+        import brcode
+        
+        def bitwise(data: bytes) -> int:
+            crc = 0xFFFF
+            for byte in data:
+                crc ^= byte << 8
+                for _ in range(8):
+                    crc = ((crc << 1) ^ 0x1021) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+            return crc
+        
+        self.assertEqual(brcode.crc16("123456789"), 0x29B1)
+        for _ in range(50):
+            data = bytes(random.randrange(256) for _ in range(random.randrange(1, 200)))
+            self.assertEqual(brcode.crc16(data), bitwise(data))
+            cut = random.randrange(len(data) + 1)
+            self.assertEqual(brcode.crc16(data[cut:], brcode.crc16(data[:cut])), bitwise(data))
+
 class TestConfig(unittest.TestCase):
     """Testes para configurações"""
     
@@ -126,6 +180,1503 @@ class TestModels(unittest.TestCase):
             self.fail(f"Erro ao importar modelos: {e}")
 
 
+class FakeChannel:
+    """Canal falso que registra os envios na ordem em que acontecem"""
+    
+    def __init__(self, channel_id: int = 1):
+        self.id = channel_id
+        self.sent = []
+        self.messages = {}
+    
+    async def send(self, **kwargs):
+        self.sent.append(kwargs)
+        message = self.messages[len(self.sent)] = FakeMessage(len(self.sent), self, kwargs)
+        return message
+    
+    def get_partial_message(self, message_id: int):
+        return self.messages.get(message_id) or FakeMessage(message_id, self, deleted=True)
+
+
+class FakeMessage:
+    """Mensagem falsa que registra as edições; `deleted` simula uma mensagem apagada no Discord"""
+    
+    def __init__(self, message_id: int, channel: FakeChannel, kwargs: dict = None, deleted: bool = False):
+        self.id = message_id
+        self.channel = channel
+        self.kwargs = kwargs or {}
+        self.edits = []
+        self.deleted = deleted
+    
+    def _check(self):
+        if self.deleted:
+            import discord
+            raise discord.NotFound(Mock(status=404, reason="Not Found"), "Unknown Message")
+    
+    async def edit(self, **kwargs):
+        self._check()
+        self.edits.append(kwargs)
+        self.kwargs.update(kwargs)
+        return self
+    
+    async def delete(self):
+        self._check()
+        self.deleted = True
+        self.channel.messages.pop(self.id, None)
+
+
+def bind_test_database():
+    """Aponta as sessões para um SQLite em memória com as tabelas criadas"""
+    import models
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    models.SessionLocal.configure(bind=engine)
+    return engine
+
+
+class TestDatabaseRunner(unittest.IsolatedAsyncioTestCase):
+    """Testes para a camada assíncrona de banco de dados"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_get_or_create_user_reuses_row(self):
+        """Testa se o usuário é criado uma única vez por guilda"""
+        from utils import get_or_create_user
+        first = await get_or_create_user("1", "10", "alice")
+        second = await get_or_create_user("1", "10", "alice")
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.username, "alice")
+    
+    async def test_run_db_rolls_back_on_error(self):
+        """Testa se uma exceção desfaz as alterações da sessão"""
+        from models import run_db, Guild
+        
+        def _fail(session):
+            session.add(Guild(guild_id="99"))
+            session.flush()
+            raise RuntimeError("falha")
+        
+        with self.assertRaises(RuntimeError):
+            await run_db(_fail)
+        
+        count = await run_db(lambda session: session.query(Guild).filter_by(guild_id="99").count())
+        self.assertEqual(count, 0)
+
+
+class TestIndexes(unittest.IsolatedAsyncioTestCase):
+    """Testes para os índices e constraints do esquema"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_duplicate_participant_rejected(self):
+        """Testa se o banco rejeita o mesmo jogador duas vezes na mesma partida"""
+        from sqlalchemy.exc import IntegrityError
+        from models import run_db, MatchParticipant
+        
+        await run_db(lambda session: session.add(MatchParticipant(match_id=1, user_id="7")))
+        with self.assertRaises(IntegrityError):
+            await run_db(lambda session: session.add(MatchParticipant(match_id=1, user_id="7")))
+    
+    def test_txid_index_matches_migration(self):
+        """Testa se init_db cria o mesmo índice único de txid que a migração 0003"""
+        from sqlalchemy import inspect
+        indexes = {index['name']: index for index in inspect(bind_test_database()).get_indexes('matches')}
+        self.assertTrue(indexes['ix_matches_txid']['unique'])
+        self.assertEqual(indexes['ix_matches_txid']['column_names'], ['txid'])
+
+
+class TestGuildSettingsCache(unittest.IsolatedAsyncioTestCase):
+    """Testes para o cache de configurações da guilda"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_hits_after_first_load(self):
+        """Testa se a segunda leitura vem do cache"""
+        from guild_settings import GuildSettingsCache
+        cache = GuildSettingsCache(ttl=60)
+        
+        first = await cache.get("1")
+        second = await cache.get("1")
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+    
+    async def test_update_writes_through(self):
+        """Testa se a atualização grava no banco e substitui o cache"""
+        from dataclasses import FrozenInstanceError
+        from guild_settings import GuildSettingsCache
+        from models import run_db, Guild
+        cache = GuildSettingsCache(ttl=60)
+        
+        await cache.get("1")
+        settings = await cache.update("1", room_price=1.5, queue_channel_id="42")
+        self.assertEqual((await cache.get("1")).room_price, 1.5)
+        
+        stored = await run_db(lambda session: session.query(Guild).filter_by(guild_id="1").one())
+        self.assertEqual(stored.queue_channel_id, "42")
+        
+        with self.assertRaises(FrozenInstanceError):
+            settings.room_price = 2.0
+    
+    async def test_expired_entry_is_reloaded(self):
+        """Testa se entradas expiradas são buscadas novamente"""
+        from guild_settings import GuildSettingsCache
+        cache = GuildSettingsCache(ttl=0)
+        
+        await cache.get("1")
+        await cache.get("1")
+        self.assertEqual(cache.misses, 2)
+
+
+class TestMatchEmbed(unittest.TestCase):
+    """Testes para o embed da fila"""
+    
+    def test_title_shows_count_and_capacity(self):
+        """Testa se o título mostra jogadores/capacidade e o roster menciona os jogadores"""
+        from utils import create_match_embed
+        embed = create_match_embed("Mobile", "2v2", 5.0, ["1", "2"])
+        
+        self.assertEqual(embed.title, "Mobile • 2/4")
+        self.assertEqual(embed.fields[0].value, "<@1>\n<@2>")
+
+
+class TestQueueProvisioning(unittest.IsolatedAsyncioTestCase):
+    """Testes para a criação em lote das partidas de /filas"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_provisions_all_slots(self):
+        """Testa se todas as combinações recebem partida e ID de sala únicos"""
+        from cogs.filas import provision_matches
+        from models import run_db, Match
+        
+        slots = [
+            (modality, mode, price)
+            for modality, config in MODALITIES.items()
+            for mode in config['modes']
+            for price in BET_VALUES
+        ]
+        created = await run_db(provision_matches, "1", slots)
+        
+        self.assertEqual([item[2:] for item in created], slots)
+        self.assertEqual(len({item[0] for item in created}), len(slots))
+        
+        room_ids = await run_db(lambda session: [m.match_id for m in session.query(Match)])
+        self.assertEqual(len(set(room_ids)), len(slots))
+    
+    async def test_regenerates_colliding_room_ids(self):
+        """Testa se IDs de sala já existentes no banco são substituídos"""
+        from cogs.filas import provision_matches
+        from models import run_db, Match
+        
+        await run_db(lambda session: session.add(Match(guild_id="1", bet_value=1.0, match_id="AAAAAA")))
+        
+        with patch("utils.generate_room_id", side_effect=["AAAAAA", "BBBBBB", "CCCCCC"]):
+            created = await run_db(provision_matches, "1", [("Mobile", "1v1", 1.0), ("Mobile", "1v1", 2.0)])
+        
+        room_ids = await run_db(
+            lambda session: {m.id: m.match_id for m in session.query(Match)}
+        )
+        self.assertEqual({room_ids[item[0]] for item in created}, {"BBBBBB", "CCCCCC"})
+
+
+class TestOutboundScheduler(unittest.IsolatedAsyncioTestCase):
+    """Testes para o agendador de envios"""
+    
+    async def test_high_priority_goes_first(self):
+        """Testa se envios urgentes furam a fila de um canal ocupado"""
+        import asyncio
+        from outbound import OutboundScheduler, Priority
+        scheduler = OutboundScheduler(rate=1, per=0.05)
+        channel = FakeChannel()
+        
+        sends = [scheduler.send(channel, priority=Priority.LOW, content=f"log {i}") for i in range(3)]
+        sends.append(scheduler.send(channel, priority=Priority.HIGH, content="sala cheia"))
+        await asyncio.gather(*sends)
+        
+        self.assertEqual([m["content"] for m in channel.sent], ["sala cheia", "log 0", "log 1", "log 2"])
+        self.assertEqual(scheduler.stats()["sent"], 4)
+    
+    async def test_edits_are_coalesced(self):
+        """Testa se edições pendentes da mesma mensagem viram uma só"""
+        import asyncio
+        from outbound import OutboundScheduler
+        scheduler = OutboundScheduler(rate=1, per=0.05)
+        channel = FakeChannel()
+        message = FakeMessage(10, channel)
+        
+        await scheduler.send(channel, content="ocupa o token")
+        results = await asyncio.gather(*(scheduler.edit(message, content=str(i)) for i in range(5)))
+        
+        self.assertEqual(message.edits, [{"content": "4"}])
+        self.assertTrue(all(result is message for result in results))
+        self.assertEqual(scheduler.coalesced, 4)
+    
+    async def test_debounced_edit_uses_latest_state(self):
+        """Testa se edições com debounce respeitam a janela e usam o estado mais novo"""
+        import asyncio
+        from outbound import OutboundScheduler
+        scheduler = OutboundScheduler(rate=10, per=0.01)
+        message = FakeMessage(10, FakeChannel())
+        state = {"count": 0}
+        
+        def render():
+            return {"content": str(state["count"])}
+        
+        for count in range(1, 6):
+            state["count"] = count
+            scheduler.schedule_edit(message, render, window=0.1)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.25)
+        
+        # Uma edição imediata e uma ao fim da janela com o último estado
+        self.assertEqual(message.edits, [{"content": "1"}, {"content": "5"}])
+    
+    async def test_paces_per_channel(self):
+        """Testa se o limite por canal espaça os envios"""
+        import asyncio
+        import time
+        from outbound import OutboundScheduler
+        scheduler = OutboundScheduler(rate=2, per=0.1)
+        channel = FakeChannel()
+        
+        start = time.monotonic()
+        await asyncio.gather(*(scheduler.send(channel, content=str(i)) for i in range(6)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+
+class TestPersistentButtons(unittest.IsolatedAsyncioTestCase):
+    """Testes para os botões persistentes"""
+    
+    async def test_queue_view_is_not_stored(self):
+        """Testa se a view da fila sai parada e com os IDs codificados"""
+        from cogs.filas import create_queue_view
+        view = create_queue_view(123, "Mobile", "2v2")
+        
+        self.assertTrue(view.is_finished())
+        custom_ids = [
+            button["custom_id"]
+            for row in view.to_components()
+            for button in row["components"]
+        ]
+        self.assertIn("fila:enter:123:Mobile:2v2", custom_ids)
+        self.assertEqual(len(custom_ids), 5)
+    
+    async def test_custom_id_round_trip(self):
+        """Testa se o botão é reconstruído a partir do custom_id"""
+        from cogs.filas import QueueButton
+        from cogs.match_flow import ConfirmationButton
+        
+        match = QueueButton.__discord_ui_compiled_template__.fullmatch("fila:leave:7:Emulador:4v4")
+        button = await QueueButton.from_custom_id(None, None, match)
+        self.assertEqual(
+            (button.action, button.match_id, button.modality_name, button.mode_name),
+            ("leave", 7, "Emulador", "4v4")
+        )
+        
+        match = ConfirmationButton.__discord_ui_compiled_template__.fullmatch("partida:confirm:9:555")
+        button = await ConfirmationButton.from_custom_id(None, None, match)
+        self.assertEqual((button.match_id, button.mediator_id), (9, "555"))
+
+
+class TestQueueEngine(unittest.IsolatedAsyncioTestCase):
+    """Testes para o motor de filas em memória"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_concurrent_joins_never_overfill(self):
+        """Testa milhares de entradas simultâneas sem passar da capacidade"""
+        import asyncio
+        import random
+        from queue_engine import QueueEngine, QueueResult
+        engine = QueueEngine()
+        
+        capacities = {match_id: random.choice([2, 4, 6, 8]) for match_id in range(1, 101)}
+        for match_id, capacity in capacities.items():
+            engine.register(match_id, f"R{match_id}", capacity)
+        
+        joins = [
+            engine.join(random.randrange(1, 101), str(random.randrange(2000)))
+            for _ in range(5000)
+        ]
+        results = await asyncio.gather(*joins)
+        
+        for match_id, capacity in capacities.items():
+            room = engine.get(match_id)
+            self.assertLessEqual(len(room.players), capacity)
+            self.assertEqual(len(room.players), len(set(room.players)))
+        
+        full_events = [room.match_id for result, room, _ in results if result is QueueResult.FULL]
+        self.assertEqual(len(full_events), len(set(full_events)))
+        self.assertTrue(all(engine.get(match_id).status == 'full' for match_id in full_events))
+    
+    async def test_write_behind_and_reload(self):
+        """Testa a gravação em lote e a reconstrução a partir do banco"""
+        from queue_engine import QueueEngine, QueueResult
+        from models import run_db, Match, MatchParticipant
+        
+        match_pk = await run_db(lambda session: (
+            session.add(match := Match(guild_id="1", bet_value=1.0, match_id="ABC123")),
+            session.flush(),
+            match.id
+        )[-1])
+        
+        engine = QueueEngine(flush_interval=60)
+        engine.start()
+        engine.register(match_pk, "ABC123", 4)
+        await engine.join(match_pk, "1")
+        await engine.join(match_pk, "2")
+        await engine.join(match_pk, "3")
+        result, _ = await engine.leave(match_pk, "2")
+        self.assertIs(result, QueueResult.LEFT)
+        await engine.close()
+        
+        stored = await run_db(lambda session: sorted(
+            p.user_id for p in session.query(MatchParticipant).filter_by(match_id=match_pk)
+        ))
+        self.assertEqual(stored, ["1", "3"])
+        
+        reloaded = QueueEngine()
+        await reloaded.load()
+        self.assertEqual(reloaded.get(match_pk).players, ["1", "3"])
+        
+        await reloaded.join(match_pk, "4", capacity=4)
+        result, _, _ = await reloaded.join(match_pk, "5")
+        self.assertIs(result, QueueResult.FULL)
+        await reloaded.flush()
+        status = await run_db(lambda session: session.get(Match, match_pk).status)
+        self.assertEqual(status, 'full')
+    
+    
+    async def test_one_waiting_room_per_guild(self):
+        """Testa se o jogador fica em uma sala por guilda e se a troca é atômica"""
+        from queue_engine import QueueEngine, QueueResult
+        engine = QueueEngine()
+        engine.register(1, "A", 2, guild_id="g1")
+        engine.register(2, "B", 2, guild_id="g1")
+        engine.register(3, "C", 2, guild_id="g2")
+        
+        result, _, _ = await engine.join(1, "u")
+        self.assertIs(result, QueueResult.JOINED)
+        result, _, previous = await engine.join(2, "u")
+        self.assertIs(result, QueueResult.IN_OTHER_ROOM)
+        self.assertEqual(previous.match_id, 1)
+        self.assertEqual(engine.get(2).players, [])
+        
+        # Outra guilda não conta
+        result, _, _ = await engine.join(3, "u")
+        self.assertIs(result, QueueResult.JOINED)
+        
+        result, room, previous = await engine.join(2, "u", move=True)
+        self.assertIs(result, QueueResult.JOINED)
+        self.assertEqual((room.match_id, previous.match_id), (2, 1))
+        self.assertEqual(engine.get(1).players, [])
+        self.assertIs(engine.active_room("g1", "u"), room)
+        self.assertEqual(engine._membership[(1, "u")][0], False)
+        
+        # Sala cheia libera os jogadores para outra fila
+        await engine.join(2, "v")
+        self.assertIsNone(engine.active_room("g1", "u"))
+        result, _, _ = await engine.join(1, "u")
+        self.assertIs(result, QueueResult.JOINED)
+        
+        engine.close_room(1)
+        self.assertIsNone(engine.active_room("g1", "u"))
+    
+    async def test_concurrent_moves_keep_single_membership(self):
+        """Testa trocas simultâneas entre salas sem duplicar o jogador"""
+        import asyncio
+        import random
+        from queue_engine import QueueEngine
+        engine = QueueEngine()
+        for match_id in range(1, 21):
+            engine.register(match_id, f"R{match_id}", 50, guild_id="g")
+        
+        await asyncio.gather(*(
+            engine.join(random.randrange(1, 21), str(random.randrange(100)), move=True)
+            for _ in range(3000)
+        ))
+        
+        seen = [player for room in engine.rooms.values() for player in room.players]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), len(engine.active))
+        for (_, player), match_id in engine.active.items():
+            self.assertIn(player, engine.get(match_id).players)
+
+
+class TestTeamBalancing(unittest.IsolatedAsyncioTestCase):
+    """Testes para a divisão automática de times"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    def test_exact_split_is_optimal(self):
+        """Testa se a divisão exata encontra a menor diferença possível"""
+        import random
+        from itertools import combinations
+        from teams import balance_teams
+        
+        for size in (2, 4, 6, 8):
+            players = [str(i) for i in range(size)]
+            strengths = {p: random.random() for p in players}
+            team1, team2 = balance_teams(players, strengths)
+            self.assertEqual(len(team1), len(team2))
+            self.assertEqual(sorted(team1 + team2), sorted(players))
+            
+            total = sum(strengths.values())
+            best = min(
+                abs(total - 2 * sum(strengths[p] for p in combo))
+                for combo in combinations(players, size // 2)
+            )
+            diff = abs(sum(strengths[p] for p in team1) - sum(strengths[p] for p in team2))
+            self.assertAlmostEqual(diff, best)
+    
+    def test_heuristic_split_for_large_rooms(self):
+        """Testa a heurística para salas maiores que 4v4"""
+        from teams import balance_teams
+        players = [str(i) for i in range(20)]
+        strengths = {p: (i % 5) / 4 for i, p in enumerate(players)}
+        team1, team2 = balance_teams(players, strengths)
+        self.assertEqual(len(team1), 10)
+        self.assertEqual(sorted(team1 + team2), sorted(players))
+        self.assertLess(abs(sum(strengths[p] for p in team1) - sum(strengths[p] for p in team2)), 0.26)
+    
+    async def test_teams_persisted_with_roster(self):
+        """Testa se os times são gravados junto com o roster da sala cheia"""
+        from queue_engine import QueueEngine, QueueResult
+        from models import run_db, Match, MatchParticipant, User, Guild
+        from teams import assign_teams
+        
+        def _seed(session):
+            session.add(Guild(guild_id="g"))
+            for user_id, rating in (("a", 1300), ("b", 1250), ("c", 900), ("d", 950)):
+                session.add(User(user_id=user_id, guild_id="g", username=user_id, rating=rating))
+            match = Match(guild_id="g", bet_value=1.0, match_id="T1")
+            session.add(match)
+            session.flush()
+            return match.id
+        
+        match_pk = await run_db(_seed)
+        engine = QueueEngine(flush_interval=60)
+        engine.register(match_pk, "T1", 4, guild_id="g")
+        for user_id in "abcd":
+            result, room, _ = await engine.join(match_pk, user_id)
+        self.assertIs(result, QueueResult.FULL)
+        
+        assignment = await assign_teams(room, engine)
+        
+        # Os dois mais fortes ficam separados
+        self.assertNotEqual(assignment["a"], assignment["b"])
+        self.assertNotEqual(assignment["c"], assignment["d"])
+        
+        await engine.flush()
+        stored = await run_db(lambda session: {
+            p.user_id: p.team for p in session.query(MatchParticipant).filter_by(match_id=match_pk)
+        })
+        self.assertEqual(stored, assignment)
+
+class TestSettlement(unittest.TestCase):
+    """Testes para a liquidação de resultados em conjunto"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    def _seed(self, session):
+        from models import Guild, User, Match, MatchParticipant
+        for guild_id in ("g1", "g2"):
+            session.add(Guild(guild_id=guild_id))
+            for user_id in "abcd":
+                session.add(User(user_id=user_id, guild_id=guild_id, username=user_id))
+        matches = []
+        for room_id, players in (("M1", "abcd"), ("M2", "ab")):
+            match = Match(guild_id="g1", bet_value=5.0, match_id=room_id, status='confirmed')
+            session.add(match)
+            session.flush()
+            for i, user_id in enumerate(players):
+                team = 'team1' if i % 2 == 0 else 'team2'
+                session.add(MatchParticipant(match_id=match.id, user_id=user_id, team=team))
+            matches.append(match.id)
+        return matches
+    
+    def _stats(self, session, guild_id):
+        from models import User
+        return {
+            u.user_id: (u.wins, u.losses, u.coins)
+            for u in session.query(User).filter_by(guild_id=guild_id)
+        }
+    
+    def test_settle_is_idempotent_and_scoped_by_guild(self):
+        """Testa se a liquidação credita uma vez e só na guilda da partida"""
+        from models import SessionLocal
+        from settlement import settle_match
+        
+        with SessionLocal() as session:
+            m1, _ = self._seed(session)
+            session.commit()
+        
+        with SessionLocal() as session:
+            self.assertTrue(settle_match(session, "g1", m1, 'team1', coins_winner=3, coins_loser=1))
+            self.assertFalse(settle_match(session, "g1", m1, 'team2', coins_winner=3, coins_loser=1))
+            self.assertFalse(settle_match(session, "g2", m1, 'team1'))
+            session.commit()
+        
+        with SessionLocal() as session:
+            self.assertEqual(self._stats(session, "g1"), {
+                "a": (1, 0, 3.0), "b": (0, 1, 1.0), "c": (1, 0, 3.0), "d": (0, 1, 1.0)
+            })
+            self.assertEqual(set(self._stats(session, "g2").values()), {(0, 0, 0.0)})
+    
+    def test_batch_settlement_counts_every_match(self):
+        """Testa a liquidação em lote com o mesmo jogador em várias partidas"""
+        from models import SessionLocal, Match
+        from settlement import settle_matches
+        
+        with SessionLocal() as session:
+            m1, m2 = self._seed(session)
+            session.commit()
+        
+        with SessionLocal() as session:
+            settled = settle_matches(session, "g1", {m1: 'team2', m2: 'team1'}, coins_winner=2)
+            self.assertEqual(sorted(settled), sorted([m1, m2]))
+            session.commit()
+        
+        with SessionLocal() as session:
+            self.assertEqual(session.get(Match, m1).winner_team, 'team2')
+            self.assertEqual(self._stats(session, "g1"), {
+                "a": (1, 1, 2.0), "b": (1, 1, 2.0), "c": (0, 1, 0.0), "d": (1, 0, 2.0)
+            })
+    
+    
+    def test_batch_import_reports_each_row(self):
+        """Testa a importação de CSV e JSON com relatório por linha"""
+        from models import SessionLocal
+        from settlement import parse_results, settle_batch
+        
+        with SessionLocal() as session:
+            self._seed(session)
+            session.commit()
+        
+        csv_data = b"match_id,winner\nM1,team1\nM1,team2\nXX,team1\nM2,azul\n\n"
+        with SessionLocal() as session:
+            report = settle_batch(session, "g1", parse_results(csv_data, "lote.csv"))
+            session.commit()
+        self.assertEqual([(line, outcome) for line, _, outcome, _ in report], [
+            (2, 'ok'), (3, 'duplicada no arquivo'), (4, 'partida não encontrada'), (5, 'vencedor inválido')
+        ])
+        
+        json_data = b'[{"match_id": "M1", "winner": "team1"}, ["M2", "team2"]]'
+        with SessionLocal() as session:
+            report = settle_batch(session, "g1", parse_results(json_data, "lote.json"))
+            session.commit()
+        self.assertEqual([outcome for _, _, outcome, _ in report], ['já finalizada', 'ok'])
+        
+        with SessionLocal() as session:
+            self.assertEqual(self._stats(session, "g1")["b"], (1, 1, 1.0))
+        
+        with self.assertRaises(ValueError):
+            list(parse_results(b'{"match_id": "M1"}', "lote.json"))
+        
+        # Vencedor normalizado igual ao CSV; null vira vazio
+        json_data = b'[{"match_id": " M3 ", "winner": "Team1"}, {"match_id": "M4", "winner": null}, ["M5", "TEAM2"]]'
+        self.assertEqual(list(parse_results(json_data, "lote.json")), [
+            (1, "M3", "team1"), (2, "M4", ""), (3, "M5", "team2")
+        ])
+        self.assertEqual(
+            list(parse_results(b"M3,Team1\n", "lote.csv")), list(parse_results(b'[["M3", "Team1"]]', "lote.json"))
+        )
+    
+    def test_batch_requires_mediator(self):
+        """Testa quem pode registrar resultados em lote"""
+        from cogs.match_flow import can_settle
+        guild = Mock(mediator_role_id="77")
+        
+        def member(roles=(), **permissions):
+            perms = Mock(**{"administrator": False, "manage_guild": False, **permissions})
+            return Mock(guild_permissions=perms, roles=[Mock(id=role) for role in roles])
+        
+        self.assertTrue(can_settle(member(roles=[77]), guild))
+        self.assertTrue(can_settle(member(manage_guild=True), guild))
+        self.assertTrue(can_settle(member(administrator=True), guild))
+        self.assertFalse(can_settle(member(roles=[5]), guild))
+        self.assertFalse(can_settle(member(roles=[77]), Mock(mediator_role_id=None)))
+
+class TestLeaderboard(unittest.IsolatedAsyncioTestCase):
+    """Testes para o ranking em memória"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    def test_incremental_updates_match_full_sort(self):
+        """Testa se as atualizações incrementais equivalem a ordenar do zero"""
+        import random
+        from leaderboard import GuildLeaderboard, METRICS, _sort_key
+        
+        board = GuildLeaderboard()
+        stats = {}
+        for _ in range(2000):
+            user_id = str(random.randrange(200))
+            stats[user_id] = (random.randrange(30), random.randrange(30), float(random.randrange(100)))
+            board.set(user_id, *stats[user_id])
+        
+        for metric in METRICS:
+            expected = sorted(
+                (key for key in (_sort_key(metric, u, *v) for u, v in stats.items()) if key is not None)
+            )
+            ranked = [user_id for _, user_id, _ in board.page(metric, 0, len(stats))]
+            self.assertEqual(ranked, [key[-1] for key in expected])
+            for position, user_id in enumerate(ranked, start=1):
+                self.assertEqual(board.rank(user_id, metric), position)
+    
+    async def test_load_and_apply_after_settlement(self):
+        """Testa a reconstrução do banco e a atualização após um resultado"""
+        from leaderboard import Leaderboard, changed_players
+        from models import run_db, Guild, User, Match, MatchParticipant
+        from settlement import settle_match
+        
+        def _seed(session):
+            session.add(Guild(guild_id="g"))
+            for user_id, wins in (("a", 5), ("b", 3), ("c", 0)):
+                session.add(User(user_id=user_id, guild_id="g", username=user_id, wins=wins, losses=0))
+            match = Match(guild_id="g", bet_value=1.0, match_id="L1", status='confirmed')
+            session.add(match)
+            session.flush()
+            session.add(MatchParticipant(match_id=match.id, user_id="c", team='team1'))
+            session.add(MatchParticipant(match_id=match.id, user_id="b", team='team2'))
+            return match.id
+        
+        match_pk = await run_db(_seed)
+        board = Leaderboard()
+        await board.load()
+        self.assertEqual([user_id for _, user_id, _ in board.page("g", "wins", 0, 10)], ["a", "b", "c"])
+        self.assertIsNone(board.rank("g", "c", "winrate"))
+        
+        def _settle(session):
+            settle_match(session, "g", match_pk, 'team1', coins_winner=10)
+            return changed_players(session, "g", [match_pk])
+        
+        board.apply("g", await run_db(_settle))
+        self.assertEqual(board.rank("g", "c", "coins"), 1)
+        self.assertEqual(board.rank("g", "c", "winrate"), 2)
+        self.assertEqual(board.rank("g", "b", "winrate"), 3)
+        self.assertEqual(board.size("g", "winrate"), 3)
+
+class TestRating(unittest.TestCase):
+    """Testes para o rating Elo incremental e o recálculo do histórico"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    def test_settlement_updates_ratings(self):
+        """Testa se a liquidação move o rating dos dois times em sentidos opostos"""
+        from models import SessionLocal, Guild, User, Match, MatchParticipant
+        from settlement import settle_match
+        
+        with SessionLocal() as session:
+            session.add(Guild(guild_id="g"))
+            for user_id in "abcd":
+                session.add(User(user_id=user_id, guild_id="g", username=user_id))
+            match = Match(guild_id="g", bet_value=1.0, match_id="E1", status='confirmed')
+            session.add(match)
+            session.flush()
+            for user_id, team in zip("abcd", ("team1", "team1", "team2", "team2")):
+                session.add(MatchParticipant(match_id=match.id, user_id=user_id, team=team))
+            session.commit()
+            match_pk = match.id
+        
+        with SessionLocal() as session:
+            settle_match(session, "g", match_pk, 'team1')
+            session.commit()
+        
+        with SessionLocal() as session:
+            ratings = dict(session.query(User.user_id, User.rating))
+        self.assertEqual(ratings, {"a": 1016.0, "b": 1016.0, "c": 984.0, "d": 984.0})
+    
+    def test_vectorized_replay_matches_incremental(self):
+        """Testa se o recálculo em rodadas equivale a aplicar partida por partida"""
+        import random
+        from rating import apply_match
+        try:
+            from rating_replay import replay
+        except ImportError:
+            self.skipTest("numpy não instalado")
+        
+        random.seed(7)
+        players = [str(i) for i in range(40)]
+        rows = []
+        expected = {}
+        for match_id in range(1, 600):
+            size = random.choice([1, 2, 4])
+            chosen = random.sample(players, size * 2)
+            team1, team2 = chosen[:size], chosen[size:]
+            winner = random.choice(["team1", "team2"])
+            rows += [(match_id, p, "team1", winner) for p in team1]
+            rows += [(match_id, p, "team2", winner) for p in team2]
+            apply_match(expected, team1, team2, winner)
+        
+        ratings, log_loss = replay(rows)
+        self.assertEqual(set(ratings), set(expected))
+        for player, rating in expected.items():
+            self.assertAlmostEqual(ratings[player], rating, places=6)
+        self.assertGreater(log_loss, 0)
+
+class TestQRImage(unittest.TestCase):
+    """Testes para os formatos de imagem do QR Code"""
+    
+    def test_png_is_one_bit_and_matches_matrix(self):
+        """Testa se o PNG tem 1 bit por pixel e reproduz os módulos"""
+        import io
+        from PIL import Image
+        from pix_utils import qr_matrix, render_qr_png
+        
+        payload = "00020126330014br.gov.bcb.pix0111123456789015204000053039865802BR"
+        matrix = qr_matrix(payload)
+        img = Image.open(io.BytesIO(render_qr_png(payload, box_size=4)))
+        self.assertEqual(img.mode, "1")
+        self.assertEqual(img.size, (len(matrix) * 4, len(matrix) * 4))
+        for y in range(len(matrix)):
+            for x in range(len(matrix)):
+                self.assertEqual(img.getpixel((x * 4 + 2, y * 4 + 2)) == 0, matrix[y][x])
+    
+    def test_svg_output(self):
+        """Testa se o SVG é válido e cobre todos os módulos escuros"""
+        import re
+        import xml.etree.ElementTree as ET
+        from pix_utils import qr_matrix, render_qr
+        
+        payload = "teste"
+        root = ET.fromstring(render_qr(payload, fmt="svg", box_size=5))
+        size = len(qr_matrix(payload))
+        self.assertEqual(root.get("width"), str(size * 5))
+        
+        path = root.find("{http://www.w3.org/2000/svg}path").get("d")
+        dark = sum(int(run) for run in re.findall(r"h(\d+)v", path))
+        self.assertEqual(dark, sum(map(sum, qr_matrix(payload))))
+
+class TestQRRenderer(unittest.IsolatedAsyncioTestCase):
+    """Testes para a renderização de QR Codes em pool com cache"""
+    
+    async def test_cache_and_shared_render(self):
+        """Testa o cache LRU e o compartilhamento de renderizações simultâneas"""
+        import asyncio
+        from qr_render import QRRenderer
+        calls = []
+        
+        def render(payload):
+            calls.append(payload)
+            return payload.encode()
+        
+        renderer = QRRenderer(workers=1, use_processes=False, cache_size=2, render=render)
+        try:
+            images = await asyncio.gather(*(renderer.render("a") for _ in range(5)))
+            self.assertEqual(images, [b"a"] * 5)
+            self.assertEqual(calls, ["a"])
+            
+            await renderer.render("b")
+            await renderer.render("a")
+            await renderer.render("c")  # expulsa "b", o menos usado
+            await renderer.render("a")
+            await renderer.render("b")
+            self.assertEqual(calls, ["a", "b", "c", "b"])
+        finally:
+            renderer.close()
+    
+    async def test_renders_real_png_in_process_pool(self):
+        """Testa a renderização do payload Pix em outro processo"""
+        from qr_render import QRRenderer
+        from pix_utils import mount_pix_string
+        
+        payload = mount_pix_string("chave@teste.com", 10.0, None, "Teste", "Sao Paulo")
+        renderer = QRRenderer(workers=1, use_processes=True)
+        try:
+            await renderer.prewarm([payload])
+            image = await renderer.render(payload)
+        finally:
+            renderer.close()
+        self.assertTrue(image.startswith(b"\x89PNG"))
+        self.assertEqual(renderer.stats()["misses"], 1)
+
+class TestPixReceivers(unittest.IsolatedAsyncioTestCase):
+    """Testes para o recebedor Pix por mediador"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_mediator_key_cache_and_invalidation(self):
+        """Testa a chave do mediador, o cache e a troca de chave"""
+        import asyncio
+        import brcode
+        from models import run_db, Guild, User
+        from qr_render import QRRenderer
+        from pix_receivers import PixReceivers
+        
+        def _seed(session):
+            session.add(Guild(guild_id="g"))
+            session.add(User(user_id="m", guild_id="g", username="med", pix_key="antiga@pix.com"))
+        
+        await run_db(_seed)
+        renders = []
+        renderer = QRRenderer(use_processes=False, render=lambda payload: renders.append(payload) or b"png")
+        receivers = PixReceivers(renderer, amounts=[1.0, 2.0])
+        
+        receiver = await receivers.get("g", "m")
+        self.assertEqual((receiver.key, receiver.name), ("antiga@pix.com", "med"))
+        receivers.prewarm(receiver)
+        await asyncio.gather(*receivers._tasks)
+        self.assertEqual(len(renders), 2)
+        
+        # Confirmação com a chave já pré-renderizada não renderiza de novo
+        await receivers.render(receiver, 2.0)
+        self.assertEqual(len(renders), 2)
+        self.assertEqual(brcode.decode(renders[0]).key, "antiga@pix.com")
+        
+        def _change(session):
+            session.query(User).filter_by(user_id="m").update({"pix_key": "nova@pix.com"})
+        
+        await run_db(_change)
+        self.assertEqual((await receivers.get("g", "m")).key, "antiga@pix.com")
+        await receivers.invalidate("g", "m")
+        await asyncio.gather(*receivers._tasks)
+        
+        self.assertEqual((await receivers.get("g", "m")).key, "nova@pix.com")
+        self.assertEqual(renderer.stats()["cached"], 2)
+        self.assertTrue(all(brcode.decode(p).key == "nova@pix.com" for p in renders[2:]))
+        renderer.close()
+
+class TestPixWebhook(unittest.IsolatedAsyncioTestCase):
+    """Testes para o webhook de pagamentos Pix com um PSP falso"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def _seed(self):
+        from models import run_db, Guild, Match
+        
+        def _insert(session):
+            session.add(Guild(guild_id="g"))
+            session.add_all([
+                Match(guild_id="g", match_id=f"S{i}", bet_value=10.0, status="confirmed",
+                      txid=f"TX{i}", confirmation_channel_id="55")
+                for i in range(3)
+            ])
+            session.add(Match(guild_id="g", match_id="S3", bet_value=10.0, status="cancelled", txid="TX3"))
+        
+        await run_db(_insert)
+    
+    async def test_fake_psp_burst_marks_matches_paid_once(self):
+        """Testa se uma rajada do PSP paga cada partida uma única vez e avisa a sala"""
+        import asyncio
+        from aiohttp.test_utils import TestServer, TestClient
+        from models import SessionLocal, Match
+        from pix_webhook import PixWebhook, SECRET_HEADER
+        
+        await self._seed()
+        notified = []
+        
+        async def on_paid(paid):
+            notified.extend(paid)
+        
+        webhook = PixWebhook(on_paid=on_paid, secret="s3gredo", batch_size=50, flush_interval=0.05)
+        webhook.start()
+        client = TestClient(TestServer(webhook.app()))
+        await client.start_server()
+        
+        # PSP falso: notificações repetidas, txid desconhecido, valor abaixo da aposta e partida cancelada
+        def notification(txid, valor="10.00"):
+            return {"pix": [{"endToEndId": f"E{txid}", "txid": txid, "valor": valor}]}
+        
+        bodies = [notification("TX0"), notification("TX0"), notification("TX1"),
+                  notification("TX2", "5.00"), notification("DESCONHECIDO"), notification("TX3")]
+        responses = await asyncio.gather(*(
+            client.post(webhook.path, json=body, headers={SECRET_HEADER: "s3gredo"}) for body in bodies
+        ))
+        self.assertEqual([r.status for r in responses], [200] * 6)
+        
+        denied = await client.post(webhook.path, json=notification("TX2"), headers={SECRET_HEADER: "x"})
+        self.assertEqual(denied.status, 401)
+        invalid = await client.post(webhook.path, data="{", headers={SECRET_HEADER: "s3gredo"})
+        self.assertEqual(invalid.status, 400)
+        
+        await client.close()
+        await webhook.close()
+        
+        self.assertEqual(sorted(m.match_id for m in notified), ["S0", "S1"])
+        self.assertEqual({m.channel_id for m in notified}, {"55"})
+        with SessionLocal() as session:
+            paid = {m.match_id: m.paid_at for m in session.query(Match)}
+        self.assertIsNotNone(paid["S0"])
+        self.assertIsNotNone(paid["S1"])
+        self.assertIsNone(paid["S2"])
+        self.assertIsNone(paid["S3"])
+        self.assertEqual(webhook.stats()["paid"], 2)
+        self.assertEqual(webhook.stats()["late"], 1)
+        self.assertEqual(webhook.stats()["rejected"], 2)
+    
+    async def test_full_queue_asks_psp_to_retry(self):
+        """Testa se o webhook responde 503 quando a fila está cheia"""
+        from aiohttp.test_utils import TestServer, TestClient
+        from pix_webhook import PixWebhook, SECRET_HEADER
+        
+        webhook = PixWebhook(secret="s3gredo", max_queue=1)
+        client = TestClient(TestServer(webhook.app()))
+        await client.start_server()
+        
+        body = {"pix": [{"txid": "A", "valor": "1.00"}, {"txid": "B", "valor": "1.00"}]}
+        response = await client.post(webhook.path, json=body, headers={SECRET_HEADER: "s3gredo"})
+        self.assertEqual(response.status, 503)
+        
+        await client.close()
+    
+    async def test_failed_batch_is_retried(self):
+        """Testa se um lote que falha no banco é tentado de novo em vez de descartado"""
+        import asyncio
+        import pix_webhook
+        from pix_webhook import PixWebhook, Payment
+        
+        await self._seed()
+        real = pix_webhook.mark_paid
+        calls = []
+        
+        def flaky(session, batch):
+            calls.append(len(batch))
+            if len(calls) < 3:
+                raise RuntimeError("banco fora do ar")
+            return real(session, batch)
+        
+        notified = []
+        
+        async def on_paid(paid):
+            notified.extend(paid)
+        
+        webhook = PixWebhook(on_paid=on_paid, secret="s3gredo", flush_interval=0.01, retry_delay=0.01)
+        webhook.start()
+        with patch("pix_webhook.mark_paid", side_effect=flaky):
+            webhook._queue.put_nowait(Payment("TX0", 10.0, "E0"))
+            for _ in range(100):
+                if notified:
+                    break
+                await asyncio.sleep(0.01)
+            await webhook.close()
+        
+        self.assertEqual([m.match_id for m in notified], ["S0"])
+        self.assertEqual(webhook.stats()["retries"], 2)
+        self.assertEqual(webhook.stats()["failed"], 0)
+    
+    async def test_requires_secret(self):
+        """Testa se o webhook sem segredo não inicia e recusa todas as notificações"""
+        from aiohttp.test_utils import TestServer, TestClient
+        from pix_webhook import PixWebhook
+        
+        webhook = PixWebhook(secret="")
+        with self.assertRaises(ValueError):
+            await webhook.listen("127.0.0.1", 0)
+        
+        client = TestClient(TestServer(webhook.app()))
+        await client.start_server()
+        body = {"pix": [{"txid": "A", "valor": "1.00"}]}
+        self.assertEqual((await client.post(webhook.path, json=body)).status, 401)
+        await client.close()
+    
+    def test_generated_txid_fits_br_code(self):
+        """Testa se o txid gerado é aceito no BR Code"""
+        import brcode
+        from pix_webhook import generate_txid
+        txid = generate_txid()
+        payload = brcode.encode("chave@pix.com", "Fulano", "Sao Paulo", 10.0, txid)
+        self.assertEqual(brcode.decode(payload).txid, txid)
+
+class TestMatchLifecycle(unittest.IsolatedAsyncioTestCase):
+    """Testes para a máquina de estados e os prazos das partidas"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    def test_timer_wheel_spans_revolutions(self):
+        """Testa prazos maiores que uma volta, cancelamento e reagendamento"""
+        from timer_wheel import TimerWheel
+        wheel = TimerWheel(tick=1.0, slots=4)
+        wheel.schedule("a", 2)
+        wheel.schedule("b", 6)      # mesmo slot de "a", uma volta depois
+        wheel.schedule("c", 3)
+        wheel.cancel("c")
+        wheel.schedule("a", 5)      # reagendar substitui o prazo anterior
+        
+        fired = {}
+        for tick in range(1, 9):
+            for key in wheel.advance():
+                fired[key] = tick
+        self.assertEqual(fired, {"a": 5, "b": 6})
+        self.assertEqual(len(wheel), 0)
+    
+    def test_guarded_transitions(self):
+        """Testa se só transições permitidas alteram o status"""
+        from models import SessionLocal, Match
+        from match_state import (
+            WAITING, FULL, CONFIRMED, COMPLETED, CANCELLED, InvalidTransition, check, transition
+        )
+        from settlement import settle_match
+        
+        self.assertEqual(check(FULL, CONFIRMED), CONFIRMED)
+        with self.assertRaises(InvalidTransition):
+            check(COMPLETED, CANCELLED)
+        with self.assertRaises(InvalidTransition):
+            check(WAITING, CONFIRMED)
+        
+        with SessionLocal() as session:
+            session.add_all([
+                Match(guild_id="g", match_id=f"T{status}", bet_value=1.0, status=status)
+                for status in (WAITING, FULL, CONFIRMED, COMPLETED)
+            ])
+            session.commit()
+            ids = {m.status: m.id for m in session.query(Match)}
+        
+        with SessionLocal() as session:
+            changed = transition(session, list(ids.values()), CANCELLED, expected=(FULL, CONFIRMED))
+            session.commit()
+        self.assertEqual(sorted(changed), sorted([ids[FULL], ids[CONFIRMED]]))
+        with SessionLocal() as session:
+            self.assertEqual(session.get(Match, ids[COMPLETED]).status, COMPLETED)
+            self.assertEqual(session.get(Match, ids[WAITING]).status, WAITING)
+            # Sala ainda em espera não recebe resultado
+            self.assertFalse(settle_match(session, "g", ids[WAITING], 'team1'))
+    
+    async def test_idle_and_confirmation_deadlines(self):
+        """Testa a expiração de uma sala parada e de uma sala cheia sem confirmação"""
+        from models import run_db, Match
+        from match_state import CANCELLED, QUEUE_IDLE, CONFIRMATION
+        from queue_engine import QueueEngine, QueueResult
+        from timer_wheel import DeadlineScheduler
+        from match_lifecycle import MatchLifecycle
+        
+        def _seed(session):
+            rows = [Match(guild_id="g", match_id=f"D{i}", bet_value=1.0) for i in range(2)]
+            session.add_all(rows)
+            session.flush()
+            return [row.id for row in rows]
+        
+        idle_pk, full_pk = await run_db(_seed)
+        scheduler = DeadlineScheduler(tick=1.0, slots=8)
+        engine = QueueEngine(flush_interval=60, scheduler=scheduler, idle_timeout=3, confirmation_timeout=5)
+        lifecycle = MatchLifecycle(engine, scheduler)
+        lifecycle.start()
+        events = []
+        
+        async def listener(kind, expired):
+            events.append((kind, expired))
+        
+        lifecycle.listen(listener)
+        
+        engine.register(idle_pk, "D0", 2, guild_id="g")
+        engine.register(full_pk, "D1", 2, guild_id="g")
+        await engine.join(idle_pk, "a")
+        await engine.join(full_pk, "b")
+        result, _, _ = await engine.join(full_pk, "c")
+        self.assertIs(result, QueueResult.FULL)
+        self.assertFalse(scheduler.pending(QUEUE_IDLE, full_pk))
+        self.assertTrue(scheduler.pending(CONFIRMATION, full_pk))
+        await engine.flush()
+        
+        for _ in range(5):
+            await scheduler.dispatch(scheduler.wheel.advance())
+        await scheduler.close()
+        
+        self.assertEqual([(kind, [e.match_id for e in expired]) for kind, expired in events],
+                         [(QUEUE_IDLE, [idle_pk]), (CONFIRMATION, [full_pk])])
+        self.assertEqual(engine.get(idle_pk).players, [])
+        self.assertIsNone(engine.active_room("g", "a"))
+        self.assertIsNone(engine.get(full_pk))
+        status = await run_db(lambda session: session.get(Match, full_pk).status)
+        self.assertEqual(status, CANCELLED)
+    
+    async def test_panel_buttons_keep_final_statuses(self):
+        """Testa se confirmar ou encerrar pelo painel não sobrescreve um status já final"""
+        from unittest.mock import AsyncMock
+        from models import run_db, Match
+        from confirmations import ConfirmResult
+        from cogs.match_flow import ConfirmationButton
+        
+        def _seed(session):
+            rows = [
+                Match(guild_id="g", match_id="K0", bet_value=1.0, status='cancelled'),
+                Match(guild_id="g", match_id="K1", bet_value=1.0, status='completed'),
+            ]
+            session.add_all(rows)
+            session.flush()
+            return [row.id for row in rows]
+        
+        cancelled_pk, completed_pk = await run_db(_seed)
+        
+        def interaction():
+            return Mock(
+                user=Mock(id=555), channel=Mock(id=9),
+                response=Mock(defer=AsyncMock(), send_message=AsyncMock()),
+                followup=Mock(send=AsyncMock()),
+            )
+        
+        # O prazo cancelou a sala antes de todos confirmarem
+        tracker = Mock(confirm=AsyncMock(return_value=(ConfirmResult.ALL_CONFIRMED, 0)))
+        confirm = interaction()
+        with patch("cogs.match_flow.confirmations", tracker):
+            await ConfirmationButton("confirm", cancelled_pk, "555").confirm(confirm)
+        self.assertIn("não pode ser confirmada", confirm.followup.send.call_args.args[0])
+        
+        # O /resultado finalizou a partida antes do encerramento
+        cancel = interaction()
+        await ConfirmationButton("cancel", completed_pk, "555").cancel(cancel)
+        self.assertIn("já foi finalizada", cancel.response.send_message.call_args.args[0])
+        
+        statuses = await run_db(lambda session: [
+            session.get(Match, pk).status for pk in (cancelled_pk, completed_pk)
+        ])
+        self.assertEqual(statuses, ['cancelled', 'completed'])
+    
+    async def test_load_subtracts_elapsed_time(self):
+        """Testa se os prazos recarregados descontam o tempo desde a última entrada, o enchimento ou a confirmação"""
+        from datetime import datetime, timedelta
+        from models import run_db, Match, MatchParticipant
+        from match_state import QUEUE_IDLE, CONFIRMATION, PAYMENT
+        from queue_engine import QueueEngine
+        from timer_wheel import DeadlineScheduler
+        from match_lifecycle import MatchLifecycle
+        now = datetime.utcnow()
+        
+        def _seed(session):
+            full = Match(guild_id="g", match_id="L0", bet_value=1.0, status='full')
+            confirmed = Match(guild_id="g", match_id="L1", bet_value=1.0, status='confirmed', txid="TXL",
+                              confirmed_at=now - timedelta(seconds=100))
+            waiting = Match(guild_id="g", match_id="L2", bet_value=1.0, status='waiting')
+            session.add_all([full, confirmed, waiting])
+            session.flush()
+            session.add_all([
+                MatchParticipant(match_id=full.id, user_id="a", joined_at=now - timedelta(seconds=900)),
+                MatchParticipant(match_id=full.id, user_id="b", joined_at=now - timedelta(seconds=300)),
+                MatchParticipant(match_id=waiting.id, user_id="c", joined_at=now - timedelta(seconds=1000)),
+            ])
+            return full.id, confirmed.id, waiting.id
+        
+        full_pk, confirmed_pk, waiting_pk = await run_db(_seed)
+        scheduler = DeadlineScheduler(tick=1.0, slots=64)
+        lifecycle = MatchLifecycle(scheduler=scheduler, confirmation_timeout=400, payment_timeout=1000)
+        await lifecycle.load()
+        await QueueEngine(scheduler=scheduler, idle_timeout=1800).load()
+        
+        self.assertAlmostEqual(scheduler.wheel.remaining((QUEUE_IDLE, waiting_pk)), 800, delta=2)
+        self.assertAlmostEqual(scheduler.wheel.remaining((CONFIRMATION, full_pk)), 100, delta=2)
+        self.assertAlmostEqual(scheduler.wheel.remaining((PAYMENT, confirmed_pk)), 900, delta=2)
+
+class TestConfirmations(unittest.IsolatedAsyncioTestCase):
+    """Testes para as confirmações persistidas do painel da partida"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_confirmations_survive_restart(self):
+        """Testa a contagem restante, cliques de fora e a recuperação após reiniciar"""
+        import asyncio
+        from models import run_db, Match, MatchParticipant
+        from confirmations import ConfirmationTracker, ConfirmResult
+        
+        def _seed(session):
+            match = Match(guild_id="g", match_id="C1", bet_value=1.0, status='full')
+            session.add(match)
+            session.flush()
+            session.add_all(MatchParticipant(match_id=match.id, user_id=u) for u in "abcd")
+            return match.id
+        
+        match_pk = await run_db(_seed)
+        tracker = ConfirmationTracker()
+        self.assertEqual(await tracker.confirm(match_pk, "a"), (ConfirmResult.CONFIRMED, 3))
+        self.assertEqual(await tracker.confirm(match_pk, "a"), (ConfirmResult.ALREADY, 3))
+        
+        # Jogador de fora é recusado sem consultar o banco
+        with patch("confirmations.run_db") as run_db_mock:
+            result, _ = await tracker.confirm(match_pk, "intruso")
+        self.assertIs(result, ConfirmResult.NOT_PARTICIPANT)
+        run_db_mock.assert_not_called()
+        
+        # Depois de reiniciar, a confirmação de "a" continua valendo
+        restarted = ConfirmationTracker()
+        self.assertEqual(await restarted.confirm(match_pk, "b"), (ConfirmResult.CONFIRMED, 2))
+        results = await asyncio.gather(restarted.confirm(match_pk, "c"), restarted.confirm(match_pk, "d"))
+        self.assertEqual(sorted(r.value for r, _ in results), ["all_confirmed", "confirmed"])
+        
+        stored = await run_db(lambda session: session.query(MatchParticipant).filter(
+            MatchParticipant.match_id == match_pk, MatchParticipant.confirmed_at.isnot(None)
+        ).count())
+        self.assertEqual(stored, 4)
+        
+        await run_db(lambda session: session.query(Match).filter_by(id=match_pk).update({"status": 'confirmed'}))
+        restarted.forget(match_pk)
+        self.assertEqual(await restarted.confirm(match_pk, "a"), (ConfirmResult.CLOSED, 0))
+        self.assertEqual(await restarted.confirm(999, "a"), (ConfirmResult.NOT_FOUND, 0))
+
+class TestMediatorPool(unittest.IsolatedAsyncioTestCase):
+    """Testes para a atribuição automática de mediadores"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def _seed(self, count):
+        from models import run_db, Match
+        
+        def _insert(session):
+            rows = [Match(guild_id="g", match_id=f"P{i}", bet_value=10.0, status='full') for i in range(count)]
+            session.add_all(rows)
+            session.flush()
+            return [row.id for row in rows]
+        
+        return await run_db(_insert)
+    
+    async def test_least_loaded_with_bet_range(self):
+        """Testa a menor carga, a faixa de apostas e a liberação"""
+        from mediators import MediatorPool
+        m = await self._seed(8)
+        pool = MediatorPool()
+        await pool.login("g", "a")
+        await pool.login("g", "b")
+        await pool.login("g", "c", max_bet=5.0)
+        
+        chosen = [await pool.assign("g", match_id, 10.0) for match_id in m[:6]]
+        self.assertEqual(sorted(chosen), ["a", "a", "a", "b", "b", "b"])
+        self.assertEqual(await pool.assign("g", m[6], 2.0), "c")
+        
+        pool.release(m[chosen.index("a")])
+        self.assertEqual(await pool.assign("g", m[7], 10.0), "a")
+        self.assertEqual(pool.stats()["assigned"], 8)
+    
+    async def test_logout_rebalances_and_queue_waits_for_login(self):
+        """Testa a redistribuição ao sair e a fila de salas sem mediador"""
+        from models import run_db, Match
+        from mediators import MediatorPool
+        m = await self._seed(4)
+        pool = MediatorPool()
+        
+        self.assertIsNone(await pool.assign("g", m[0], 10.0))
+        self.assertEqual(await pool.login("g", "a"), [(m[0], "a")])
+        self.assertEqual(await pool.assign("g", m[1], 10.0), "a")
+        await pool.login("g", "b")
+        self.assertEqual(await pool.assign("g", m[2], 10.0), "b")
+        
+        # m[0] já tem painel de confirmação e fica com "a"
+        pool.pin(m[0])
+        moved = await pool.logout("g", "a")
+        self.assertEqual(moved, [(m[1], "b")])
+        self.assertEqual(pool.assignment(m[0]), "a")
+        
+        stored = await run_db(lambda session: {
+            row.id: row.mediator_id for row in session.query(Match.id, Match.mediator_id)
+        })
+        self.assertEqual(stored, {m[0]: "a", m[1]: "b", m[2]: "b", m[3]: None})
+        
+        # Reiniciar reconstrói as cargas a partir do banco
+        reloaded = MediatorPool()
+        await reloaded.load()
+        self.assertEqual(reloaded.assignment(m[1]), "b")
+
+class TestQueueBoard(unittest.IsolatedAsyncioTestCase):
+    """Testes para a reconciliação do painel de filas"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def _sync(self, engine, slots):
+        from cogs.filas import sync_board
+        from outbound import OutboundScheduler
+        with patch("cogs.filas.queue_engine", engine), \
+                patch("cogs.filas.outbound", OutboundScheduler(rate=1000, per=1.0)):
+            return await sync_board(self.guild, self.channel, slots)
+    
+    async def _board(self):
+        from models import run_db
+        from queue_board import load_board
+        return {slot.key: slot for slot in await run_db(load_board, "1")}
+    
+    async def test_reconciles_in_place(self):
+        """Testa a edição no lugar, os envios só do que falta e a remoção de filas desativadas"""
+        from sqlalchemy import update
+        from models import run_db, Match
+        from queue_engine import QueueEngine
+        self.channel = FakeChannel(10)
+        self.guild = Mock(id=1)
+        self.guild.get_channel.return_value = self.channel
+        slots = [("Mobile", "1v1", 1.0), ("Mobile", "1v1", 2.0), ("Mobile", "2v2", 1.0)]
+        engine = QueueEngine()
+        
+        counts = await self._sync(engine, slots)
+        self.assertEqual((counts["posted"], counts["edited"], counts["kept"]), (3, 0, 0))
+        board = await self._board()
+        self.assertEqual(set(board), set(slots))
+        self.assertTrue(all(slot.status == 'waiting' for slot in board.values()))
+        
+        # Nada mudou: nenhuma chamada à API
+        counts = await self._sync(engine, slots)
+        self.assertEqual((counts["posted"], counts["edited"], counts["kept"]), (0, 0, 3))
+        self.assertEqual(len(self.channel.sent), 3)
+        
+        # Sala que encheu ganha uma partida nova na mesma mensagem
+        full = board[slots[0]]
+        await run_db(lambda session: session.execute(
+            update(Match).where(Match.id == full.match_id).values(status='full')
+        ))
+        counts = await self._sync(engine, slots)
+        self.assertEqual((counts["posted"], counts["edited"], counts["kept"]), (0, 1, 2))
+        new = (await self._board())[slots[0]]
+        self.assertEqual(new.message_id, full.message_id)
+        self.assertNotEqual(new.match_id, full.match_id)
+        self.assertIsNotNone(engine.get(new.match_id))
+        
+        # Modalidade desativada: a mensagem é apagada e a sala cancelada
+        removed = board[slots[2]]
+        counts = await self._sync(engine, slots[:2])
+        self.assertEqual((counts["deleted"], counts["kept"]), (1, 2))
+        self.assertNotIn(int(removed.message_id), self.channel.messages)
+        self.assertIsNone(engine.get(removed.match_id))
+        status = await run_db(lambda session: session.get(Match, removed.match_id).status)
+        self.assertEqual(status, 'cancelled')
+        
+        # Após reiniciar, a mensagem apagada à mão é reenviada e a outra editada
+        del self.channel.messages[int(board[slots[1]].message_id)]
+        counts = await self._sync(QueueEngine(), slots[:2])
+        self.assertEqual((counts["posted"], counts["edited"], counts["failed"]), (1, 1, 0))
+        self.assertEqual(len(self.channel.sent), 4)
+        self.assertEqual(len(await self._board()), 2)
+    
+    async def test_failed_post_cancels_new_room(self):
+        """Testa se a sala criada para uma fila cujo envio falhou é cancelada"""
+        from models import run_db, Match
+        from queue_engine import QueueEngine
+        
+        class FlakyChannel(FakeChannel):
+            async def send(self, **kwargs):
+                if kwargs["embed"].description.endswith("R$ 2.00"):
+                    raise RuntimeError("Discord fora do ar")
+                return await super().send(**kwargs)
+        
+        self.channel = FlakyChannel(10)
+        self.guild = Mock(id=1)
+        engine = QueueEngine()
+        
+        counts = await self._sync(engine, [("Mobile", "1v1", 1.0), ("Mobile", "1v1", 2.0)])
+        self.assertEqual((counts["posted"], counts["failed"]), (1, 1))
+        self.assertEqual(list(await self._board()), [("Mobile", "1v1", 1.0)])
+        
+        statuses = await run_db(lambda session: {m.bet_value: (m.id, m.status) for m in session.query(Match)})
+        self.assertEqual(statuses[2.0][1], 'cancelled')
+        self.assertIsNone(engine.get(statuses[2.0][0]))
+        self.assertIsNotNone(engine.get(statuses[1.0][0]))
+
+
+class TestSweeper(unittest.IsolatedAsyncioTestCase):
+    """Testes para a limpeza periódica de partidas antigas"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_sweep_retention(self):
+        """Testa o que é apagado, o que é mantido e a divisão em blocos"""
+        from datetime import datetime, timedelta
+        from models import run_db, Match, MatchParticipant, QueueBoardSlot
+        from queue_engine import QueueEngine
+        from sweeper import Sweeper
+        now = datetime(2026, 10, 18)
+        old = now - timedelta(days=60)
+        
+        def _insert(session):
+            rows = {
+                "empty_1": Match(guild_id="g", match_id="E1", bet_value=10.0, status='waiting', created_at=old),
+                "empty_2": Match(guild_id="g", match_id="E2", bet_value=10.0, status='waiting', created_at=old),
+                "empty_3": Match(guild_id="g", match_id="E3", bet_value=10.0, status='waiting', created_at=old),
+                "with_player": Match(guild_id="g", match_id="W1", bet_value=10.0, status='waiting', created_at=old),
+                "recent": Match(guild_id="g", match_id="W2", bet_value=10.0, status='waiting', created_at=now),
+                "current_board": Match(guild_id="h", match_id="B1", bet_value=10.0, status='waiting', created_at=old),
+                "on_board": Match(guild_id="g", match_id="S1", bet_value=10.0, status='waiting', created_at=old),
+                "cancelled": Match(guild_id="g", match_id="C1", bet_value=10.0, status='cancelled', created_at=old),
+                "paid": Match(
+                    guild_id="g", match_id="C2", bet_value=10.0, status='cancelled', created_at=old, paid_at=old
+                ),
+                "completed": Match(guild_id="g", match_id="F1", bet_value=10.0, status='completed', created_at=old),
+            }
+            session.add_all(rows.values())
+            session.flush()
+            session.add_all([
+                MatchParticipant(match_id=rows["with_player"].id, user_id="u1"),
+                MatchParticipant(match_id=rows["cancelled"].id, user_id="u1"),
+                MatchParticipant(match_id=rows["cancelled"].id, user_id="u2"),
+                MatchParticipant(match_id=999999, user_id="u3"),
+                QueueBoardSlot(
+                    guild_id="g", modality="Mobile", mode="1v1", bet_value=10.0, channel_id="1", message_id="1",
+                    match_id=rows["on_board"].id
+                ),
+            ])
+            return {name: row.id for name, row in rows.items()}
+        
+        ids = await run_db(_insert)
+        sweeper = Sweeper(chunk=2, pause=0, engine=QueueEngine())
+        stats = await sweeper.run(now)
+        
+        self.assertEqual(
+            {k: stats[k] for k in ("waiting", "cancelled", "participants", "orphans")},
+            {"waiting": 3, "cancelled": 1, "participants": 2, "orphans": 1},
+        )
+        self.assertTrue(stats["complete"])
+        self.assertEqual(stats["chunks"], 4)
+        
+        def _remaining(session):
+            return (
+                {m.match_id for m in session.query(Match).all()},
+                session.query(MatchParticipant).count(),
+            )
+        
+        matches, participants = await run_db(_remaining)
+        self.assertEqual(matches, {"W1", "W2", "B1", "S1", "C2", "F1"})
+        self.assertEqual(participants, 1)
+        
+        # A segunda execução não encontra nada
+        self.assertEqual((await sweeper.run(now))["chunks"], 0)
+        self.assertEqual(sweeper.runs, 2)
+
+
+class TestLogSink(unittest.IsolatedAsyncioTestCase):
+    """Testes para o sink de logs em lote"""
+    
+    def setUp(self):
+        bind_test_database()
+    
+    async def test_flushes_in_batches_and_on_close(self):
+        """Testa se os logs são gravados em lotes e o restante no encerramento"""
+        from audit_log import LogSink
+        from models import run_db, Log
+        
+        sink = LogSink(batch_size=10, flush_interval=60, max_queue=100)
+        sink.start()
+        for i in range(25):
+            await sink.put({"guild_id": "1", "user_id": str(i), "action": "join_queue"})
+        await sink.close()
+        
+        count = await run_db(lambda session: session.query(Log).count())
+        self.assertEqual(count, 25)
+        self.assertEqual(sink.stats()["flushed"], 25)
+        self.assertEqual(sink.stats()["batches"], 3)
+        self.assertEqual(sink.stats()["queue_depth"], 0)
+    
+    async def test_writes_directly_when_not_started(self):
+        """Testa a gravação direta quando o sink não está rodando"""
+        from audit_log import LogSink
+        from models import run_db, Log
+        
+        sink = LogSink()
+        await sink.put({"guild_id": "1", "user_id": "2", "action": "profile_viewed"})
+        
+        count = await run_db(lambda session: session.query(Log).count())
+        self.assertEqual(count, 1)
+
+
 def run_tests():
     """Executa todos os testes"""
     unittest.main(argv=[''], exit=False, verbosity=2)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import math
+import time
+from config import DEADLINE_TICK, DEADLINE_SLOTS
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Roda de tempo com hash (hashed timing wheel).
+    
+    Cada prazo cai no slot `vencimento % slots`; agendar e cancelar são O(1)
+    e cada tick visita um único slot, então o custo não cresce com o número
+    de prazos pendentes. Prazos mais longos que uma volta ficam no slot até
+    o tick em que vencem.
+    """
+    
+    def __init__(self, tick: float = DEADLINE_TICK, slots: int = DEADLINE_SLOTS):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        self.now = 0
+        self._slot_of = {}
+    
+    def __len__(self) -> int:
+        return len(self._slot_of)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._slot_of
+    
+    def schedule(self, key, delay: float):
+        """Agenda (ou reagenda) `key` para vencer em `delay` segundos"""
+        self.cancel(key)
+        expires = self.now + max(1, math.ceil(delay / self.tick))
+        slot = expires % len(self.slots)
+        self.slots[slot][key] = expires
+        self._slot_of[key] = slot
+    
+    def cancel(self, key) -> bool:
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        return True
+    
+    def remaining(self, key):
+        """Segundos até o vencimento de `key`, ou None"""
+        slot = self._slot_of.get(key)
+        if slot is None:
+            return None
+        return (self.slots[slot][key] - self.now) * self.tick
+    
+    def advance(self) -> list:
+        """Avança um tick e retorna as chaves vencidas"""
+        self.now += 1
+        bucket = self.slots[self.now % len(self.slots)]
+        expired = [key for key, expires in bucket.items() if expires <= self.now]
+        for key in expired:
+            del bucket[key]
+            del self._slot_of[key]
+        return expired
+
+
+class DeadlineScheduler:
+    """
+    Prazos das partidas em uma única tarefa, sobre uma TimerWheel.
+    
+    As chaves são (tipo de prazo, item). A cada tick os itens vencidos são
+    agrupados por tipo e entregues de uma vez ao handler registrado com `on`,
+    então milhares de prazos custam uma tarefa e uma chamada por tipo.
+    """
+    
+    def __init__(self, tick: float = DEADLINE_TICK, slots: int = DEADLINE_SLOTS):
+        self.wheel = TimerWheel(tick, slots)
+        self._handlers = {}
+        self._kinds = set()
+        self._task = None
+        
+        # Métricas
+        self.fired = 0
+        self.errors = 0
+        self.max_lag_ms = 0.0
+    
+    def on(self, kind: str, handler):
+        """Registra o handler assíncrono `handler(itens)` de um tipo de prazo"""
+        self._handlers[kind] = handler
+    
+    def schedule(self, kind: str, item, delay: float):
+        self._kinds.add(kind)
+        self.wheel.schedule((kind, item), delay)
+    
+    def cancel(self, kind: str, item) -> bool:
+        return self.wheel.cancel((kind, item))
+    
+    def cancel_all(self, item):
+        """Cancela todos os prazos do item"""
+        for kind in self._kinds:
+            self.wheel.cancel((kind, item))
+    
+    def pending(self, kind: str, item) -> bool:
+        return (kind, item) in self.wheel
+    
+    def start(self):
+        """Inicia a tarefa dos ticks"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        tick = self.wheel.tick
+        next_tick = time.monotonic() + tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            
+            # Se o loop atrasou, avança os ticks perdidos sem pular prazos
+            now = time.monotonic()
+            self.max_lag_ms = max(self.max_lag_ms, (now - next_tick) * 1000)
+            due = []
+            while next_tick <= now:
+                due.extend(self.wheel.advance())
+                next_tick += tick
+            if due:
+                await self.dispatch(due)
+    
+    async def dispatch(self, keys: list):
+        """Entrega as chaves vencidas aos handlers, uma chamada por tipo"""
+        grouped = {}
+        for kind, item in keys:
+            grouped.setdefault(kind, []).append(item)
+        
+        for kind, items in grouped.items():
+            handler = self._handlers.get(kind)
+            if handler is None:
+                continue
+            self.fired += len(items)
+            try:
+                await handler(items)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Erro ao tratar {len(items)} prazos '{kind}': {e}")
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> dict:
+        """Retorna as métricas do agendador"""
+        return {
+            "pending": len(self.wheel),
+            "fired": self.fired,
+            "errors": self.errors,
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+
+deadlines = DeadlineScheduler()
@@ -2,66 +2,81 @@ import discord
 import random
 import string
 from datetime import datetime
-from models import get_session, Guild, User, Log
+from models import run_db, User
 from config import MODALITIES, BET_VALUES
+from audit_log import log_sink
+from guild_settings import guild_settings, GuildSettings
 
 def generate_room_id() -> str:
     """Gera um ID único para a sala"""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
+def generate_room_ids(count: int, exclude: set = None) -> list:
+    """Gera `count` IDs de sala distintos entre si e fora de `exclude`"""
+    exclude = exclude or set()
+    ids = set()
+    while len(ids) < count:
+        room_id = generate_room_id()
+        if room_id not in exclude:
+            ids.add(room_id)
+    return list(ids)
+
+def mode_capacity(mode_name: str) -> int:
+    """Número de jogadores de um modo ("2v2" -> 4)"""
+    return int(mode_name.split('v')[0]) * 2
+
 def generate_room_password() -> str:
     """Gera uma senha aleatória para a sala"""
     return ''.join(random.choices(string.digits, k=4))
 
-def get_or_create_guild(guild_id: str) -> 'Guild':
-    """Obtém ou cria uma guilda no banco de dados"""
-    session = get_session()
-    try:
-        guild = session.query(Guild).filter_by(guild_id=str(guild_id)).first()
-        if not guild:
-            guild = Guild(guild_id=str(guild_id))
-            session.add(guild)
-            session.commit()
-        return guild
-    finally:
-        session.close()
-
-def get_or_create_user(user_id: str, guild_id: str, username: str) -> 'User':
-    """Obtém ou cria um usuário no banco de dados"""
-    session = get_session()
-    try:
-        user = session.query(User).filter_by(
+def _get_or_create_user(session, user_id: str, guild_id: str, username: str) -> 'User':
+    """Obtém ou cria um usuário usando a sessão informada"""
+    user = session.query(User).filter_by(
+        user_id=str(user_id),
+        guild_id=str(guild_id)
+    ).first()
+    
+    if not user:
+        user = User(
             user_id=str(user_id),
-            guild_id=str(guild_id)
-        ).first()
-        
-        if not user:
-            user = User(
-                user_id=str(user_id),
-                guild_id=str(guild_id),
-                username=username
-            )
-            session.add(user)
-            session.commit()
-        return user
-    finally:
-        session.close()
-
-def log_action(guild_id: str, user_id: str, action: str, match_id: str = None, details: str = None):
-    """Registra uma ação no banco de dados"""
-    session = get_session()
-    try:
-        log = Log(
             guild_id=str(guild_id),
-            user_id=str(user_id),
-            action=action,
-            match_id=match_id,
-            details=details
+            username=username
         )
-        session.add(log)
-        session.commit()
-    finally:
-        session.close()
+        session.add(user)
+        session.flush()
+    return user
+
+async def get_or_create_guild(guild_id: str) -> 'GuildSettings':
+    """Obtém (do cache) ou cria as configurações de uma guilda"""
+    return await guild_settings.get(guild_id)
+
+async def get_or_create_user(user_id: str, guild_id: str, username: str) -> 'User':
+    """Obtém ou cria um usuário no banco de dados"""
+    return await run_db(_get_or_create_user, str(user_id), str(guild_id), username)
+
+async def log_action(guild_id: str, user_id: str, action: str, match_id: str = None, details: str = None):
+    """Registra uma ação no sink de logs (gravado em lote no banco)"""
+    await log_sink.put({
+        "guild_id": str(guild_id),
+        "user_id": str(user_id),
+        "action": action,
+        "match_id": match_id,
+        "details": details
+    })
+
+def static_view(*items: discord.ui.Item) -> discord.ui.View:
+    """
+    Cria uma view para botões persistentes (DynamicItem).
+    
+    A view é enviada já parada: os itens são despachados pelos templates
+    registrados com bot.add_dynamic_items, então o discord.py não precisa
+    guardar nada por mensagem.
+    """
+    view = discord.ui.View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    view.stop()
+    return view
 
 def create_central_embed() -> discord.Embed:
     """Cria o embed da central de configurações"""
@@ -74,7 +89,7 @@ def create_central_embed() -> discord.Embed:
     embed.timestamp = datetime.utcnow()
     return embed
 
-def create_general_config_embed(guild: 'Guild') -> discord.Embed:
+def create_general_config_embed(guild: 'GuildSettings') -> discord.Embed:
     """Cria o embed de configurações gerais"""
     embed = discord.Embed(
         title="⚙️ Configurações Gerais",
@@ -104,7 +119,7 @@ def create_general_config_embed(guild: 'Guild') -> discord.Embed:
     embed.timestamp = datetime.utcnow()
     return embed
 
-def create_matches_config_embed(guild: 'Guild') -> discord.Embed:
+def create_matches_config_embed(guild: 'GuildSettings') -> discord.Embed:
     """Cria o embed de configuração de partidas"""
     embed = discord.Embed(
         title="🎮 Configurações da Fila",
@@ -138,7 +153,7 @@ def create_matches_config_embed(guild: 'Guild') -> discord.Embed:
     embed.timestamp = datetime.utcnow()
     return embed
 
-def create_roles_config_embed(guild: 'Guild') -> discord.Embed:
+def create_roles_config_embed(guild: 'GuildSettings') -> discord.Embed:
     """Cria o embed de configuração de cargos"""
     embed = discord.Embed(
         title="👥 Central de Cargos",
@@ -162,7 +177,7 @@ def create_roles_config_embed(guild: 'Guild') -> discord.Embed:
     embed.timestamp = datetime.utcnow()
     return embed
 
-def create_logs_config_embed(guild: 'Guild') -> discord.Embed:
+def create_logs_config_embed(guild: 'GuildSettings') -> discord.Embed:
     """Cria o embed de configuração de logs"""
     embed = discord.Embed(
         title="📋 Sistema de Logs",
@@ -205,20 +220,23 @@ def create_modality_config_embed(modality_name: str) -> discord.Embed:
     embed.timestamp = datetime.utcnow()
     return embed
 
-def create_match_embed(modality: str, mode: str, price: float, players: list = None) -> discord.Embed:
-    """Cria o embed de partida"""
+def create_match_embed(modality: str, mode: str, price: float, players: list = None,
+                       capacity: int = None, color: discord.Color = None) -> discord.Embed:
+    """Cria o embed de partida; `players` são IDs de usuário do Discord"""
     if players is None:
         players = []
+    if capacity is None:
+        capacity = mode_capacity(mode)
     
     embed = discord.Embed(
-        title=modality,
+        title=f"{modality} • {len(players)}/{capacity}",
         description=f"{modality} {mode}\nR$ {price:.2f}",
-        color=discord.Color.random()
+        color=color or discord.Color.random()
     )
     
     # Adicionar jogadores
     if players:
-        players_text = "\n".join([f"@{p}" for p in players])
+        players_text = "\n".join([f"<@{p}>" for p in players])
     else:
         players_text = "Nenhum jogador ainda"
     
@@ -268,7 +286,7 @@ def create_room_info_embed(room_id: str, room_password: str) -> discord.Embed:
     embed.timestamp = datetime.utcnow()
     return embed
 
-def create_profile_embed(user: 'User') -> discord.Embed:
+def create_profile_embed(user: 'User', rank: int = None) -> discord.Embed:
     """Cria o embed do perfil do usuário"""
     embed = discord.Embed(
         title=f"👤 Perfil de {user.username}",
@@ -301,6 +319,38 @@ def create_profile_embed(user: 'User') -> discord.Embed:
             inline=True
         )
     
+    if user.rating is not None:
+        embed.add_field(
+            name="⭐ Rating",
+            value=f"{user.rating:.0f}",
+            inline=True
+        )
+    
+    if rank is not None:
+        embed.add_field(
+            name="🏅 Ranking",
+            value=f"#{rank}",
+            inline=True
+        )
+    
     embed.set_footer(text="🐿️ Esquilo Aposta")
     embed.timestamp = datetime.utcnow()
     return embed
+
+
+def create_ranking_embed(metric_label: str, rows: list, page: int, pages: int) -> discord.Embed:
+    """Cria o embed de uma página do ranking"""
+    embed = discord.Embed(
+        title=f"🏆 Ranking • {metric_label}",
+        color=discord.Color.gold()
+    )
+    
+    lines = []
+    for position, user_id, (wins, losses, coins) in rows:
+        games = wins + losses
+        win_rate = f"{wins / games * 100:.1f}%" if games else "-"
+        lines.append(f"**#{position}** <@{user_id}> — {wins}V/{losses}D • {win_rate} • {coins:.2f} coins")
+    
+    embed.description = "\n".join(lines) if lines else "Nenhum jogador no ranking ainda"
+    embed.set_footer(text=f"🐿️ Esquilo Aposta • Página {page + 1}/{max(pages, 1)}")
+    return embed